@@ -1,18 +1,115 @@
+import os
+import threading
 import dash
 from dash import callback
 from components.layout import create_layout
-from src.data_processor import DataProcessor
+from components.loading import get_loading_layout
+from src.metrics import instrument_callbacks
+from src.profiling import install_profiler
+from src.snapshot import SnapshotManager
+from routes.api import api_blueprint
+from routes.export import export_blueprint
+from routes.health import health_blueprint
+from routes.metrics import metrics_blueprint
+from routes.profiling import profiling_blueprint
+from routes.tiles import tiles_blueprint
 import globals
 import warnings
 warnings.filterwarnings('ignore')
 
-app = dash.Dash(__name__, title="Earthquake Data Visualization")
-app.config.suppress_callback_exceptions = True
-globals.data_processor = DataProcessor()
-data_processor = globals.data_processor
-app.layout = create_layout(data_processor)
+# Set once load_dataset has imported pandas. plotly's JSON encoder looks pandas
+# up in sys.modules, so responses serialized during that import could see a
+# half-initialized module; requests wait for it instead (a fraction of a second)
+_data_stack_imported = threading.Event()
+
+def wait_for_data_stack():
+    _data_stack_imported.wait()
+
+def warm_up(data_processor):
+    """
+    Build the indexes and the figures every page load needs, so forked
+    workers start with them already in (shared) memory.
+    """
+    from visualizations.geo_utils import get_all_country_centroids
+    from visualizations.plots.risk_map import create_global_risk_map
+    from visualizations.plots.world_map import create_global_earthquake_map
+
+    if data_processor.processed_data is None or data_processor.processed_data.empty:
+        return
+    data_processor.get_spatial_index()
+    data_processor.get_activity_cube()
+    data_processor.get_temporal_pyramid()
+    get_all_country_centroids()
+    create_global_risk_map(data_processor, metric='count', show_fault_lines=False, show_labels=True)
+    create_global_earthquake_map(data_processor, selected_year=2023)
+
+def load_dataset(snapshots, watch=True):
+    """
+    Publish the first dataset snapshot (which sets globals.data_ready), then
+    watch the file for changes. Errors are kept in globals.load_error.
+    """
+    try:
+        # pandas and the rest of the data stack are only imported here
+        try:
+            import src.data_processor
+        finally:
+            _data_stack_imported.set()
+        snapshots.load()
+    except Exception as e:
+        globals.load_error = f"{type(e).__name__}: {e}"
+        print(f"Error loading dataset: {globals.load_error}")
+        return
+    if watch:
+        snapshots.start_watching()
+
+def serve_layout():
+    """The dashboard once the dataset is loaded, a placeholder that waits for it until then."""
+    if globals.data_ready.is_set():
+        return create_layout(globals.data_processor)
+    return get_loading_layout(globals.load_error)
+
+def create_app(data_path=None, warm=True, share_columns=False, background=True, watch=True):
+    """
+    Build the Dash app and load its dataset.
+
+    With background=True the dataset loads in a thread, so the server can
+    bind and answer (with a placeholder page, and 503 from /ready) right
+    away. share_columns moves the dataset into memory-mapped files shared by
+    forked workers. With watch=True a changed dataset file is reloaded and
+    swapped in without a restart (see src/snapshot.py, EQ_RELOAD_INTERVAL).
+    """
+    app = dash.Dash(__name__, title="Earthquake Data Visualization")
+    app.config.suppress_callback_exceptions = True
+    app.layout = serve_layout
+
+    # Register callbacks; they read globals.data_processor when they run, and
+    # import their plot modules (pandas, plotly express) on first use
+    from callbacks import layout_toggle, navigation, map_callbacks, scatter_callbacks, timeseries_callbacks , riskmap_callbacks, content_switch , timeseries_toggle , country_options_callbacks, country_focus_callbacks , country_focus_toggle, startup_callbacks
+
+    # Per-callback stage timings and payload sizes, served at /metrics
+    instrument_callbacks(app)
+    app.server.register_blueprint(metrics_blueprint)
+    # Opt-in sampled cProfile of callbacks (EQ_PROFILE, /admin/profiling)
+    install_profiler(app)
+    app.server.register_blueprint(profiling_blueprint)
+    app.server.register_blueprint(health_blueprint)
+    # Streamed CSV/NDJSON/GeoJSON downloads of filtered events
+    app.server.register_blueprint(export_blueprint)
+    # Read-only JSON API over the same queries and caches (/api/v1)
+    app.server.register_blueprint(api_blueprint)
+    # Density / max-magnitude raster tiles for mapbox layers
+    app.server.register_blueprint(tiles_blueprint)
+    app.server.before_request(wait_for_data_stack)
+
+    globals.snapshots = SnapshotManager(data_path or os.environ.get('EQ_DATA_PATH', '.'),
+                                        share_columns=share_columns, warm=warm_up if warm else None)
+    args = (globals.snapshots, watch)
+    if background:
+        threading.Thread(target=load_dataset, args=args, name='load-dataset', daemon=True).start()
+    else:
+        load_dataset(*args)
+    return app
 
-# Register callbacks
-from callbacks import layout_toggle, navigation, map_callbacks, scatter_callbacks, timeseries_callbacks , riskmap_callbacks, content_switch , timeseries_toggle , country_options_callbacks, country_focus_callbacks , country_focus_toggle
 if __name__ == '__main__':
+    app = create_app(warm=False)
     app.run(debug=True, host='0.0.0.0', port=8050)
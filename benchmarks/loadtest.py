@@ -0,0 +1,442 @@
+"""
+Drive a running dashboard over HTTP with concurrent simulated sessions.
+
+    python -m benchmarks.loadtest --serve --rows 100k --sessions 16 --duration 60
+    python -m benchmarks.loadtest --url http://127.0.0.1:8050 --sessions 8 --output loadtest.json
+
+Each session loads the page and then follows click paths a user would take
+(sidebar navigation, year-slider scrubbing, country selection in the scatter
+and country focus sections, time-series mode toggles), posting the same
+_dash-update-component requests the Dash renderer does: callbacks are read
+from /_dash-dependencies, fired when one of their inputs changes or when a
+section's layout arrives, and sent the current values of their inputs and
+state. A session sends its requests one after another, with exponentially
+distributed think time between user actions.
+
+With --serve a gunicorn server (gunicorn.conf.py) is started on a synthetic
+catalog of --rows events first, so the whole run stays on this machine.
+The report gives throughput and, per callback output, p50/p95/p99 latency
+and the error rate.
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import numpy as np
+import requests
+
+from benchmarks.run import DEFAULT_DATA_DIR, SIZES, _git_commit
+from benchmarks.synthetic import write_catalog
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+UPDATE_PATH = '/_dash-update-component'
+
+# Props only ever sent to the browser; sessions don't keep them
+UNTRACKED_PROPS = {'figure'}
+
+
+def _components(layout):
+    """Yield every component (as serialized by Dash) in a layout tree."""
+    if isinstance(layout, list):
+        for child in layout:
+            yield from _components(child)
+    elif isinstance(layout, dict) and 'props' in layout:
+        yield layout
+        yield from _components(layout['props'].get('children'))
+
+
+def _parse_outputs(output: str) -> List[dict]:
+    """'id.prop' or '..id1.prop1...id2.prop2..' as a list of {id, property}."""
+    parts = output[2:-2].split('...') if output.startswith('..') else [output]
+    return [dict(zip(('id', 'property'), part.rsplit('.', 1))) for part in parts]
+
+
+class Recorder:
+    """Latency, status and size of every request, per callback output."""
+
+    def __init__(self):
+        self._samples = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def add(self, label: str, seconds: float, status: int, size: int):
+        with self._lock:
+            self._samples[label].append((seconds, status, size))
+
+    def summary(self, elapsed: float) -> Dict:
+        with self._lock:
+            samples = {label: list(values) for label, values in self._samples.items()}
+        callbacks = {}
+        for label, values in sorted(samples.items()):
+            latencies = np.array([v[0] for v in values]) * 1000
+            errors = sum(1 for v in values if v[1] == 0 or v[1] >= 400)
+            callbacks[label] = {
+                'count': len(values),
+                'errors': errors,
+                'error_rate': errors / len(values),
+                'no_update': sum(1 for v in values if v[1] == 204),
+                'p50_ms': float(np.percentile(latencies, 50)),
+                'p95_ms': float(np.percentile(latencies, 95)),
+                'p99_ms': float(np.percentile(latencies, 99)),
+                'mean_bytes': float(np.mean([v[2] for v in values])),
+            }
+        total = sum(c['count'] for c in callbacks.values())
+        errors = sum(c['errors'] for c in callbacks.values())
+        return {
+            'requests': total,
+            'errors': errors,
+            'error_rate': errors / total if total else 0.0,
+            'elapsed_s': elapsed,
+            'throughput_rps': total / elapsed if elapsed else 0.0,
+            'callbacks': callbacks,
+        }
+
+
+class Session:
+    """One simulated browser tab: the component props it knows of and the callbacks they feed."""
+
+    def __init__(self, base_url: str, dependencies: List[dict], recorder: Recorder, rng: random.Random,
+                 think: float, timeout: float):
+        self.base_url = base_url.rstrip('/')
+        self.dependencies = [d for d in dependencies if not d.get('clientside_function')]
+        self.recorder = recorder
+        self.rng = rng
+        self.think = think
+        self.timeout = timeout
+        self.http = requests.Session()
+        self.props: Dict[str, dict] = {}
+        # Component ids rendered into each container's children
+        self.children_of: Dict[str, set] = {}
+
+    # -- Dash protocol -------------------------------------------------------
+
+    def load(self):
+        start = time.perf_counter()
+        response = self.http.get(self.base_url + '/_dash-layout', timeout=self.timeout)
+        self.recorder.add('_dash-layout', time.perf_counter() - start, response.status_code, len(response.content))
+        response.raise_for_status()
+        self._fire_initial(self._register(response.json()))
+
+    def _register(self, layout, parent: Optional[str] = None) -> set:
+        """Add the components of a layout (rendered into parent's children); returns their ids."""
+        if parent is not None:
+            self._unregister(parent)
+        added = set()
+        for component in _components(layout):
+            component_id = component['props'].get('id')
+            if isinstance(component_id, str):
+                self.props[component_id] = {k: v for k, v in component['props'].items() if k != 'children'}
+                added.add(component_id)
+        if parent is not None:
+            self.children_of[parent] = added
+        return added
+
+    def _unregister(self, parent: str):
+        for component_id in self.children_of.pop(parent, ()):
+            self._unregister(component_id)
+            self.props.pop(component_id, None)
+
+    def _present(self, items) -> bool:
+        return all(item['id'] in self.props for item in items)
+
+    def _fire_initial(self, added: set):
+        """Callbacks the renderer runs when components appear: all their inputs and outputs exist."""
+        for dependency in self.dependencies:
+            if dependency.get('prevent_initial_call'):
+                continue
+            if (any(i['id'] in added for i in dependency['inputs']) and self._present(dependency['inputs'])
+                    and self._present(_parse_outputs(dependency['output']))):
+                self._post(dependency, [])
+
+    def set_prop(self, component_id: str, prop: str, value):
+        """A user changing one prop; fires every callback it is an input of."""
+        if component_id not in self.props:
+            return
+        self.props[component_id][prop] = value
+        self._fire_changed([f"{component_id}.{prop}"])
+
+    def _fire_changed(self, changed: List[str]):
+        for dependency in self.dependencies:
+            inputs = {f"{i['id']}.{i['property']}" for i in dependency['inputs']}
+            triggered = [prop_id for prop_id in changed if prop_id in inputs]
+            if triggered and self._present(dependency['inputs']):
+                self._post(dependency, triggered)
+
+    def _value(self, item: dict) -> dict:
+        entry = {'id': item['id'], 'property': item['property']}
+        props = self.props.get(item['id'], {})
+        if item['property'] in props:
+            entry['value'] = props[item['property']]
+        return entry
+
+    def _post(self, dependency: dict, changed: List[str]):
+        outputs = _parse_outputs(dependency['output'])
+        body = {
+            'output': dependency['output'],
+            'outputs': outputs if dependency['output'].startswith('..') else outputs[0],
+            'inputs': [self._value(i) for i in dependency['inputs']],
+            'changedPropIds': changed,
+            'state': [self._value(s) for s in dependency.get('state', [])],
+        }
+        label = ' + '.join(f"{o['id']}.{o['property']}" for o in outputs)
+        start = time.perf_counter()
+        try:
+            response = self.http.post(self.base_url + UPDATE_PATH, json=body, timeout=self.timeout)
+        except requests.RequestException:
+            self.recorder.add(label, time.perf_counter() - start, 0, 0)
+            return
+        self.recorder.add(label, time.perf_counter() - start, response.status_code, len(response.content))
+        if response.status_code == 200:
+            self._apply(response.json().get('response', {}))
+
+    def _apply(self, updates: dict):
+        """Store returned props, render returned layouts and run the callbacks they trigger."""
+        changed, added = [], set()
+        for component_id, props in updates.items():
+            for prop, value in props.items():
+                if prop == 'children':
+                    added |= self._register(value, parent=component_id)
+                elif prop not in UNTRACKED_PROPS and component_id in self.props:
+                    if isinstance(value, dict) and '__dash_patch_update' in value:
+                        continue
+                    self.props[component_id][prop] = value
+                    changed.append(f"{component_id}.{prop}")
+        if changed:
+            self._fire_changed(changed)
+        if added:
+            self._fire_initial(added)
+
+    # -- User actions ----------------------------------------------------------
+
+    def pause(self):
+        if self.think > 0:
+            time.sleep(self.rng.expovariate(1 / self.think))
+
+    def click(self, component_id: str):
+        n_clicks = (self.props.get(component_id, {}).get('n_clicks') or 0) + 1
+        self.set_prop(component_id, 'n_clicks', n_clicks)
+        self.pause()
+
+    def choose(self, component_id: str, prop: str, value):
+        self.set_prop(component_id, prop, value)
+        self.pause()
+
+    def option_values(self, component_id: str) -> list:
+        options = self.props.get(component_id, {}).get('options') or []
+        return [o['value'] if isinstance(o, dict) else o for o in options]
+
+    def pick_option(self, component_id: str, exclude=()):
+        values = [v for v in self.option_values(component_id) if v not in exclude]
+        return self.rng.choice(values) if values else None
+
+
+def scrub_years(session: Session, component_id: str, low: int = 1900, high: int = 2023):
+    """Drag a year slider: a run of small steps in one direction."""
+    year = session.rng.randint(low, high)
+    step = session.rng.choice([-1, 1]) * session.rng.randint(1, 5)
+    for _ in range(session.rng.randint(3, 8)):
+        year = min(max(year + step, low), high)
+        session.set_prop(component_id, 'value', year)
+    session.pause()
+
+
+def year_range(session: Session, low: int = 1900, high: int = 2023) -> list:
+    start = session.rng.randint(low, high - 1)
+    return [start, session.rng.randint(start + 1, high)]
+
+
+def browse_map(session: Session):
+    session.click('btn-map')
+    scrub_years(session, 'year-slider')
+
+
+def explore_scatter(session: Session):
+    session.click('btn-scatter')
+    for _ in range(session.rng.randint(1, 3)):
+        country = session.pick_option('scatter-country-filter')
+        if country is not None:
+            session.choose('scatter-country-filter', 'value', country)
+    session.choose('scatter-year-range', 'value', year_range(session))
+
+
+def compare_timeseries(session: Session):
+    session.click('btn-timeseries')
+    session.choose('timeseries-options', 'value', session.rng.sample(['cumulative', 'moving_avg'],
+                                                                     session.rng.randint(0, 2)))
+    session.choose('timeseries-view-mode', 'value', 'range')
+    session.choose('timeseries-year-range', 'value', year_range(session))
+    country = session.pick_option('timeseries-country')
+    if country is not None:
+        session.choose('timeseries-country', 'value', country)
+    session.choose('timeseries-view-mode', 'value', 'single')
+    session.choose('timeseries-month', 'value', str(session.rng.randint(1, 12)))
+
+
+def focus_country(session: Session):
+    session.click('btn-country-focus')
+    country = session.pick_option('country-focus-dropdown')
+    if country is not None:
+        session.choose('country-focus-dropdown', 'value', country)
+    session.choose('year-mode-toggle', 'value', 'range')
+    session.choose('country-focus-year-range-slider', 'value', year_range(session, 1950))
+    if session.rng.random() < 0.5:
+        session.choose('country-focus-viewport-mode', 'value', ['viewport'])
+        session.choose('country-focus-map', 'relayoutData', {
+            'mapbox.center': {'lat': session.rng.uniform(-50, 60), 'lon': session.rng.uniform(-170, 170)},
+            'mapbox.zoom': session.rng.uniform(2, 6),
+        })
+
+
+def toggle_risk_overlays(session: Session):
+    session.click('btn-riskmap')
+    for options in (['labels', 'fault'], ['fault'], ['labels']):
+        session.choose('toggle-faultlines', 'value', options)
+
+
+# Click paths and how often sessions take them
+SCENARIOS = [
+    (browse_map, 3),
+    (explore_scatter, 2),
+    (compare_timeseries, 2),
+    (focus_country, 2),
+    (toggle_risk_overlays, 1),
+]
+
+
+def run_sessions(base_url: str, sessions: int, duration: float, think: float, seed: int,
+                 timeout: float = 60.0) -> Dict:
+    """Run `sessions` concurrent simulated users for `duration` seconds and summarize their requests."""
+    dependencies = requests.get(base_url.rstrip('/') + '/_dash-dependencies', timeout=timeout).json()
+    recorder = Recorder()
+    deadline = time.monotonic() + duration
+    scenarios, weights = zip(*SCENARIOS)
+
+    def user(index: int):
+        rng = random.Random(seed * 1000 + index)
+        while time.monotonic() < deadline:
+            session = Session(base_url, dependencies, recorder, rng, think, timeout)
+            try:
+                session.load()
+                # A visit: a few click paths, then the tab is closed
+                for _ in range(rng.randint(2, 5)):
+                    if time.monotonic() >= deadline:
+                        break
+                    rng.choices(scenarios, weights)[0](session)
+            except requests.RequestException:
+                time.sleep(0.5)
+
+    start = time.monotonic()
+    threads = [threading.Thread(target=user, args=(i,), daemon=True) for i in range(sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder.summary(time.monotonic() - start)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def serve(rows: int, data_dir: str, workers: int, log_path: str) -> tuple:
+    """Start gunicorn on a synthetic catalog; returns (process, base URL) once it answers."""
+    directory = os.path.join(data_dir, f"loadtest-{rows}")
+    print(f"Writing synthetic catalog ({rows:,} rows) to {directory}", flush=True)
+    write_catalog(rows, directory)
+
+    port = _free_port()
+    env = dict(os.environ, EQ_DATA_PATH=directory, EQ_BIND=f"127.0.0.1:{port}", EQ_WORKERS=str(workers))
+    log = open(log_path, 'w')
+    process = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py'], cwd=REPO_ROOT,
+                               env=env, stdout=log, stderr=subprocess.STDOUT)
+    base_url = f"http://127.0.0.1:{port}"
+    print(f"Starting gunicorn with {workers} workers on {base_url} (log: {log_path})", flush=True)
+    deadline = time.monotonic() + 300
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with status {process.returncode}, see {log_path}")
+        try:
+            if requests.get(base_url + '/ready', timeout=5).ok:
+                return process, base_url
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError(f"gunicorn did not answer within 300 s, see {log_path}")
+
+
+def print_summary(summary: Dict):
+    print(f"\n{summary['requests']} requests in {summary['elapsed_s']:.1f} s: "
+          f"{summary['throughput_rps']:.1f} req/s, {summary['errors']} errors ({summary['error_rate']:.2%})\n")
+    print(f"  {'callback':60s} {'count':>6s} {'errors':>7s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s} "
+          f"{'mean KB':>9s}")
+    for label, c in summary['callbacks'].items():
+        print(f"  {label[:60]:60s} {c['count']:6d} {c['error_rate']:7.1%} {c['p50_ms']:9.1f} {c['p95_ms']:9.1f} "
+              f"{c['p99_ms']:9.1f} {c['mean_bytes'] / 1024:9.1f}")
+
+
+def _rows(value: str) -> int:
+    return SIZES[value.lower()] if value.lower() in SIZES else int(value)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:8050', help="running app to load (default %(default)s)")
+    parser.add_argument('--serve', action='store_true', help="start gunicorn on a synthetic catalog and load it")
+    parser.add_argument('--rows', type=_rows, default=SIZES['100k'],
+                        help=f"catalog size for --serve: a count or one of {', '.join(SIZES)} (default 100k)")
+    parser.add_argument('--workers', type=int, default=2, help="gunicorn workers for --serve (default 2)")
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help="where generated catalogs are kept")
+    parser.add_argument('--sessions', type=int, default=8, help="concurrent sessions (default 8)")
+    parser.add_argument('--duration', type=float, default=30, help="seconds to run (default 30)")
+    parser.add_argument('--think', type=float, default=0.5,
+                        help="mean think time between user actions in seconds (default 0.5)")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the sessions' click paths")
+    parser.add_argument('--output', help="write the summary JSON here")
+    args = parser.parse_args(argv)
+
+    process = None
+    base_url = args.url
+    if args.serve:
+        os.makedirs(args.data_dir, exist_ok=True)
+        process, base_url = serve(args.rows, args.data_dir, args.workers,
+                                  os.path.join(args.data_dir, 'loadtest-gunicorn.log'))
+    try:
+        print(f"Running {args.sessions} sessions against {base_url} for {args.duration:g} s", flush=True)
+        summary = run_sessions(base_url, args.sessions, args.duration, args.think, args.seed)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+    print_summary(summary)
+
+    if args.output:
+        summary['meta'] = {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'commit': _git_commit(),
+            'url': base_url,
+            'rows': args.rows if args.serve else None,
+            'workers': args.workers if args.serve else None,
+            'sessions': args.sessions,
+            'duration': args.duration,
+            'think': args.think,
+            'seed': args.seed,
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(summary, f, indent=2)
+        print(f"\nSummary written to {args.output}")
+    return 1 if summary['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,231 @@
+"""
+Benchmark DataProcessor and the plot builders on synthetic catalogs.
+
+    python -m benchmarks.run --sizes 10k,100k --output benchmarks/results/latest.json
+    python -m benchmarks.run --sizes 10k,100k --baseline benchmarks/results/baseline.json
+
+Each size gets its own generated catalog (cached in --data-dir). Every case is
+timed over --repeat runs after one warm-up run, with builder caches cleared
+before each run, and its peak traced allocation is measured in a separate run.
+With --baseline the medians are compared and the exit status is 1 when any case
+is slower than --threshold times its baseline.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import plotly
+
+from benchmarks.synthetic import write_catalog
+from src.data_processor import DataProcessor
+from visualizations.plots.country_focus import create_country_barcharts, create_country_focus_view
+from visualizations.plots.epicentre import create_epicentre_impact
+from visualizations.plots.magnitude_dist import create_magnitude_distribution
+from visualizations.plots.risk_map import create_global_risk_map
+from visualizations.plots.scatter import create_scatter_plot
+from visualizations.plots.time_series import (create_count_time_series_plot, create_magnitude_time_series_plot,
+                                              create_time_series_plot)
+from visualizations.plots.world_map import create_global_earthquake_map
+
+SIZES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000, '10m': 10_000_000}
+DEFAULT_DATA_DIR = os.path.join(tempfile.gettempdir(), 'eq-benchmarks')
+
+# Cases slower than threshold × baseline (and by more than this many seconds) are regressions
+MIN_REGRESSION_SECONDS = 0.002
+
+
+def _uncached(func: Callable) -> Callable:
+    """Call a (possibly versioned_cache-wrapped) builder with its cache cleared first."""
+    cache = getattr(func, 'cache', None)
+
+    def run(*args, **kwargs):
+        if cache is not None:
+            cache.clear()
+        return func(*args, **kwargs)
+    return run
+
+
+def build_cases(dp: DataProcessor) -> List[Tuple[str, Callable[[], object]]]:
+    """The timed cases for one loaded catalog, with inputs typical of the UI."""
+    data = dp.processed_data
+    country = data['country'].value_counts().index[0]
+    year = int(data['year'].max())
+    start = pd.Timestamp(f"{year - 20}-01-01", tz='UTC')
+    end = pd.Timestamp(f"{year}-12-31", tz='UTC')
+    single_start = pd.Timestamp(f"{year}-01-01", tz='UTC')
+    earthquake_id = data['ID'].iloc[len(data) // 2]
+
+    return [
+        ('get_filtered_data', lambda: dp.get_filtered_data(start, end, (6.0, 10.0), country)),
+        ('get_time_series_data', lambda: dp.get_time_series_data('all', start, end, country)),
+        ('get_risk_map_data', lambda: dp.get_risk_map_data('count')),
+        ('get_significant_earthquakes', dp.get_significant_earthquakes),
+        ('create_global_earthquake_map', lambda: _uncached(create_global_earthquake_map)(dp, selected_year=year)),
+        ('create_global_risk_map', lambda: _uncached(create_global_risk_map)(dp, metric='count')),
+        ('create_scatter_plot', lambda: create_scatter_plot(dp, country_filter=country)),
+        ('create_count_time_series_plot', lambda: create_count_time_series_plot(
+            dp, start_date=start, end_date=end, country=country, show_moving_avg=True, mode='range')),
+        ('create_magnitude_time_series_plot', lambda: create_magnitude_time_series_plot(
+            dp, start_date=single_start, end_date=end, show_moving_avg=True, mode='single')),
+        ('create_time_series_plot', lambda: create_time_series_plot(dp, start_date=start, end_date=end, mode='range')),
+        ('create_epicentre_impact', lambda: create_epicentre_impact(dp, earthquake_id)),
+        ('create_country_focus_view', lambda: create_country_focus_view(dp, country, start, end)),
+        ('create_country_barcharts', lambda: create_country_barcharts(dp, country, start, end)),
+        ('create_magnitude_distribution', lambda: create_magnitude_distribution(dp, country=country)),
+    ]
+
+
+def _peak_bytes(func: Callable[[], object]) -> int:
+    """Peak memory traced while func runs, above what was allocated before."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        func()
+        return tracemalloc.get_traced_memory()[1] - base
+    finally:
+        tracemalloc.stop()
+
+
+def time_case(func: Callable[[], object], repeat: int, warmup: bool = True, memory: bool = True) -> Dict:
+    if warmup:
+        func()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    result = {'median_s': statistics.median(times), 'min_s': min(times), 'repeats': repeat}
+    if memory:
+        result['peak_bytes'] = _peak_bytes(func)
+    return result
+
+
+def run_size(label: str, n_rows: int, data_dir: str, repeat: int, load_repeat: int, memory: bool,
+             only: Optional[List[str]] = None) -> Dict[str, Dict]:
+    directory = os.path.join(data_dir, label)
+    print(f"[{label}] writing catalog ({n_rows:,} rows)", flush=True)
+    write_catalog(n_rows, directory)
+
+    results = {}
+    print(f"[{label}] load_data", flush=True)
+    results['load_data'] = time_case(lambda: DataProcessor(directory), load_repeat, warmup=False, memory=memory)
+    dp = DataProcessor(directory)
+
+    for name, func in build_cases(dp):
+        if only and name not in only:
+            continue
+        print(f"[{label}] {name}", flush=True)
+        results[name] = time_case(func, repeat, memory=memory)
+    return results
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: Dict, baseline: Dict, threshold: float) -> List[Dict]:
+    """Per size and case: baseline and current median and their ratio, flagged when a regression."""
+    rows = []
+    for size, cases in results['results'].items():
+        for name, current in cases.items():
+            base = baseline.get('results', {}).get(size, {}).get(name)
+            if base is None:
+                continue
+            ratio = current['median_s'] / base['median_s'] if base['median_s'] else float('inf')
+            regression = ratio > threshold and current['median_s'] - base['median_s'] > MIN_REGRESSION_SECONDS
+            rows.append({'size': size, 'case': name, 'baseline_s': base['median_s'],
+                         'current_s': current['median_s'], 'ratio': ratio, 'regression': regression})
+    return rows
+
+
+def print_results(results: Dict):
+    for size, cases in results['results'].items():
+        print(f"\n{size}")
+        for name, r in cases.items():
+            peak = f"{r['peak_bytes'] / 2**20:9.1f} MiB" if 'peak_bytes' in r else ''
+            print(f"  {name:36s} {r['median_s'] * 1000:10.2f} ms  (min {r['min_s'] * 1000:.2f}) {peak}")
+
+
+def print_comparison(rows: List[Dict]):
+    print("\nComparison with baseline (median)")
+    for row in rows:
+        flag = '  REGRESSION' if row['regression'] else ''
+        print(f"  {row['size']:5s} {row['case']:36s} {row['baseline_s'] * 1000:10.2f} ms -> "
+              f"{row['current_s'] * 1000:10.2f} ms  x{row['ratio']:.2f}{flag}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='10k,100k,1m,10m',
+                        help=f"comma-separated catalog sizes out of {', '.join(SIZES)} (default: all)")
+    parser.add_argument('--repeat', type=int, default=5, help="timed runs per case (default 5)")
+    parser.add_argument('--load-repeat', type=int, default=1, help="timed runs of load_data (default 1)")
+    parser.add_argument('--cases', help="comma-separated case names to run (default: all)")
+    parser.add_argument('--no-memory', action='store_true', help="skip the tracemalloc peak memory runs")
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help="where generated catalogs are kept")
+    parser.add_argument('--output', help="write results JSON here")
+    parser.add_argument('--baseline', help="compare against this results JSON")
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help="slowdown ratio counted as a regression (default 1.2)")
+    args = parser.parse_args(argv)
+
+    warnings.filterwarnings('ignore')
+    sizes = [s.strip().lower() for s in args.sizes.split(',') if s.strip()]
+    unknown = [s for s in sizes if s not in SIZES]
+    if unknown:
+        parser.error(f"unknown sizes: {', '.join(unknown)}")
+    only = [c.strip() for c in args.cases.split(',')] if args.cases else None
+
+    results = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'plotly': plotly.__version__,
+            'repeat': args.repeat,
+        },
+        'results': {},
+    }
+    for size in sizes:
+        results['results'][size] = run_size(size, SIZES[size], args.data_dir, args.repeat, args.load_repeat,
+                                            not args.no_memory, only)
+    print_results(results)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            rows = compare(results, json.load(f), args.threshold)
+        print_comparison(rows)
+        if any(row['regression'] for row in rows):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
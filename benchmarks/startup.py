@@ -0,0 +1,151 @@
+"""
+Startup report: what importing the app costs and how soon a server answers.
+
+    python -m benchmarks.startup --rows 100k
+
+The import report runs `python -X importtime` over the app's startup path
+(importing app and building it around an empty data directory) and lists
+the slowest imports on it by cumulative time. Imports made by the dataset
+load (src.data_processor and what it pulls in) are counted apart, since with
+a background load they no longer hold up the server.
+
+The server timings start the app on a synthetic catalog of --rows events,
+with the dataset loaded in the background and in the foreground, and give
+the time to the first HTTP response and until /ready answers 200.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+import requests
+
+from benchmarks.loadtest import REPO_ROOT, _free_port, _rows
+from benchmarks.run import DEFAULT_DATA_DIR, SIZES
+from benchmarks.synthetic import write_catalog
+
+# Imported by app.load_dataset, off the path to binding the port when it runs in the background
+DEFERRED_ROOT = 'src.data_processor'
+
+STARTUP_CODE = "import app; app.create_app(data_path={path!r}, warm=False, background=False)"
+SERVER_CODE = ("import app; app.create_app(data_path={path!r}, background={background})"
+               ".run(host='127.0.0.1', port={port})")
+
+
+def import_times(code: str) -> List[Tuple[int, int, str]]:
+    """(depth, cumulative µs, module) per import made by running code, in completion order."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=REPO_ROOT,
+                            capture_output=True, text=True, check=True)
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        _, cumulative, name = line.split('|')
+        if not cumulative.strip().isdigit():
+            continue
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((depth, int(cumulative), name.strip()))
+    return entries
+
+
+def split_deferred(entries: List[Tuple[int, int, str]]) -> Tuple[list, list]:
+    """Separate the imports under DEFERRED_ROOT from the rest of the startup path."""
+    startup, deferred, subtree = [], [], []
+    for entry in entries:
+        subtree.append(entry)
+        # importtime prints a module after everything it imported
+        if entry[0] == 0:
+            (deferred if entry[2] == DEFERRED_ROOT else startup).extend(subtree)
+            subtree = []
+    return startup, deferred + subtree
+
+
+def print_import_report(entries: List[Tuple[int, int, str]], top: int, max_depth: int):
+    startup, deferred = split_deferred(entries)
+    total = sum(cumulative for depth, cumulative, _ in startup if depth == 0)
+    print(f"Import time on the startup path: {total / 1000:.1f} ms")
+    shown = sorted((e for e in startup if e[0] <= max_depth), key=lambda e: -e[1])[:top]
+    for depth, cumulative, name in shown:
+        print(f"  {cumulative / 1000:9.1f} ms  {'  ' * depth}{name}")
+    deferred_total = sum(cumulative for depth, cumulative, _ in deferred if depth == 0)
+    print(f"Deferred to the dataset load ({DEFERRED_ROOT}): {deferred_total / 1000:.1f} ms")
+
+
+def time_server(data_path: str, background: bool, timeout: float = 600) -> Dict[str, float]:
+    """Seconds from starting the server process to its first HTTP response and to /ready answering 200."""
+    port = _free_port()
+    code = SERVER_CODE.format(path=data_path, background=background, port=port)
+    url = f"http://127.0.0.1:{port}/ready"
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, '-c', code], cwd=REPO_ROOT,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    timings = {}
+    try:
+        while 'ready_s' not in timings:
+            if time.perf_counter() - start > timeout:
+                raise RuntimeError(f"server was not ready within {timeout:g} s")
+            if process.poll() is not None:
+                raise RuntimeError(f"server exited with status {process.returncode}")
+            try:
+                response = requests.get(url, timeout=5)
+            except requests.RequestException:
+                time.sleep(0.02)
+                continue
+            elapsed = time.perf_counter() - start
+            timings.setdefault('first_response_s', elapsed)
+            if response.ok:
+                timings['ready_s'] = elapsed
+            else:
+                time.sleep(0.02)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    return timings
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=_rows, default=SIZES['100k'],
+                        help=f"catalog size for the server timings: a count or one of {', '.join(SIZES)}")
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help="where generated catalogs are kept")
+    parser.add_argument('--top', type=int, default=25, help="slowest imports to list (default 25)")
+    parser.add_argument('--depth', type=int, default=2, help="deepest import nesting listed (default 2)")
+    parser.add_argument('--no-server', action='store_true', help="only report import times")
+    parser.add_argument('--output', help="write the timings JSON here")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as empty:
+        entries = import_times(STARTUP_CODE.format(path=empty))
+    print_import_report(entries, args.top, args.depth)
+    startup, deferred = split_deferred(entries)
+    results = {
+        'imports': {
+            'startup_ms': sum(c for d, c, _ in startup if d == 0) / 1000,
+            'deferred_ms': sum(c for d, c, _ in deferred if d == 0) / 1000,
+            'modules': {name: cumulative / 1000 for depth, cumulative, name in startup if depth == 0},
+        },
+    }
+
+    if not args.no_server:
+        directory = os.path.join(args.data_dir, f"startup-{args.rows}")
+        write_catalog(args.rows, directory)
+        print(f"\nServer startup on {args.rows:,} rows")
+        for label, background in (('background', True), ('foreground', False)):
+            timings = time_server(directory, background)
+            results[f"{label}_load"] = timings
+            print(f"  {label} load: first response {timings['first_response_s']:.2f} s, "
+                  f"ready {timings['ready_s']:.2f} s")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
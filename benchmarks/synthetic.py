@@ -0,0 +1,107 @@
+"""
+Synthetic earthquake catalogs with the schema of the Kaggle CSV
+("Significant Earthquake Dataset 1900-2023.csv").
+"""
+import os
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from src.country_centers import COUNTRY_CENTERS
+
+CSV_NAME = "Significant Earthquake Dataset 1900-2023.csv"
+COLUMNS = ['Time', 'Place', 'Latitude', 'Longitude', 'Depth', 'Mag', 'MagType', 'nst',
+           'gap', 'dmin', 'rms', 'net', 'ID', 'updated', 'Type']
+
+# Seismically active places get most of the events
+ACTIVE = ['Japan', 'Indonesia', 'Chile', 'Peru', 'Mexico', 'Alaska', 'California', 'Papua New Guinea',
+          'Turkey', 'Iran', 'China', 'Philippines', 'Tonga', 'Fiji', 'Vanuatu', 'Solomon Islands']
+# Place names without a ", Country" suffix, resolved by DataProcessor's manual mapping
+NAMED_PLACES = ['Assam earthquake', 'Andaman Islands', 'Valdivia earthquake', 'off the coast of Ecuador',
+                'northern Sumatra', 'Tibet border region']
+DIRECTIONS = ['N', 'NNE', 'NE', 'ENE', 'E', 'ESE', 'SE', 'SSE', 'S', 'SSW', 'SW', 'WSW', 'W', 'WNW', 'NW', 'NNW']
+
+START = pd.Timestamp('1900-01-01', tz='UTC')
+END = pd.Timestamp('2023-12-31 23:59:59', tz='UTC')
+
+
+def generate_catalog(n_rows: int, seed: int = 0, id_offset: int = 0) -> pd.DataFrame:
+    """
+    n_rows events: Gutenberg-Richter magnitudes (b = 1, M ≥ 4.5), mostly shallow
+    depths, event density growing towards the present, locations scattered
+    around country centers.
+    """
+    rng = np.random.default_rng(seed)
+    countries = np.array(list(COUNTRY_CENTERS))
+    weights = np.where(np.isin(countries, ACTIVE), 40.0, 1.0)
+    country = rng.choice(countries, size=n_rows, p=weights / weights.sum())
+    centers = np.array([COUNTRY_CENTERS[c] for c in country])
+
+    lat = np.clip(centers[:, 0] + rng.normal(0, 2.5, n_rows), -89.9, 89.9)
+    lon = (centers[:, 1] + rng.normal(0, 3.0, n_rows) + 180) % 360 - 180
+
+    # Later years are better instrumented: density grows quadratically
+    span = (END - START).value
+    time = pd.to_datetime(START.value + (np.sqrt(rng.random(n_rows)) * span).astype(np.int64), utc=True)
+    time_text = time.strftime('%Y-%m-%dT%H:%M:%S.000Z')
+
+    mag = np.minimum(4.5 + rng.exponential(1 / np.log(10), n_rows), 9.5).round(1)
+    depth = np.where(rng.random(n_rows) < 0.85, rng.exponential(25, n_rows), rng.uniform(70, 700, n_rows)).round(3)
+
+    distance = rng.integers(1, 300, n_rows)
+    direction = rng.choice(DIRECTIONS, n_rows)
+    places = (distance.astype(str).astype(object) + ' km ' + direction.astype(object)
+              + ' of Town, ' + country.astype(object))
+    named = rng.random(n_rows) < 0.002
+    places[named] = rng.choice(NAMED_PLACES, int(named.sum()))
+
+    def sparse(values, missing):
+        return np.where(rng.random(n_rows) < missing, np.nan, values)
+
+    return pd.DataFrame({
+        'Time': time_text,
+        'Place': places,
+        'Latitude': lat.round(4),
+        'Longitude': lon.round(4),
+        'Depth': depth,
+        'Mag': mag,
+        'MagType': rng.choice(['mw', 'mww', 'mb', 'ms', 'mwc'], n_rows),
+        'nst': sparse(rng.integers(10, 800, n_rows), 0.6),
+        'gap': sparse(rng.uniform(10, 250, n_rows).round(1), 0.5),
+        'dmin': sparse(rng.uniform(0, 20, n_rows).round(3), 0.6),
+        'rms': sparse(rng.uniform(0.1, 2, n_rows).round(2), 0.3),
+        'net': rng.choice(['us', 'ak', 'ci', 'nc', 'iscgem'], n_rows, p=[0.7, 0.1, 0.08, 0.07, 0.05]),
+        'ID': np.char.add('bench', (np.arange(n_rows) + id_offset).astype(str)),
+        'updated': time_text,
+        'Type': 'earthquake',
+    }, columns=COLUMNS)
+
+
+def write_catalog(n_rows: int, directory: str, seed: int = 0, chunk_rows: int = 1_000_000) -> str:
+    """
+    Write an n_rows catalog CSV into directory (in chunks, so 10M rows fit in
+    memory) and return its path. An existing catalog of the right size is reused.
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, CSV_NAME)
+    marker = path + '.rows'
+    if os.path.exists(path) and _read(marker) == f"{n_rows} {seed}":
+        return path
+
+    with open(path, 'w', newline='') as f:
+        for start in range(0, n_rows, chunk_rows):
+            rows = min(chunk_rows, n_rows - start)
+            chunk = generate_catalog(rows, seed=seed + start, id_offset=start)
+            chunk.to_csv(f, index=False, header=start == 0)
+    with open(marker, 'w') as f:
+        f.write(f"{n_rows} {seed}")
+    return path
+
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
@@ -4,9 +4,26 @@ from components.scatter_section import get_scatter_section
 from components.timeseries_section import get_timeseries_section
 from components.risk_map_section import get_risk_map
 from components.country_focus_section import get_country_focus_section
+from src.cache import versioned_cache
 import globals
 
 button_ids = globals.button_ids
+
+# Section builders by sidebar button; figures are filled in by each section's own callbacks
+SECTION_BUILDERS = {
+    'btn-map': lambda data_processor: get_global_map(),
+    'btn-scatter': get_scatter_section,
+    'btn-timeseries': get_timeseries_section,
+    'btn-riskmap': lambda data_processor: get_risk_map(),
+    'btn-country-focus': lambda data_processor: get_country_focus_section(),
+}
+
+@versioned_cache('section_layouts', maxsize=len(SECTION_BUILDERS))
+def get_section_layout(data_processor, button_id: str):
+    """Build the layout of one section, once per dataset version."""
+    builder = SECTION_BUILDERS.get(button_id, SECTION_BUILDERS['btn-map'])
+    return builder(data_processor)
+
 @callback(
     Output("main-plot-content", "children"),
     [Input(btn_id, "n_clicks") for btn_id in button_ids]
@@ -16,13 +33,6 @@ def update_main_content(*args):
     triggered = ctx.triggered[0]['prop_id'].split('.')[0] if ctx.triggered else 'btn-map'
     data_processor = globals.data_processor  # Access the global data processor
 
-    if triggered == "btn-scatter":
-        return get_scatter_section(data_processor)
-    elif triggered == "btn-timeseries":
-        return get_timeseries_section(data_processor)
-    elif triggered == "btn-riskmap":
-        return get_risk_map(data_processor)
-    elif ctx.triggered_id == "btn-country-focus":
-        return get_country_focus_section()
-    else:
-        return get_global_map()
+    if triggered not in SECTION_BUILDERS:
+        triggered = 'btn-map'
+    return get_section_layout(data_processor, triggered)
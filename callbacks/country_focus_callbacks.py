@@ -1,16 +1,48 @@
-from dash import Output, Input, State, callback
-import pandas as pd
-from visualizations.plots.country_focus import create_country_focus_view
-from globals import data_processor
+from dash import Output, Input, State, callback, callback_context, no_update
+from src.country_centers import get_country_center, get_country_zoom
+from src.spatial_index import bounds_from_center_zoom, viewport_from_relayout
+from visualizations.encoding import encode_figure
+import globals
 
 @callback(
     Output('country-focus-map', 'figure'),
     Input('country-focus-dropdown', 'value'),
     Input('year-mode-toggle', 'value'),
     Input('country-focus-year-slider', 'value'),
-    Input('country-focus-year-range-slider', 'value')
+    Input('country-focus-year-range-slider', 'value'),
+    Input('country-focus-viewport-mode', 'value'),
+    Input('country-focus-map', 'relayoutData')
 )
-def update_country_focus_map(selected_country, mode, single_year, year_range):
+def update_country_focus_map(selected_country, mode, single_year, year_range, viewport_mode, relayout_data):
+    # pandas and plotly express are imported on first use to keep startup light
+    import pandas as pd
+    from visualizations.plots.country_focus import create_country_focus_view
+
+    data_processor = globals.data_processor
+    viewport_enabled = bool(viewport_mode) and 'viewport' in viewport_mode
+    density = bool(viewport_mode) and 'density' in viewport_mode
+    triggered_id = callback_context.triggered_id
+
+    # Pan/zoom only matters in viewport mode
+    if triggered_id == 'country-focus-map' and not viewport_enabled:
+        return no_update
+
+    bounds, zoom = None, None
+    if viewport_enabled:
+        viewport = None
+        # A new country starts from its default view, not the previous country's
+        if triggered_id != 'country-focus-dropdown':
+            viewport = viewport_from_relayout(relayout_data)
+        if viewport is None:
+            if triggered_id == 'country-focus-map':
+                return no_update
+            center = get_country_center(selected_country) if selected_country else None
+            # Countries without a zoom level get mapbox's default, as in create_country_focus_view
+            zoom = (get_country_zoom(selected_country) or 1) if center else 1
+            center = center or (0, 0)
+            viewport = bounds_from_center_zoom({'lat': center[0], 'lon': center[1]}, zoom), zoom
+        bounds, zoom = viewport
+
     # Set default start and end dates
     start_date, end_date = None, None
 
@@ -24,17 +56,25 @@ def update_country_focus_map(selected_country, mode, single_year, year_range):
 
     # If no country is selected, still filter by date
     if not selected_country:
-        return create_country_focus_view(
+        fig = create_country_focus_view(
             data_processor=data_processor,
             country=None,  # or '' if you prefer
             start_date=start_date,
-            end_date=end_date
+            end_date=end_date,
+            bounds=bounds,
+            zoom=zoom,
+            density=density
+        )
+    else:
+        # Otherwise, pass country and dates
+        fig = create_country_focus_view(
+            data_processor=data_processor,
+            country=selected_country,
+            start_date=start_date,
+            end_date=end_date,
+            bounds=bounds,
+            zoom=zoom,
+            density=density
         )
 
-    # Otherwise, pass country and dates
-    return create_country_focus_view(
-        data_processor=data_processor,
-        country=selected_country,
-        start_date=start_date,
-        end_date=end_date
-    )
+    return encode_figure(fig, 'map', source='update_country_focus_map')
@@ -1,5 +1,5 @@
 from dash import Output, Input, callback
-from globals import data_processor
+import globals
 
 @callback(
     Output('country-focus-dropdown', 'options'),
@@ -8,13 +8,15 @@ from globals import data_processor
     Input('country-focus-year-range-slider', 'value')
 )
 def update_country_dropdown(mode, single_year, year_range):
-    df = data_processor.get_filtered_data()
+    tables = globals.data_processor.country_tables
+    if tables is None:
+        return []
 
+    start_year, end_year = None, None
     if mode == 'single' and single_year:
-        df = df[df['year'] == single_year]
+        start_year, end_year = single_year, single_year
     elif mode == 'range' and year_range:
         start_year, end_year = year_range
-        df = df[(df['year'] >= start_year) & (df['year'] <= end_year)]
 
-    countries = df['country'].dropna().unique()
-    return [{'label': c, 'value': c} for c in sorted(countries)]
+    countries = tables.countries_with_events(start_year, end_year)
+    return [{'label': c, 'value': c} for c in countries]
@@ -1,12 +1,17 @@
 from dash import callback, Output, Input
-from visualizations.plots.world_map import create_global_earthquake_map
+from visualizations.plots.world_map import create_global_earthquake_map, create_global_heatmap
+from visualizations.encoding import encode_figure
 import globals
 
-data_processor = globals.data_processor  # Access the global data processor
-
 @callback(
     Output('global-map', 'figure'),
-    Input('year-slider', 'value')
+    Input('year-slider', 'value'),
+    Input('global-map-mode', 'value')
 )
-def update_map(year):
-    return create_global_earthquake_map(data_processor, selected_year=year)
+def update_map(year, mode='events'):
+    data_processor = globals.data_processor  # Access the global data processor
+    if mode == 'heatmap':
+        fig = create_global_heatmap(data_processor, selected_year=year)
+    else:
+        fig = create_global_earthquake_map(data_processor, selected_year=year)
+    return encode_figure(fig, 'map', source='update_map')
@@ -1,13 +1,29 @@
-from dash import callback, Output, Input
-from visualizations.plots.risk_map import create_global_risk_map
+from dash import callback, callback_context, Output, Input, Patch, no_update
+from visualizations.plots.risk_map import create_global_risk_map, FAULT_LINE_TRACE_INDEX, LABEL_TRACE_INDEX
+from visualizations.encoding import encode_figure
 import globals
 
-data_processor = globals.data_processor  # Use global DataProcessor
-
 @callback(
     Output('global-risk-map', 'figure'),
     Input('toggle-faultlines', 'value')
 )
 def update_risk_map(selected_options):
-    show_fault_lines = 'fault' in selected_options if selected_options else False
-    return create_global_risk_map(data_processor, metric='count', show_fault_lines=show_fault_lines)
+    data_processor = globals.data_processor  # Use global DataProcessor
+    selected_options = selected_options or []
+    show_fault_lines = 'fault' in selected_options
+    show_labels = 'labels' in selected_options
+
+    # Initial render: send the (cached) full figure
+    if not callback_context.triggered_id:
+        fig = create_global_risk_map(data_processor, metric='count',
+                                     show_fault_lines=show_fault_lines, show_labels=show_labels)
+        return encode_figure(fig, 'map', source='update_risk_map')
+
+    # The overlays are already part of the figure, so a toggle only flips their visibility
+    if data_processor.processed_data is None or data_processor.processed_data.empty:
+        return no_update
+
+    fig = Patch()
+    fig['data'][FAULT_LINE_TRACE_INDEX]['visible'] = show_fault_lines
+    fig['data'][LABEL_TRACE_INDEX]['visible'] = show_labels
+    return fig
@@ -1,10 +1,22 @@
 from dash import callback, Output, Input , html
-import plotly.express as px
-import plotly.graph_objects as go
-from visualizations.plots.scatter import create_scatter_plot
+import math
+from visualizations.encoding import encode_figure
 import globals
 
-data_processor = globals.data_processor  # Access the global data processor
+DEPTH_CLASS_NAMES = {
+    'shallow': 'Shallow (≤70 km)',
+    'intermediate': 'Intermediate (70–300 km)',
+    'deep': 'Deep (>300 km)'
+}
+
+def format_depth_class(stats, i):
+    """One summary line: count plus magnitude mean / median / 90th percentile."""
+    label = stats['labels'][i]
+    line = f"{DEPTH_CLASS_NAMES[label]}: {int(stats['count'][i])}"
+    if not math.isnan(stats['mean'][i]):
+        line += (f"  (mean M{stats['mean'][i]:.2f}, median M{stats['percentiles'][50][i]:.1f},"
+                 f" 90th pct M{stats['percentiles'][90][i]:.1f}, max M{stats['max'][i]:.1f})")
+    return line
 
 @callback(
     Output('scatter-plot', 'figure'),
@@ -13,6 +25,10 @@ data_processor = globals.data_processor  # Access the global data processor
      Input('scatter-country-filter', 'value')]
 )
 def update_scatter_plot(year_range, country_filter):
+    # The plot module pulls in pandas; imported on first use to keep startup light
+    from visualizations.plots.scatter import create_scatter_plot
+
+    data_processor = globals.data_processor  # Access the global data processor
     start_year, end_year = year_range if year_range else (None, None)
 
     fig, counts = create_scatter_plot(
@@ -22,11 +38,12 @@ def update_scatter_plot(year_range, country_filter):
         end_year=end_year
     )
 
-    summary_text = f"""
-    Total Earthquakes: {counts['total']}  
-    Shallow (≤70 km): {counts['shallow']}  
-    Intermediate (70–300 km): {counts['intermediate']}  
-    Deep (>300 km): {counts['deep']}
-    """
+    stats = counts['stats']
+    if stats is None:
+        class_lines = [f"{DEPTH_CLASS_NAMES[label]}: 0" for label in DEPTH_CLASS_NAMES]
+    else:
+        class_lines = [format_depth_class(stats, i) for i in range(len(stats['labels']))]
+
+    summary_text = "\n".join([f"Total Earthquakes: {counts['total']}"] + class_lines)
 
-    return fig, html.Pre(summary_text, style={'whiteSpace': 'pre-wrap'})
+    return encode_figure(fig, 'chart', source='update_scatter_plot'), html.Pre(summary_text, style={'whiteSpace': 'pre-wrap'})
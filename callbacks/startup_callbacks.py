@@ -0,0 +1,17 @@
+from dash import callback, Output, Input, no_update
+from components.layout import create_layout
+from components.loading import get_loading_layout
+import globals
+
+@callback(
+    Output('startup-placeholder', 'children'),
+    Input('startup-poll', 'n_intervals'),
+    prevent_initial_call=True
+)
+def show_dashboard(_):
+    if globals.load_error:
+        return get_loading_layout(globals.load_error).children
+    if not globals.data_ready.is_set():
+        return no_update
+    # Replaces the poll too, so it stops
+    return create_layout(globals.data_processor)
@@ -1,10 +1,35 @@
-from dash import callback, Output, Input
-from visualizations.plots.time_series import create_count_time_series_plot, create_magnitude_time_series_plot
+from dash import callback, callback_context, no_update, Output, Input
+from visualizations.encoding import encode_figure
 import globals
 import calendar
-import pandas as pd
 
-data_processor = globals.data_processor
+def _selected_window(mode, year, month, year_range):
+    """(start, end) dates of the year, month or year range picked in the controls."""
+    if mode == 'single':
+        if month == "all":
+            return f"{year}-01-01", f"{year}-12-31"
+        last_day = calendar.monthrange(year, int(month))[1]
+        return f"{year}-{int(month):02d}-01", f"{year}-{int(month):02d}-{last_day}"
+    return f"{year_range[0]}-01-01", f"{year_range[1]}-12-31"
+
+def _plot_window(graph_id, relayout_data, selected):
+    """
+    Window to plot: the zoomed x range (within the selection) when the
+    graph's zoom triggered the callback, else the selected window. None when
+    a relayout changed nothing on the time axis.
+    """
+    from src.temporal_pyramid import time_window_from_relayout
+
+    if callback_context.triggered_id != graph_id:
+        return selected
+    zoomed = time_window_from_relayout(relayout_data)
+    if zoomed is not None:
+        # Panning past the selection shows nothing outside it
+        return max(zoomed[0], selected[0]), min(zoomed[1], selected[1])
+    # Double-click resets the axes back to the whole selection
+    if relayout_data and relayout_data.get('xaxis.autorange'):
+        return selected
+    return None
 
 @callback(
     Output('timeseries-count-plot', 'figure'),
@@ -14,37 +39,38 @@ data_processor = globals.data_processor
         Input('timeseries-month', 'value'),
         Input('timeseries-year-range', 'value'),
         Input('timeseries-country', 'value'),
-        Input('timeseries-options', 'value')
+        Input('timeseries-options', 'value'),
+        Input('timeseries-count-plot', 'relayoutData')
     ]
 )
-def update_count_timeseries_plot(mode, year, month, year_range, country, options):
+def update_count_timeseries_plot(mode, year, month, year_range, country, options, relayout_data):
+    # The plot module pulls in pandas; imported on first use to keep startup light
+    import pandas as pd
+    from visualizations.plots.time_series import create_count_time_series_plot
+
+    data_processor = globals.data_processor
     show_cumulative = 'cumulative' in options
     show_moving_avg = 'moving_avg' in options
 
-    if mode == 'single':
-        if month == "all":
-            start_str = f"{year}-01-01"
-            end_str = f"{year}-12-31"
-        else:
-            last_day = calendar.monthrange(year, int(month))[1]
-            start_str = f"{year}-{int(month):02d}-01"
-            end_str = f"{year}-{int(month):02d}-{last_day}"
-    else:
-        start_str = f"{year_range[0]}-01-01"
-        end_str = f"{year_range[1]}-12-31"
-
-    start_date = pd.to_datetime(start_str).tz_localize("UTC")
-    end_date = pd.to_datetime(end_str).tz_localize("UTC")
+    selected = [pd.to_datetime(date).tz_localize("UTC") for date in _selected_window(mode, year, month, year_range)]
+    window = _plot_window('timeseries-count-plot', relayout_data, selected)
+    if window is None:
+        return no_update
+    start_date, end_date = window
 
-    return create_count_time_series_plot(
+    fig = create_count_time_series_plot(
         data_processor=data_processor,
         start_date=start_date,
         end_date=end_date,
         country=country,
         show_moving_avg=show_moving_avg,
         show_cumulative=show_cumulative,
-        mode=mode 
+        mode=mode,
+        cumulative_start=selected[0],
+        # A zoom keeps its range until another control changes
+        uirevision=repr((mode, year, month, year_range, country, options))
     )
+    return encode_figure(fig, 'chart', source='update_count_timeseries_plot')
 
 @callback(
     Output('timeseries-magnitude-plot', 'figure'),
@@ -54,32 +80,30 @@ def update_count_timeseries_plot(mode, year, month, year_range, country, options
         Input('timeseries-month', 'value'),
         Input('timeseries-year-range', 'value'),
         Input('timeseries-country', 'value'),
-        Input('timeseries-options', 'value')
+        Input('timeseries-options', 'value'),
+        Input('timeseries-magnitude-plot', 'relayoutData')
     ]
 )
-def update_magnitude_timeseries_plot(mode, year, month, year_range, country, options):
-    show_moving_avg = 'moving_avg' in options
+def update_magnitude_timeseries_plot(mode, year, month, year_range, country, options, relayout_data):
+    import pandas as pd
+    from visualizations.plots.time_series import create_magnitude_time_series_plot
 
-    if mode == 'single':
-        if month == "all":
-            start_str = f"{year}-01-01"
-            end_str = f"{year}-12-31"
-        else:
-            last_day = calendar.monthrange(year, int(month))[1]
-            start_str = f"{year}-{int(month):02d}-01"
-            end_str = f"{year}-{int(month):02d}-{last_day}"
-    else:
-        start_str = f"{year_range[0]}-01-01"
-        end_str = f"{year_range[1]}-12-31"
+    data_processor = globals.data_processor
+    show_moving_avg = 'moving_avg' in options
 
-    start_date = pd.to_datetime(start_str).tz_localize("UTC")
-    end_date = pd.to_datetime(end_str).tz_localize("UTC")
+    selected = [pd.to_datetime(date).tz_localize("UTC") for date in _selected_window(mode, year, month, year_range)]
+    window = _plot_window('timeseries-magnitude-plot', relayout_data, selected)
+    if window is None:
+        return no_update
+    start_date, end_date = window
 
-    return create_magnitude_time_series_plot(
+    fig = create_magnitude_time_series_plot(
         data_processor=data_processor,
         start_date=start_date,
         end_date=end_date,
         country=country,
         show_moving_avg=show_moving_avg,
-        mode=mode 
+        mode=mode,
+        uirevision=repr((mode, year, month, year_range, country, options))
     )
+    return encode_figure(fig, 'chart', source='update_magnitude_timeseries_plot')
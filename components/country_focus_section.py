@@ -56,6 +56,17 @@ def get_country_focus_section():
             )
         ]),
 
+        # Viewport mode: only load the events inside the visible map area;
+        # density: draw the server-rendered density tiles under the events
+        dcc.Checklist(
+            id='country-focus-viewport-mode',
+            options=[{'label': 'Load only the visible area', 'value': 'viewport'},
+                     {'label': 'Density layer', 'value': 'density'}],
+            value=[],
+            inline=True,
+            style={'marginTop': '10px', 'marginBottom': '10px'}
+        ),
+
         # Graph
         dcc.Graph(id='country-focus-map', style={'height': '500px'})
     ], style={'padding': '20px'})
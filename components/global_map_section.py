@@ -34,6 +34,17 @@ def get_global_map():
                 marks={y: str(y) for y in range(1900, 2024, 20)},
                 tooltip={"placement": "bottom", "always_visible": True},
                 included=False
+            ),
+            # Heatmap: events per 1° cell from the precomputed activity cube
+            dcc.RadioItems(
+                id='global-map-mode',
+                options=[
+                    {'label': 'Events', 'value': 'events'},
+                    {'label': 'Heatmap', 'value': 'heatmap'}
+                ],
+                value='events',
+                labelStyle={'display': 'inline-block', 'marginRight': '15px'},
+                style={'marginTop': '10px'}
             )
         ], style={
             'width': '800px',
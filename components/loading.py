@@ -0,0 +1,14 @@
+from dash import html, dcc
+
+def get_loading_layout(error=None):
+    """Shown until the dataset has loaded; the poll swaps in the dashboard when it is ready."""
+    message = f"Loading the earthquake dataset failed: {error}" if error else "Loading earthquake data…"
+    return html.Div([
+        html.H3("Earthquake Analysis", style={'color': '#2c3e50'}),
+        html.P(message, style={'color': '#c0392b' if error else '#7f8c8d'}),
+        dcc.Interval(id='startup-poll', interval=1000, disabled=bool(error))
+    ], id='startup-placeholder', style={
+        'padding': '40px',
+        'fontFamily': 'Arial, sans-serif',
+        'textAlign': 'center'
+    })
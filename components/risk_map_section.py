@@ -1,10 +1,7 @@
 from dash import html, dcc
-from visualizations.plots.risk_map import create_global_risk_map
-
-def get_risk_map(data_processor):
-    # Create the figure
-    fig = create_global_risk_map(data_processor, metric='count')
 
+def get_risk_map():
+    # The figure is filled in by update_risk_map when the section renders
     return html.Div([
         html.Div([
             html.H3("Global Risk Map: High-Risk Zones and Fault Lines", style={
@@ -27,15 +24,17 @@ def get_risk_map(data_processor):
 
         dcc.Checklist(
             id='toggle-faultlines',
-            options=[{'label': 'Show Fault Lines', 'value': 'fault'}],
-            value=[], # default: do NOT show fault lines
+            options=[
+                {'label': 'Show Fault Lines', 'value': 'fault'},
+                {'label': 'Show Labels', 'value': 'labels'}
+            ],
+            value=['labels'], # default: labels only, no fault lines
             inline=True,
             style={'textAlign': 'center', 'marginBottom': '10px'}
         ),
 
         dcc.Graph(
             id='global-risk-map',
-            figure=fig,
             style={
                 'height': '600px',
                 'width': '90%',
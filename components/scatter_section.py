@@ -2,17 +2,10 @@ from dash import html, dcc
 
 def get_scatter_section(data_processor):
     countries = [{'label': 'All Countries', 'value': 'all'}] + [
-    {'label': country, 'value': country}
-    for country in sorted(
-        data_processor.get_filtered_data()['country']
-        .dropna()
-        .unique()
-    )
-]
+        {'label': country, 'value': country}
+        for country in data_processor.get_countries()
+    ]
 
-
-
-    
     return html.Div([
         html.H3("Depth vs Magnitude Scatter Plot", style={'color': '#2c3e50'}),
         html.P(
@@ -1,10 +1,8 @@
 from dash import html, dcc
-import pandas as pd
 import numpy as np
 def get_timeseries_section(data_processor):
-    df = data_processor.get_filtered_data()
-    years = sorted(df['year'].dropna().unique())
-    countries = sorted(df['country'].dropna().unique())
+    years = data_processor.get_years()
+    countries = data_processor.get_countries()
     year_max = max(years) if years else 2023 
     year_min = min(years) if years else 1900
     num_marks = 7
@@ -55,8 +53,8 @@ def get_timeseries_section(data_processor):
             html.Label("Year Range:", style={'color': '#2c3e50', 'fontWeight': 'bold'}),
             dcc.RangeSlider(
                 id='timeseries-year-range',
-                min=int(min(years)),
-                max=int(max(years)),
+                min=int(year_min),
+                max=int(year_max),
                 step=1,
                 value=[year_max - 5, year_max],  # default range (last 5 years)
                 marks={int(y): str(y) for y in mark_years},
@@ -79,7 +77,7 @@ def get_timeseries_section(data_processor):
                 id='timeseries-options',
                 options=[
                     {'label': 'Cumulative View', 'value': 'cumulative'},
-                    {'label': '5-Year Moving Average', 'value': 'moving_avg'}
+                    {'label': 'Moving Average', 'value': 'moving_avg'}
                 ],
                 value=[],
                 labelStyle={'display': 'inline-block', 'marginRight': '20px'}
@@ -1,3 +1,13 @@
 # globals.py
+import threading
+
+# The published dataset snapshot (see src/snapshot.py). It is replaced, never
+# modified, when the dataset reloads: callbacks read it once when they start
+# and use that object throughout
 data_processor = None
-button_ids = ['btn-map', 'btn-scatter', 'btn-timeseries', 'btn-riskmap', 'btn-country-focus']
\ No newline at end of file
+# The SnapshotManager that publishes data_processor
+snapshots = None
+data_ready = threading.Event()
+# "<ExceptionType>: <message>" when loading the dataset failed
+load_error = None
+button_ids = ['btn-map', 'btn-scatter', 'btn-timeseries', 'btn-riskmap', 'btn-country-focus']
@@ -0,0 +1,46 @@
+import gc
+import multiprocessing
+import os
+import signal
+import time
+
+# wsgi.py builds the app; preloading runs it once in the master before forking
+wsgi_app = 'wsgi:server'
+preload_app = True
+
+bind = os.environ.get('EQ_BIND', '0.0.0.0:8050')
+workers = int(os.environ.get('EQ_WORKERS', multiprocessing.cpu_count()))
+# Callbacks are mostly numpy/pandas work, which releases the GIL for the heavy parts
+threads = int(os.environ.get('EQ_THREADS', 4))
+worker_class = 'gthread' if threads > 1 else 'sync'
+timeout = int(os.environ.get('EQ_TIMEOUT', 120))
+
+accesslog = '-'
+
+def when_ready(server):
+    # Move everything the preload created out of the collector's reach; otherwise
+    # the first collection in each worker touches every object and un-shares its pages
+    gc.freeze()
+    server.log.info("Froze %d preloaded objects before forking %d workers", gc.get_freeze_count(), workers)
+    # Only the master watches the dataset file: it builds each new snapshot once,
+    # then replaces the workers so they are forked from it (threads don't survive
+    # fork, and workers rebuilding it themselves would each hold a copy)
+    import globals
+    if globals.snapshots is not None:
+        globals.snapshots.start_watching(on_publish=lambda: replace_workers(server))
+
+def pre_fork(server, worker):
+    # A fork in the middle of a build could copy a lock the build thread holds
+    import globals
+    if globals.snapshots is not None:
+        globals.snapshots.wait_idle()
+
+def replace_workers(server):
+    """Stop the workers one at a time, gracefully, each once the last one's replacement is up."""
+    gc.freeze()
+    for pid in list(server.WORKERS):
+        server.log.info("Replacing worker %s with one forked from the new dataset snapshot", pid)
+        server.kill_worker(pid, signal.SIGTERM)
+        deadline = time.monotonic() + server.cfg.graceful_timeout + 5
+        while (pid in server.WORKERS or len(server.WORKERS) < server.num_workers) and time.monotonic() < deadline:
+            time.sleep(0.1)
@@ -0,0 +1,137 @@
+from functools import wraps
+from flask import Blueprint, Response, jsonify, request
+import globals
+
+api_blueprint = Blueprint('api', __name__, url_prefix='/api/v1')
+
+def _json(body: str, tag: str) -> Response:
+    response = Response(body, content_type='application/json')
+    response.set_etag(tag)
+    # Cacheable, but revalidated: the dataset can be reloaded at any time
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def _endpoint(view):
+    """
+    Pass the current dataset snapshot to view, answer 503 until one is
+    loaded, 304 when the client's ETag is still current and 400 on bad
+    parameters (ValueError, or its status attribute).
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        # One snapshot for the whole request, even if the dataset is reloaded meanwhile
+        data_processor = globals.data_processor
+        if not globals.data_ready.is_set() or data_processor is None:
+            return jsonify({'status': 'loading', 'error': globals.load_error}), 503
+
+        from src.api import etag
+
+        tag = etag(data_processor)
+        if request.if_none_match.contains(tag):
+            response = Response(status=304)
+            response.set_etag(tag)
+            return response
+        try:
+            body = view(data_processor, *args, **kwargs)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), getattr(e, 'status', 400)
+        if body is None:
+            return jsonify({'error': 'not found'}), 404
+        return _json(body, tag)
+    return wrapper
+
+def _reject_filters(*names):
+    """Answer 400 for /export filters an endpoint cannot apply, rather than ignore them."""
+    given = [name for name in names if request.args.get(name)]
+    if given:
+        raise ValueError(f"{request.path} does not take {', '.join(given)}")
+
+@api_blueprint.route('/events')
+@_endpoint
+def events(data_processor):
+    """
+    Events matching start, end, min_mag, max_mag, country and bounds (as for
+    /export), limit per page; pass the returned next_cursor as cursor, with
+    the same filters, for the following page.
+    """
+    from src.api import events_page, page_size
+    from src.export import parse_columns, parse_filters
+
+    filters = parse_filters(request.args)
+    columns = parse_columns(request.args.get('columns'), data_processor)
+    return events_page(data_processor, filters, columns, page_size(request.args.get('limit')),
+                       request.args.get('cursor'))
+
+@api_blueprint.route('/timeseries')
+@_endpoint
+def timeseries(data_processor):
+    """
+    Count, mean/max magnitude and mean depth per day, week, month or year
+    (get_time_series_data) for start, end, country and a magnitude class;
+    min_mag, max_mag and bounds answer 400.
+    """
+    from src.api import MAGNITUDE_FILTERS, TIMESERIES_RESOLUTIONS, aggregate
+    from src.export import parse_filters
+
+    _reject_filters('min_mag', 'max_mag', 'bounds')
+    magnitude = request.args.get('magnitude', 'all')
+    if magnitude not in MAGNITUDE_FILTERS:
+        raise ValueError(f"magnitude must be one of {', '.join(MAGNITUDE_FILTERS)}")
+    resolution = request.args.get('resolution', 'month')
+    if resolution not in TIMESERIES_RESOLUTIONS:
+        raise ValueError(f"resolution must be one of {', '.join(TIMESERIES_RESOLUTIONS)}")
+    filters = parse_filters(request.args)
+    return aggregate(data_processor, 'timeseries', magnitude=magnitude, resolution=resolution,
+                     **{k: v for k, v in filters.items() if k in ('start_date', 'end_date', 'country')})
+
+@api_blueprint.route('/risk')
+@_endpoint
+def risk(data_processor):
+    """Per-country count and mean/max magnitude (get_risk_map_data)."""
+    from src.api import RISK_METRICS, aggregate
+
+    metric = request.args.get('metric', 'count')
+    if metric not in RISK_METRICS:
+        raise ValueError(f"metric must be one of {', '.join(RISK_METRICS)}")
+    return aggregate(data_processor, 'risk', metric=metric)
+
+@api_blueprint.route('/countries/<country>')
+@_endpoint
+def country_statistics(data_processor, country):
+    """Event count, magnitude, depth and date range of a country (get_country_statistics)."""
+    from src.api import aggregate
+
+    return aggregate(data_processor, 'country', country=country)
+
+@api_blueprint.route('/significant')
+@_endpoint
+def significant(data_processor):
+    """The largest events of magnitude 6 and above (get_significant_earthquakes), up to limit (100)."""
+    from src.api import aggregate
+
+    try:
+        limit = int(request.args.get('limit', 100))
+    except ValueError:
+        raise ValueError("limit must be an integer")
+    if not 1 <= limit <= 100:
+        raise ValueError("limit must be between 1 and 100")
+    return aggregate(data_processor, 'significant', limit=limit)
+
+@api_blueprint.route('/activity')
+@_endpoint
+def activity(data_processor):
+    """
+    Event count, largest magnitude and summed energy per 1° cell (the
+    activity cube) in bounds, between start and end (whole months) and at
+    or above min_mag (at 0.5 steps). The cube has no country or upper
+    magnitude, so country and max_mag answer 400.
+    """
+    from src.api import aggregate
+    from src.export import parse_filters
+
+    _reject_filters('max_mag', 'country')
+    filters = parse_filters(request.args)
+    min_mag = filters.get('magnitude_range', (None,))[0]
+    return aggregate(data_processor, 'activity', bounds=filters.get('bounds'),
+                     start_date=filters.get('start_date'), end_date=filters.get('end_date'),
+                     min_mag=None if min_mag == float('-inf') else min_mag)
@@ -0,0 +1,51 @@
+from flask import Blueprint, Response, jsonify, request
+import globals
+
+export_blueprint = Blueprint('export', __name__)
+
+@export_blueprint.route('/export')
+@export_blueprint.route('/export.<fmt>')
+def export(fmt=None):
+    """
+    Stream the events matching the dashboard filters as CSV, NDJSON or GeoJSON.
+
+    Query parameters: format (csv, ndjson or geojson, or the URL suffix),
+    start, end, min_mag, max_mag, country, bounds=min_lat,max_lat,min_lon,max_lon
+    and columns (comma-separated). The response is gzipped for clients that
+    accept it; gzip=1 downloads a .gz file instead.
+    """
+    # One snapshot for the whole response, even if the dataset is reloaded meanwhile
+    data_processor = globals.data_processor
+    if not globals.data_ready.is_set() or data_processor is None:
+        return jsonify({'status': 'loading', 'error': globals.load_error}), 503
+
+    from src.export import FORMATS, parse_columns, parse_filters, stream_export
+
+    fmt = (fmt or request.args.get('format') or 'csv').lower()
+    if fmt not in FORMATS:
+        return jsonify({'error': f"format must be one of {', '.join(FORMATS)}"}), 400
+    if data_processor.processed_data is None or data_processor.processed_data.empty:
+        return jsonify({'error': 'no dataset loaded'}), 404
+    try:
+        filters = parse_filters(request.args)
+        columns = parse_columns(request.args.get('columns'), data_processor)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    content_type, extension = FORMATS[fmt]
+    filename = f"earthquakes.{extension}"
+    headers = {'Vary': 'Accept-Encoding', 'X-Dataset-Version': data_processor.version}
+    if request.args.get('gzip', '').lower() in ('1', 'true', 'yes'):
+        compress = True
+        content_type, filename = 'application/gzip', filename + '.gz'
+    else:
+        compress = 'gzip' in request.accept_encodings
+        if compress:
+            headers['Content-Encoding'] = 'gzip'
+    headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+
+    try:
+        body = stream_export(data_processor, filters, columns, fmt, compress=compress)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return Response(body, content_type=content_type, headers=headers)
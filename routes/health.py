@@ -0,0 +1,13 @@
+from flask import Blueprint, jsonify
+import globals
+
+health_blueprint = Blueprint('health', __name__)
+
+@health_blueprint.route('/ready')
+def ready():
+    """200 once the dataset is loaded and warmed, 503 while it loads or when loading failed."""
+    if globals.data_ready.is_set():
+        return jsonify({'status': 'ready', 'version': globals.data_processor.version})
+    if globals.load_error:
+        return jsonify({'status': 'failed', 'error': globals.load_error}), 503
+    return jsonify({'status': 'loading'}), 503
@@ -0,0 +1,10 @@
+from flask import Blueprint, Response
+from src.metrics import render_metrics
+
+metrics_blueprint = Blueprint('metrics', __name__)
+
+@metrics_blueprint.route('/metrics')
+def metrics():
+    # Each worker process keeps its own counters; scrape workers individually
+    # or aggregate them in Prometheus
+    return Response(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,59 @@
+import hmac
+import os
+import pstats
+from flask import Blueprint, Response, abort, jsonify, request, send_file
+from src.profiling import list_profiles, profile_path, profile_summary, settings
+
+# Admin routes are only served when EQ_ADMIN_TOKEN is set; requests must send it
+# in the X-Admin-Token header
+ADMIN_TOKEN = os.environ.get('EQ_ADMIN_TOKEN', '')
+
+profiling_blueprint = Blueprint('profiling', __name__, url_prefix='/admin')
+
+@profiling_blueprint.before_request
+def require_admin_token():
+    if not ADMIN_TOKEN:
+        abort(404)
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN):
+        abort(403)
+
+@profiling_blueprint.route('/profiling', methods=['GET', 'POST'])
+def profiling_settings():
+    """
+    Read or change the sampling settings of the worker process that handles
+    the request (its pid is in the reply). Under gunicorn every worker keeps
+    its own settings, so a POST changes one worker only; set EQ_PROFILE,
+    EQ_PROFILE_RATE and EQ_PROFILE_CALLBACKS to configure them all.
+    """
+    if request.method == 'POST':
+        body = request.get_json(silent=True) or {}
+        try:
+            settings.update(
+                enabled=body.get('enabled'),
+                rate=float(body['rate']) if 'rate' in body else None,
+                callbacks=body.get('callbacks')
+            )
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': str(e)}), 400
+    return jsonify(settings.to_dict())
+
+@profiling_blueprint.route('/profiles')
+def profiles():
+    limit = request.args.get('limit', 50, type=int)
+    return jsonify({'settings': settings.to_dict(), 'profiles': list_profiles(limit)})
+
+@profiling_blueprint.route('/profiles/<name>')
+def profile(name):
+    """pstats report of one profile (?sort=tottime, ?limit=N), or the raw .prof with ?download=1."""
+    if request.args.get('download'):
+        path = profile_path(name)
+        if path is None:
+            abort(404)
+        return send_file(path, as_attachment=True, download_name=name + '.prof')
+    sort = request.args.get('sort', 'cumulative')
+    if sort not in pstats.Stats.sort_arg_dict_default:
+        return jsonify({'error': f"unknown sort key {sort!r}"}), 400
+    report = profile_summary(name, sort=sort, limit=request.args.get('limit', 40, type=int))
+    if report is None:
+        abort(404)
+    return Response(report, content_type='text/plain; charset=utf-8')
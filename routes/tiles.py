@@ -0,0 +1,48 @@
+from flask import Blueprint, Response, jsonify, request
+import globals
+
+tiles_blueprint = Blueprint('tiles', __name__)
+
+@tiles_blueprint.route('/tiles/<int:z>/<int:x>/<int:y>.<fmt>')
+def tile(z, x, y, fmt):
+    """
+    Web Mercator tile of event density (metric=density) or largest magnitude
+    (metric=max_mag), as a 256 px PNG or a sparse JSON grid of `size` cells
+    across (default 64). Filters: year or start_year/end_year, min_mag,
+    max_mag, min_depth, max_depth, country.
+    """
+    data_processor = globals.data_processor
+    if not globals.data_ready.is_set() or data_processor is None:
+        return jsonify({'status': 'loading', 'error': globals.load_error}), 503
+
+    from src.tiles import METRICS, parse_filters, render_json, render_png, tile_exists
+
+    if fmt not in ('png', 'json') or not tile_exists(z, x, y):
+        return jsonify({'error': 'no such tile'}), 404
+    metric = request.args.get('metric', 'density')
+    if metric not in METRICS:
+        return jsonify({'error': f"metric must be one of {', '.join(METRICS)}"}), 400
+    try:
+        filters = parse_filters(request.args)
+        size = int(request.args.get('size', 64))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if not 1 <= size <= 256:
+        return jsonify({'error': 'size must be between 1 and 256'}), 400
+
+    tag = f"{data_processor.version}"
+    if request.if_none_match.contains(tag):
+        response = Response(status=304)
+    elif fmt == 'png':
+        response = Response(render_png(data_processor, z, x, y, metric, filters), content_type='image/png')
+    else:
+        response = Response(render_json(data_processor, z, x, y, metric, filters, size),
+                            content_type='application/json')
+    response.set_etag(tag)
+    # Layers built by tile_layer() put the dataset version in the URL, so
+    # their tiles never change; other URLs are revalidated
+    if request.args.get('v') == data_processor.version:
+        response.headers['Cache-Control'] = 'public, max-age=86400'
+    else:
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
@@ -0,0 +1,197 @@
+import os
+import tempfile
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Bump when the arrays change; cached cubes of other schemas are rebuilt
+SCHEMA_VERSION = 1
+CUBE_DIR = os.environ.get('EQ_CUBE_DIR', os.path.join(tempfile.gettempdir(), 'eq-cubes'))
+# Cubes of older dataset versions are deleted past this many files
+CUBES_KEPT = 4
+
+N_ROWS, N_COLS = 180, 360
+# Magnitude classes: below 2.0, then 0.5 wide up to 9.0 and above. Thresholds
+# are answered at these edges
+MAG_EDGES = np.arange(2.0, 9.5, 0.5)
+
+
+def seismic_energy(mag):
+    """Radiated energy in joules (Gutenberg-Richter: log10 E = 1.5 M + 4.8)."""
+    return 10 ** (1.5 * np.asarray(mag, dtype=float) + 4.8)
+
+
+def _prune(directory: str, keep: int):
+    """Delete all but the `keep` most recently used cube files."""
+    paths = [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith('.npz')]
+    for path in sorted(paths, key=os.path.getmtime)[:-keep]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+class ActivityCube:
+    """
+    Event count, largest magnitude and summed energy per 1° x 1° cell, month
+    and magnitude class.
+
+    Only non-empty entries are kept, sorted by run (one magnitude class in one
+    cell) and month. Counts and energy are stored as prefix sums along that
+    order, so the total of a run over any month window is the difference of
+    two values found by binary search. Queries cost O(cells x classes), not
+    O(events).
+    """
+
+    ARRAYS = ('run_cell', 'run_class', 'entry_key', 'cum_count', 'cum_energy', 'max_mag')
+
+    def __init__(self, first_year: int, n_months: int, run_cell, run_class,
+                 entry_key, cum_count, cum_energy, max_mag):
+        self.first_year = first_year
+        self.n_months = n_months
+        self.run_cell = run_cell
+        self.run_class = run_class
+        # run * n_months + month of every entry, ascending
+        self.entry_key = entry_key
+        # Prefix sums over entries (one longer than entry_key, starting at 0)
+        self.cum_count = cum_count
+        self.cum_energy = cum_energy
+        # Largest magnitude per entry, with a trailing -inf sentinel for reduceat
+        self.max_mag = max_mag
+
+    @classmethod
+    def build(cls, data: pd.DataFrame) -> 'ActivityCube':
+        time = data['time']
+        valid = time.notna().to_numpy()
+        years = time.dt.year.to_numpy()[valid].astype(np.int64)
+        months = time.dt.month.to_numpy()[valid].astype(np.int64)
+        if len(years) == 0:
+            empty = np.empty(0, dtype=np.int64)
+            return cls(0, 0, empty, empty, empty, np.zeros(1, dtype=np.int64), np.zeros(1), np.full(1, -np.inf))
+
+        first_year = int(years.min())
+        n_months = (int(years.max()) - first_year + 1) * 12
+        month = (years - first_year) * 12 + months - 1
+
+        lat = data['Latitude'].to_numpy(dtype=float)[valid]
+        lon = data['Longitude'].to_numpy(dtype=float)[valid]
+        mag = data['mag'].to_numpy(dtype=float)[valid]
+        cell = (np.clip(np.floor(lat + 90).astype(np.int64), 0, N_ROWS - 1) * N_COLS
+                + np.clip(np.floor(lon + 180).astype(np.int64), 0, N_COLS - 1))
+        mag_class = np.searchsorted(MAG_EDGES, mag, side='right')
+
+        runs, run_of_event = np.unique(mag_class * (N_ROWS * N_COLS) + cell, return_inverse=True)
+        key = run_of_event * n_months + month
+
+        # Sorted by entry, then magnitude, so each entry's last event is its largest
+        order = np.lexsort((mag, key))
+        key, mag = key[order], mag[order]
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(key)) + 1))
+        ends = np.concatenate((starts[1:], [len(key)]))
+
+        counts = ends - starts
+        energy = np.add.reduceat(seismic_energy(mag), starts)
+        return cls(
+            first_year, n_months,
+            run_cell=(runs % (N_ROWS * N_COLS)).astype(np.int32),
+            run_class=(runs // (N_ROWS * N_COLS)).astype(np.int8),
+            entry_key=key[starts],
+            cum_count=np.concatenate(([0], np.cumsum(counts))),
+            cum_energy=np.concatenate(([0.0], np.cumsum(energy))),
+            max_mag=np.concatenate((mag[ends - 1], [-np.inf])).astype(np.float32)
+        )
+
+    @classmethod
+    def for_data_processor(cls, data_processor, directory: Optional[str] = None) -> 'ActivityCube':
+        """The cube of a loaded dataset, from the on-disk cache of its version when there is one."""
+        directory = directory or CUBE_DIR
+        path = os.path.join(directory, f"{data_processor.version}-v{SCHEMA_VERSION}.npz")
+        if os.path.exists(path):
+            try:
+                cube = cls.load(path)
+                os.utime(path)
+                return cube
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Rebuilding activity cube, {path} is unreadable: {e}")
+        cube = cls.build(data_processor.processed_data)
+        try:
+            cube.save(path)
+            _prune(directory, CUBES_KEPT)
+        except OSError as e:
+            print(f"Error saving activity cube to {path}: {e}")
+        return cube
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.npz')
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, first_year=self.first_year, n_months=self.n_months,
+                     **{name: getattr(self, name) for name in self.ARRAYS})
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'ActivityCube':
+        with np.load(path) as arrays:
+            return cls(int(arrays['first_year']), int(arrays['n_months']),
+                       **{name: arrays[name] for name in cls.ARRAYS})
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in self.ARRAYS)
+
+    def month_index(self, timestamp) -> int:
+        timestamp = pd.Timestamp(timestamp)
+        return (timestamp.year - self.first_year) * 12 + timestamp.month - 1
+
+    def _run_mask(self, bounds: Optional[Tuple[float, float, float, float]], min_mag: Optional[float]) -> np.ndarray:
+        mask = np.ones(len(self.run_cell), dtype=bool)
+        if min_mag is not None:
+            # Classes whose lower edge is at or above the threshold (rounded down to an edge)
+            mask &= self.run_class >= np.searchsorted(MAG_EDGES, min_mag, side='right')
+        if bounds:
+            min_lat, max_lat, min_lon, max_lon = bounds
+            rows, cols = self.run_cell // N_COLS, self.run_cell % N_COLS
+            mask &= (rows >= np.floor(max(min_lat, -90) + 90)) & (rows <= np.floor(min(max_lat, 90) + 90))
+            if max_lon - min_lon < 360:
+                west = int(np.floor((min_lon + 180) % 360))
+                east = int(np.floor((max_lon + 180) % 360))
+                # Wrapped longitudes cross the antimeridian
+                mask &= (cols >= west) & (cols <= east) if west <= east else (cols >= west) | (cols <= east)
+        return mask
+
+    def query(self, bounds: Optional[Tuple[float, float, float, float]] = None,
+              start=None, end=None, min_mag: Optional[float] = None) -> Dict[str, np.ndarray]:
+        """
+        Per-cell 'lat', 'lon' (cell centers), 'count', 'max_mag' and 'energy'
+        of the non-empty 1° cells touching bounds = (min_lat, max_lat, min_lon,
+        max_lon), over the months from start to end (inclusive), for events of
+        magnitude min_mag and above (taken at MAG_EDGES).
+        """
+        t0 = 0 if start is None else max(self.month_index(start), 0)
+        t1 = self.n_months - 1 if end is None else min(self.month_index(end), self.n_months - 1)
+        runs = np.flatnonzero(self._run_mask(bounds, min_mag)) if t0 <= t1 else np.empty(0, dtype=np.int64)
+
+        lo = np.searchsorted(self.entry_key, runs * self.n_months + t0, side='left')
+        hi = np.searchsorted(self.entry_key, runs * self.n_months + t1, side='right')
+        filled = hi > lo
+        runs, lo, hi = runs[filled], lo[filled], hi[filled]
+
+        count = self.cum_count[hi] - self.cum_count[lo]
+        energy = self.cum_energy[hi] - self.cum_energy[lo]
+        if len(runs):
+            # Ranges are disjoint and ordered; every other reduceat result is a gap
+            max_mag = np.maximum.reduceat(self.max_mag, np.column_stack((lo, hi)).ravel())[::2]
+        else:
+            max_mag = np.empty(0, dtype=np.float32)
+
+        cells, cell_of_run = np.unique(self.run_cell[runs], return_inverse=True)
+        cell_max = np.full(len(cells), -np.inf)
+        np.maximum.at(cell_max, cell_of_run, max_mag)
+        return {
+            'lat': cells // N_COLS - 90 + 0.5,
+            'lon': cells % N_COLS - 180 + 0.5,
+            'count': np.bincount(cell_of_run, weights=count, minlength=len(cells)).astype(np.int64),
+            'max_mag': cell_max,
+            'energy': np.bincount(cell_of_run, weights=energy, minlength=len(cells)),
+        }
@@ -0,0 +1,165 @@
+import base64
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.cache import versioned_cache
+
+# Part of every ETag, so a change to the response format invalidates client caches
+API_VERSION = 'v1'
+
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
+# Row positions of recent /events queries kept per worker; an unfiltered
+# query over 10M rows takes 40 MB of it
+EVENT_POSITIONS_BYTES = int(float(os.environ.get('EQ_API_POSITIONS_MB', 64)) * 2 ** 20)
+
+MAGNITUDE_FILTERS = ('all', 'minor', 'moderate', 'strong', 'major')
+RISK_METRICS = ('count', 'avg_magnitude', 'max_magnitude')
+TIMESERIES_RESOLUTIONS = ('day', 'week', 'month', 'year', 'auto')
+
+
+class CursorError(ValueError):
+    """A page cursor that is malformed, or was issued for another dataset version or filter set."""
+
+    def __init__(self, message: str, stale: bool = False):
+        super().__init__(message)
+        # HTTP status: 410 Gone when the snapshot the cursor paged through was replaced
+        self.status = 410 if stale else 400
+
+
+def etag(data_processor) -> str:
+    """Responses depend only on the URL and the dataset version, so that is all the tag needs."""
+    return f"{API_VERSION}-{data_processor.version}"
+
+
+def _records_json(frame: pd.DataFrame) -> str:
+    return frame.to_json(orient='records', date_format='iso')
+
+
+def _body(version: str, **fields) -> str:
+    """JSON object of fields (already-serialized JSON strings) plus the dataset version."""
+    items = [f'"version":{json.dumps(version)}'] + [f'{json.dumps(k)}:{v}' for k, v in fields.items()]
+    return '{' + ','.join(items) + '}'
+
+
+def _filters_key(filters: Dict) -> tuple:
+    return tuple(sorted(filters.items()))
+
+
+def _fingerprint(filters: Dict) -> str:
+    return hashlib.sha1(repr(_filters_key(filters)).encode()).hexdigest()[:12]
+
+
+def encode_cursor(version: str, filters: Dict, after: int) -> str:
+    payload = json.dumps([version, _fingerprint(filters), int(after)]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, version: str, filters: Dict) -> int:
+    """Row position the page after `cursor` starts past."""
+    try:
+        cursor_version, fingerprint, after = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        after = int(after)
+    except (ValueError, TypeError):
+        raise CursorError("malformed cursor")
+    if cursor_version != version:
+        raise CursorError("cursor is from another dataset version; start again without it", stale=True)
+    if fingerprint != _fingerprint(filters):
+        raise CursorError("cursor was issued for other filters")
+    return after
+
+
+def page_size(value: Optional[str]) -> int:
+    if not value:
+        return DEFAULT_PAGE_SIZE
+    try:
+        size = int(value)
+    except ValueError:
+        raise ValueError(f"limit must be an integer, got {value!r}")
+    if not 1 <= size <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    return size
+
+
+@versioned_cache('api_event_positions', maxsize=16, max_bytes=EVENT_POSITIONS_BYTES)
+def _event_positions(data_processor, filters_key: tuple) -> np.ndarray:
+    # Later pages of the same query slice this instead of filtering again
+    positions = data_processor.get_filtered_positions(**dict(filters_key))
+    # Half the bytes for any catalog under 2^31 rows
+    return positions.astype(np.int32) if len(positions) == 0 or positions[-1] < 2 ** 31 else positions
+
+
+def events_page(data_processor, filters: Dict, columns: List[str], limit: int,
+                cursor: Optional[str] = None) -> str:
+    """
+    One page of the events matching filters (see src.export.parse_filters),
+    in dataset order, with the total and the cursor of the next page.
+    """
+    positions = _event_positions(data_processor, _filters_key(filters))
+    start = 0
+    if cursor:
+        after = decode_cursor(cursor, data_processor.version, filters)
+        start = int(np.searchsorted(positions, after, side='right'))
+    page = positions[start:start + limit]
+
+    next_cursor = None
+    if start + limit < len(positions):
+        next_cursor = encode_cursor(data_processor.version, filters, page[-1])
+    frame = data_processor.processed_data.iloc[page][columns]
+    return _body(data_processor.version, total=str(len(positions)),
+                 next_cursor=json.dumps(next_cursor), data=_records_json(frame))
+
+
+@versioned_cache('api_responses', maxsize=256)
+def _aggregate(data_processor, endpoint: str, params: Tuple) -> Optional[str]:
+    params = dict(params)
+    version = data_processor.version
+
+    if endpoint == 'timeseries':
+        series = data_processor.get_time_series_data(params['magnitude'], params.get('start_date'),
+                                                     params.get('end_date'), params.get('country'),
+                                                     params.get('resolution', 'month'))
+        resolution = series.attrs.get('resolution', params.get('resolution', 'month'))
+        if not series.empty:
+            series = series[['date', 'count', 'avg_magnitude', 'max_magnitude', 'avg_depth']]
+        return _body(version, resolution=json.dumps(resolution), data=_records_json(series))
+
+    if endpoint == 'risk':
+        risk = data_processor.get_risk_map_data(params['metric'])
+        return _body(version, data=_records_json(risk))
+
+    if endpoint == 'country':
+        stats = data_processor.get_country_statistics(params['country'])
+        if not stats:
+            return None
+        return _body(version, country=json.dumps(params['country']), data=json.dumps(stats, default=float))
+
+    if endpoint == 'significant':
+        top = pd.DataFrame(data_processor.get_significant_earthquakes()).head(params['limit'])
+        return _body(version, data=_records_json(top))
+
+    if endpoint == 'activity':
+        cube = data_processor.get_activity_cube()
+        if cube is None:
+            return _body(version, data='{}')
+        cells = cube.query(params.get('bounds'), params.get('start_date'), params.get('end_date'),
+                           params.get('min_mag'))
+        # Magnitudes are stored in single precision
+        cells['max_mag'] = np.round(cells['max_mag'], 2)
+        return _body(version, data=json.dumps({name: values.tolist() for name, values in cells.items()}))
+
+    raise ValueError(f"unknown endpoint {endpoint!r}")
+
+
+def aggregate(data_processor, endpoint: str, **params) -> Optional[str]:
+    """
+    JSON body of an aggregate endpoint ('timeseries', 'risk', 'country',
+    'significant' or 'activity'), cached per dataset version; None when there is nothing
+    for the request (an unknown country).
+    """
+    return _aggregate(data_processor, endpoint, tuple(sorted(params.items())))
@@ -0,0 +1,83 @@
+import numpy as np
+from typing import Dict, Optional, Sequence
+
+# Class edges shared by the views; a value equal to an edge falls in the lower class
+DEPTH_CLASS_EDGES = [70, 300]
+DEPTH_CLASS_LABELS = ['shallow', 'intermediate', 'deep']
+
+def binned_statistics(keys,
+                      values,
+                      edges: Sequence[float],
+                      labels: Optional[Sequence[str]] = None,
+                      percentiles: Sequence[float] = (50, 90)) -> Dict:
+    """
+    Bin `keys` by `edges` and summarize `values` per bin in one pass.
+
+    Bins follow np.digitize(keys, edges, right=True): bin 0 is keys <= edges[0]
+    and the last bin is keys > edges[-1]. Rows where either array is NaN are
+    ignored. Returns per-bin arrays for 'count', 'mean', 'min', 'max' and one
+    entry per percentile under 'percentiles' (linear interpolation, like
+    np.percentile); empty bins get NaN statistics.
+    """
+    keys = np.asarray(keys, dtype=float)
+    values = np.asarray(values, dtype=float)
+    valid = ~(np.isnan(keys) | np.isnan(values))
+    if not valid.all():
+        keys, values = keys[valid], values[valid]
+
+    n_bins = len(edges) + 1
+    bins = np.digitize(keys, edges, right=True)
+    counts = np.bincount(bins, minlength=n_bins)
+    sums = np.bincount(bins, weights=values, minlength=n_bins)
+
+    # One sort by (bin, value) gives every bin's values as a contiguous sorted run
+    sorted_values = values[np.lexsort((values, bins))]
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    filled = counts > 0
+    last = starts + np.maximum(counts - 1, 0)
+
+    def per_bin(result):
+        return np.where(filled, result, np.nan)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = per_bin(sums / counts)
+
+    if len(sorted_values):
+        mins = per_bin(sorted_values[np.minimum(starts, len(sorted_values) - 1)])
+        maxs = per_bin(sorted_values[np.minimum(last, len(sorted_values) - 1)])
+    else:
+        mins = maxs = np.full(n_bins, np.nan)
+
+    stats_by_percentile = {}
+    for q in percentiles:
+        position = starts + np.maximum(counts - 1, 0) * (q / 100.0)
+        lower = np.floor(position).astype(int)
+        upper = np.ceil(position).astype(int)
+        if len(sorted_values):
+            lower = np.minimum(lower, len(sorted_values) - 1)
+            upper = np.minimum(upper, len(sorted_values) - 1)
+            fraction = position - lower
+            result = sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * fraction
+            stats_by_percentile[q] = per_bin(result)
+        else:
+            stats_by_percentile[q] = np.full(n_bins, np.nan)
+
+    return {
+        'edges': list(edges),
+        'labels': list(labels) if labels is not None else [str(i) for i in range(n_bins)],
+        'count': counts,
+        'mean': means,
+        'min': mins,
+        'max': maxs,
+        'percentiles': stats_by_percentile
+    }
+
+def depth_class_statistics(data, percentiles: Sequence[float] = (50, 90)) -> Dict:
+    """Magnitude statistics per depth class (shallow / intermediate / deep)."""
+    return binned_statistics(
+        data['depth'].to_numpy(),
+        data['mag'].to_numpy(),
+        DEPTH_CLASS_EDGES,
+        labels=DEPTH_CLASS_LABELS,
+        percentiles=percentiles
+    )
@@ -0,0 +1,97 @@
+import threading
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Dict, Hashable, Optional
+
+# Every cache registers itself here so it can be inspected or cleared in one place
+_caches: Dict[str, "VersionedCache"] = {}
+
+
+class VersionedCache:
+    """
+    Small thread-safe LRU cache for values derived from one dataset version.
+
+    Keys always include the dataset version, so a reloaded dataset never sees
+    values built from the previous one; those simply age out of the LRU.
+
+    With max_bytes, the entries are also limited by the summed nbytes of
+    their values (arrays); a value larger than that on its own is returned
+    but not kept.
+    """
+
+    def __init__(self, name: str, maxsize: int = 32, max_bytes: Optional[int] = None):
+        self.name = name
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        _caches[name] = self
+
+    def get_or_build(self, version: Hashable, key: Hashable, build: Callable[[], Any]) -> Any:
+        """Return the cached value for (version, key), building it on a miss."""
+        full_key = (version, key)
+        with self._lock:
+            if full_key in self._entries:
+                self._entries.move_to_end(full_key)
+                self.hits += 1
+                return self._entries[full_key]
+            self.misses += 1
+
+        # Build outside the lock so slow builders don't serialize unrelated lookups
+        value = build()
+
+        size = getattr(value, 'nbytes', 0)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return value
+        with self._lock:
+            if full_key in self._entries:
+                # Built meanwhile by another thread
+                self.nbytes -= getattr(self._entries[full_key], 'nbytes', 0)
+            self._entries[full_key] = value
+            self.nbytes += size
+            self._entries.move_to_end(full_key)
+            while len(self._entries) > self.maxsize or (self.max_bytes is not None and self.nbytes > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self.nbytes -= getattr(evicted, 'nbytes', 0)
+        return value
+
+    def discard_other_versions(self, version: Hashable):
+        """Drop every entry that was not built from `version`."""
+        with self._lock:
+            for full_key in [k for k in self._entries if k[0] != version]:
+                self.nbytes -= getattr(self._entries.pop(full_key), 'nbytes', 0)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def versioned_cache(name: str, maxsize: int = 32, max_bytes: Optional[int] = None):
+    """
+    Cache a function whose first argument is a DataProcessor, keyed by the
+    processor's dataset version and the remaining (hashable) arguments.
+    """
+    def decorator(func):
+        cache = VersionedCache(name, maxsize, max_bytes)
+
+        @wraps(func)
+        def wrapper(data_processor, *args, **kwargs):
+            key = (args, tuple(sorted(kwargs.items())))
+            version = getattr(data_processor, 'version', None)
+            return cache.get_or_build(version, key, lambda: func(data_processor, *args, **kwargs))
+
+        wrapper.cache = cache
+        return wrapper
+    return decorator
+
+
+def get_caches() -> Dict[str, VersionedCache]:
+    """Get all registered caches by name."""
+    return dict(_caches)
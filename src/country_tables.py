@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+from typing import List, Optional, Tuple
+from src.metrics import timed_stage
+
+# Magnitude classes of the country bar charts: < 5.0, 5.0–6.5, ≥ 6.5
+BAR_MAGNITUDE_EDGES = [5.0, 6.5]
+BAR_MAGNITUDE_LABELS = ['Low (<5.0)', 'Medium (5.0–6.5)', 'High (≥6.5)']
+# 0.1-wide magnitude histogram bins from -1.0 to 10.0 (integer division keeps edges exact)
+MAGNITUDE_HIST_EDGES = np.arange(-10, 101) / 10
+
+class CountryTables:
+    """
+    Per-country count tables built once from processed_data.
+
+    class_year_counts[c, k, y] is the number of events of country c in magnitude
+    class k during year first_year + y. The last country row holds events
+    without a country, so summing every row gives the whole dataset.
+
+    magnitude_histograms[c, b] counts events of country c in magnitude bin b
+    of MAGNITUDE_HIST_EDGES.
+    """
+
+    def __init__(self, data: pd.DataFrame):
+        codes, countries = pd.factorize(data['country'])
+        self.countries: List[str] = [str(c) for c in countries]
+        self.unknown_code = len(self.countries)
+        codes = np.where(codes < 0, self.unknown_code, codes)
+
+        years = data['year'].to_numpy(dtype=float)
+        valid = ~np.isnan(years)
+        self.first_year = int(years[valid].min()) if valid.any() else 0
+        self.last_year = int(years[valid].max()) if valid.any() else -1
+        n_years = self.last_year - self.first_year + 1
+        n_countries = self.unknown_code + 1
+        n_classes = len(BAR_MAGNITUDE_LABELS)
+
+        # NaN magnitudes land in the top class, like the old per-row classifier
+        mag_class = np.digitize(data['mag'].to_numpy(dtype=float), BAR_MAGNITUDE_EDGES)
+        flat = (codes[valid] * n_classes + mag_class[valid]) * n_years \
+            + (years[valid].astype(int) - self.first_year)
+        self.class_year_counts = np.bincount(
+            flat, minlength=n_countries * n_classes * n_years
+        ).reshape(n_countries, n_classes, n_years).astype(np.int32)
+
+        histograms, _, _ = np.histogram2d(
+            codes,
+            data['mag'].to_numpy(dtype=float),
+            bins=[np.arange(n_countries + 1) - 0.5, MAGNITUDE_HIST_EDGES]
+        )
+        self.magnitude_histograms = histograms.astype(np.int32)
+
+    def country_rows(self, country: Optional[str]) -> np.ndarray:
+        """Rows matching `country` the way get_filtered_data does (case-insensitive substring)."""
+        if not country or country == 'all':
+            return np.arange(self.unknown_code + 1)
+        needle = country.lower()
+        return np.array([i for i, name in enumerate(self.countries) if needle in name.lower()], dtype=int)
+
+    def year_slice(self, start_year: Optional[int], end_year: Optional[int]) -> slice:
+        start = self.first_year if start_year is None else max(int(start_year), self.first_year)
+        end = self.last_year if end_year is None else min(int(end_year), self.last_year)
+        return slice(start - self.first_year, max(end - self.first_year + 1, start - self.first_year))
+
+    @timed_stage('aggregation')
+    def class_year_counts_for(self, country: Optional[str],
+                              start_year: Optional[int] = None,
+                              end_year: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (years, counts[class, year]) for a country and an inclusive year window."""
+        window = self.year_slice(start_year, end_year)
+        years = np.arange(self.first_year, self.last_year + 1)[window]
+        rows = self.country_rows(country)
+        counts = self.class_year_counts[rows][:, :, window].sum(axis=0)
+        return years, counts
+
+    @timed_stage('aggregation')
+    def magnitude_histogram_for(self, country: Optional[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (bin edges, counts) of the magnitude histogram, trimmed to the non-empty range."""
+        counts = self.magnitude_histograms[self.country_rows(country)].sum(axis=0)
+        filled = np.nonzero(counts)[0]
+        if len(filled) == 0:
+            return MAGNITUDE_HIST_EDGES[:1], counts[:0]
+        first, last = filled[0], filled[-1]
+        return MAGNITUDE_HIST_EDGES[first:last + 2], counts[first:last + 1]
+
+    @timed_stage('aggregation')
+    def countries_with_events(self, start_year: Optional[int] = None,
+                              end_year: Optional[int] = None) -> List[str]:
+        """Sorted names of countries with at least one event in the year window."""
+        window = self.year_slice(start_year, end_year)
+        totals = self.class_year_counts[:self.unknown_code, :, window].sum(axis=(1, 2))
+        return sorted(self.countries[i] for i in np.nonzero(totals)[0])
@@ -3,7 +3,24 @@ import numpy as np
 from datetime import datetime
 import os
 import json
-from typing import List, Dict, Optional, Tuple
+from typing import Iterator, List, Dict, Optional, Tuple
+from src.spatial_index import GridIndex
+from src.activity_cube import ActivityCube
+from src.temporal_pyramid import TemporalPyramid
+from src.summed_area import MAGNITUDE_BANDS, SummedAreaTable
+from src.country_tables import CountryTables
+from src.shared_columns import share_frame
+from src.metrics import timed_stage
+
+DATASET_FILE = "Significant Earthquake Dataset 1900-2023.csv"
+
+def dataset_version(data_path: str) -> Optional[str]:
+    """Version of the dataset file in data_path (from its mtime and size), None when it is missing."""
+    try:
+        stat = os.stat(os.path.join(data_path, DATASET_FILE))
+    except FileNotFoundError:
+        return None
+    return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
 
 class DataProcessor:
     """
@@ -14,6 +31,19 @@ class DataProcessor:
         self.data_path = data_path
         self.earthquake_data = None
         self.processed_data = None
+        # Identifies the loaded dataset; caches key on it
+        self.version = None
+        # Built on first use by get_spatial_index(), get_activity_cube() and get_temporal_pyramid()
+        self._spatial_index = None
+        self._activity_cube = None
+        self._temporal_pyramid = None
+        # Per-country count tables, built at load
+        self.country_tables = None
+        # Summed-area tables of events by year and by magnitude band, built at load
+        self.year_counts = None
+        self.magnitude_counts = None
+        # Directory of the memory-mapped columns once share_columns() has run
+        self.shared_path = None
         
         # Load data
         self.load_data()
@@ -22,17 +52,20 @@ class DataProcessor:
         """Load earthquake data from CSV files."""
         try:
             # Load the main earthquake dataset
-            main_file = os.path.join(self.data_path, "Significant Earthquake Dataset 1900-2023.csv")
+            main_file = os.path.join(self.data_path, DATASET_FILE)
             if os.path.exists(main_file):
+                self.version = dataset_version(self.data_path)
                 self.earthquake_data = pd.read_csv(main_file)
                 print(f"Loaded {len(self.earthquake_data)} earthquake records")
                 self._preprocess_data()
             else:
                 print("Earthquake dataset not found.")
+                self.version = "empty"
                 self.earthquake_data = pd.DataFrame()
                 
         except Exception as e:
             print(f"Error loading data: {e}")
+            self.version = "empty"
             self.earthquake_data = pd.DataFrame()
     
     def _preprocess_data(self):
@@ -40,31 +73,39 @@ class DataProcessor:
         if self.earthquake_data is None or self.earthquake_data.empty:
             return
         
+        self.processed_data = self._prepare(self.earthquake_data)
+        self.country_tables = CountryTables(self.processed_data)
+        self._build_count_tables()
+        
+        print(f"Preprocessed {len(self.processed_data)} earthquake records")
+    
+    def _prepare(self, raw: pd.DataFrame) -> pd.DataFrame:
+        """Cleaned rows with derived columns, from rows in the dataset file's format."""
         # Create a copy for processing
-        self.processed_data = self.earthquake_data.copy()
+        data = raw.copy()
         
         # Convert time column to datetime
-        if 'Time' in self.processed_data.columns:
-            self.processed_data['time'] = pd.to_datetime(self.processed_data['Time'])
+        if 'Time' in data.columns:
+            data['time'] = pd.to_datetime(data['Time'])
         
         # Handle missing values
-        if 'Mag' in self.processed_data.columns:
-            self.processed_data['mag'] = self.processed_data['Mag']
-        if 'Depth' in self.processed_data.columns:
-            self.processed_data['depth'] = self.processed_data['Depth']
+        if 'Mag' in data.columns:
+            data['mag'] = data['Mag']
+        if 'Depth' in data.columns:
+            data['depth'] = data['Depth']
         
         # Fill missing values
-        self.processed_data['mag'].fillna(self.processed_data['mag'].median(), inplace=True)
-        self.processed_data['depth'].fillna(self.processed_data['depth'].median(), inplace=True)
+        data['mag'].fillna(data['mag'].median(), inplace=True)
+        data['depth'].fillna(data['depth'].median(), inplace=True)
         
         # Add derived columns
-        self.processed_data['year'] = self.processed_data['time'].dt.year
-        self.processed_data['month'] = self.processed_data['time'].dt.month
-        self.processed_data['day'] = self.processed_data['time'].dt.day
+        data['year'] = data['time'].dt.year
+        data['month'] = data['time'].dt.month
+        data['day'] = data['time'].dt.day
         
         # Add magnitude categories
-        self.processed_data['magnitude_category'] = pd.cut(
-            self.processed_data['mag'],
+        data['magnitude_category'] = pd.cut(
+            data['mag'],
             bins=[0, 4, 6, 7, 10],
             labels=['Minor', 'Moderate', 'Strong', 'Major'],
             include_lowest=True
@@ -89,43 +130,234 @@ class DataProcessor:
                 return "Indonesia"
             
             return None  # Or "Unknown"
-        self.processed_data['country'] = self.processed_data['Place'].apply(extract_country)
+        # A few hundred distinct names: kept as category codes, which share_columns() can map
+        data['country'] = data['Place'].apply(extract_country).astype('category')
 
         
         # Filter out invalid coordinates
-        self.processed_data = self.processed_data[
-            (self.processed_data['Latitude'].between(-90, 90)) &
-            (self.processed_data['Longitude'].between(-180, 180))
+        data = data[
+            (data['Latitude'].between(-90, 90)) &
+            (data['Longitude'].between(-180, 180))
         ]
-        
-        print(f"Preprocessed {len(self.processed_data)} earthquake records")
+        return data
     
-    def get_filtered_data(self, 
-                         start_date: Optional[str] = None,
-                         end_date: Optional[str] = None,
-                         magnitude_range: Optional[Tuple[float, float]] = None,
-                         country: Optional[str] = None) -> pd.DataFrame:
-        """Get filtered earthquake data based on criteria."""
+    def _build_count_tables(self):
+        data = self.processed_data
+        lat, lon = data['Latitude'].to_numpy(), data['Longitude'].to_numpy()
+        years = data['year'].to_numpy(dtype=float)
+        dated = ~np.isnan(years)
+        self.year_counts = SummedAreaTable.build(lat[dated], lon[dated], years[dated].astype(np.int64))
+        bands = np.searchsorted(MAGNITUDE_BANDS, data['mag'].to_numpy(dtype=float), side='right')
+        self.magnitude_counts = SummedAreaTable.build(lat, lon, bands, cell_deg=0.25)
+    
+    def append_events(self, events: pd.DataFrame) -> int:
+        """
+        Add rows in the dataset file's format (e.g. a feed's newest events) and
+        return how many were kept. The summed-area tables count them with
+        add() instead of being rebuilt; the country tables are rebuilt, and the
+        spatial index, activity cube and pyramid on next use. The version
+        changes, so versioned caches don't serve the earlier rows' results.
+
+        Snapshots are not changed once published, so call this on a processor
+        before it is published (and before share_columns(), or again after).
+        """
+        if events.empty:
+            return 0
+        base_version = self.version.split('+')[0] if self.version else 'empty'
+        before = 0 if self.processed_data is None else len(self.processed_data)
+        start = 0 if self.earthquake_data is None else len(self.earthquake_data)
+        events = events.set_axis(pd.RangeIndex(start, start + len(events)))
+        self.earthquake_data = events if not start else pd.concat([self.earthquake_data, events])
         if self.processed_data is None or self.processed_data.empty:
-            return pd.DataFrame()
-        
-        data = self.processed_data.copy()
-        
+            self._preprocess_data()
+        else:
+            added = self._prepare(events)
+            data = pd.concat([self.processed_data, added])
+            # Both sides' names, in one set of categories again
+            data['country'] = data['country'].astype('category')
+            self.processed_data = data
+            self.country_tables = CountryTables(data)
+            lat, lon = added['Latitude'].to_numpy(), added['Longitude'].to_numpy()
+            years = added['year'].to_numpy(dtype=float)
+            dated = ~np.isnan(years)
+            self.year_counts.add(lat[dated], lon[dated], years[dated].astype(np.int64))
+            self.magnitude_counts.add(
+                lat, lon, np.searchsorted(MAGNITUDE_BANDS, added['mag'].to_numpy(dtype=float), side='right'))
+        self._spatial_index = self._activity_cube = self._temporal_pyramid = None
+        self.shared_path = None
+        self.version = f"{base_version}+{len(self.earthquake_data)}"
+        return len(self.processed_data) - before
+    
+    def share_columns(self, directory: Optional[str] = None) -> Optional[str]:
+        """
+        Move processed_data's numeric, datetime and categorical columns into
+        read-only memory-mapped files (see src/shared_columns.py), so processes
+        forked afterwards share one copy of them. Returns the published directory.
+        """
+        if self.processed_data is None or self.processed_data.empty:
+            return None
+        self.processed_data, self.shared_path = share_frame(self.processed_data, self.version, directory)
+        # Rebuilt over the mapped coordinates on next use
+        self._spatial_index = None
+        return self.shared_path
+    
+    def get_spatial_index(self) -> Optional[GridIndex]:
+        """Get the lat/lon grid index over processed_data rows (built on first use)."""
+        if self.processed_data is None or self.processed_data.empty:
+            return None
+        if self._spatial_index is None:
+            self._spatial_index = GridIndex(
+                self.processed_data['Latitude'].to_numpy(),
+                self.processed_data['Longitude'].to_numpy()
+            )
+        return self._spatial_index
+    
+    def get_activity_cube(self) -> Optional[ActivityCube]:
+        """Get the cell x month x magnitude aggregates (built on first use, cached on disk per version)."""
+        if self.processed_data is None or self.processed_data.empty:
+            return None
+        if self._activity_cube is None:
+            self._activity_cube = ActivityCube.for_data_processor(self)
+        return self._activity_cube
+    
+    def get_temporal_pyramid(self) -> Optional[TemporalPyramid]:
+        """Get the per-country day/week/month/year aggregates (built on first use)."""
+        if self.processed_data is None or self.processed_data.empty:
+            return None
+        if self._temporal_pyramid is None:
+            self._temporal_pyramid = TemporalPyramid.build(self.processed_data, self.country_tables.countries)
+        return self._temporal_pyramid
+    
+    def count_in_bounds(self,
+                        bounds: Optional[Tuple[float, float, float, float]] = None,
+                        start_year: Optional[int] = None,
+                        end_year: Optional[int] = None,
+                        magnitude_range: Optional[Tuple[float, float]] = None,
+                        country: Optional[str] = None) -> int:
+        """
+        Number of events in bounds = (min_lat, max_lat, min_lon, max_lon) in a
+        year window or a magnitude range, in constant time from the summed-area
+        tables. Counts are exact at their resolution: every event in the grid
+        cells bounds touches (1° or finer for years, 0.25° for magnitudes), in
+        the magnitude bands the range touches. With both filters, or a country,
+        the count is exact, from the spatial index instead.
+        """
+        if self.year_counts is None:
+            return 0
+        years_given = start_year is not None or end_year is not None
+        if (magnitude_range and years_given) or (country and country != 'all'):
+            # No table has both axes, nor a country axis
+            start = pd.Timestamp(f"{start_year}-01-01", tz='UTC') if start_year is not None else None
+            end = pd.Timestamp(f"{end_year + 1}-01-01", tz='UTC') - pd.Timedelta(1, 'ns') \
+                if end_year is not None else None
+            return len(self.get_filtered_positions(start, end, magnitude_range, country, bounds))
+        if magnitude_range:
+            first, last = np.searchsorted(MAGNITUDE_BANDS, magnitude_range, side='right')
+            return self.magnitude_counts.count(bounds, int(first), int(last))
+        if years_given:
+            return self.year_counts.count(bounds, start_year, end_year)
+        return self.magnitude_counts.count(bounds)
+    
+    def _filter_mask(self, data: pd.DataFrame,
+                     start_date=None, end_date=None,
+                     magnitude_range: Optional[Tuple[float, float]] = None,
+                     country: Optional[str] = None) -> Optional[np.ndarray]:
+        """Boolean mask of the rows of data matching the filters, None when there are none."""
+        conditions = []
         # Filter by date range
         if start_date:
-            data = data[data['time'] >= pd.to_datetime(start_date)]
+            conditions.append(data['time'] >= pd.to_datetime(start_date))
         if end_date:
-            data = data[data['time'] <= pd.to_datetime(end_date)]
+            conditions.append(data['time'] <= pd.to_datetime(end_date))
         
         # Filter by magnitude range
         if magnitude_range:
-            data = data[data['mag'].between(magnitude_range[0], magnitude_range[1])]
+            conditions.append(data['mag'].between(magnitude_range[0], magnitude_range[1]))
         
-        # Filter by country
+        # Filter by country (a case-insensitive substring, never a regex)
         if country and country != 'all':
-            data = data[data['country'].str.contains(country, case=False, na=False)]
+            conditions.append(data['country'].str.contains(country, case=False, na=False, regex=False))
+
+        if not conditions:
+            return None
+        mask = conditions[0].to_numpy(dtype=bool)
+        for condition in conditions[1:]:
+            mask &= condition.to_numpy(dtype=bool)
+        return mask
+
+    @timed_stage('filtering')
+    def get_filtered_data(self, 
+                         start_date: Optional[str] = None,
+                         end_date: Optional[str] = None,
+                         magnitude_range: Optional[Tuple[float, float]] = None,
+                         country: Optional[str] = None,
+                         bounds: Optional[Tuple[float, float, float, float]] = None) -> pd.DataFrame:
+        """
+        Get filtered earthquake data based on criteria.
+        bounds is (min_lat, max_lat, min_lon, max_lon) and is answered from the spatial index.
+        """
+        if self.processed_data is None or self.processed_data.empty:
+            return pd.DataFrame()
         
-        return data
+        if bounds:
+            data = self.processed_data.iloc[self.get_spatial_index().query(bounds)]
+        else:
+            data = self.processed_data
+        
+        mask = self._filter_mask(data, start_date, end_date, magnitude_range, country)
+        return data.copy() if mask is None else data[mask]
+
+    @timed_stage('filtering')
+    def get_filtered_positions(self,
+                               start_date: Optional[str] = None,
+                               end_date: Optional[str] = None,
+                               magnitude_range: Optional[Tuple[float, float]] = None,
+                               country: Optional[str] = None,
+                               bounds: Optional[Tuple[float, float, float, float]] = None) -> np.ndarray:
+        """Sorted processed_data row positions of the rows get_filtered_data would return."""
+        if self.processed_data is None or self.processed_data.empty:
+            return np.empty(0, dtype=np.int64)
+
+        if bounds:
+            positions = self.get_spatial_index().query(bounds)
+            # Only the filtered columns of the rows in bounds
+            data = self.processed_data[['time', 'mag', 'country']].iloc[positions]
+        else:
+            positions = np.arange(len(self.processed_data))
+            data = self.processed_data
+
+        mask = self._filter_mask(data, start_date, end_date, magnitude_range, country)
+        return positions if mask is None else positions[mask]
+
+    def iter_filtered_data(self,
+                           start_date: Optional[str] = None,
+                           end_date: Optional[str] = None,
+                           magnitude_range: Optional[Tuple[float, float]] = None,
+                           country: Optional[str] = None,
+                           bounds: Optional[Tuple[float, float, float, float]] = None,
+                           columns: Optional[List[str]] = None,
+                           chunk_rows: int = 50_000) -> Iterator[pd.DataFrame]:
+        """
+        The rows get_filtered_data would return, in processed_data order, as
+        frames of at most chunk_rows rows (restricted to columns). Only one
+        chunk is held at a time, so memory does not grow with the result.
+        """
+        if self.processed_data is None or self.processed_data.empty:
+            return
+        data = self.processed_data
+        if bounds:
+            positions = self.get_spatial_index().query(bounds)
+            chunks = (positions[i:i + chunk_rows] for i in range(0, len(positions), chunk_rows))
+        else:
+            chunks = (slice(i, i + chunk_rows) for i in range(0, len(data), chunk_rows))
+
+        for rows in chunks:
+            part = data.iloc[rows]
+            mask = self._filter_mask(part, start_date, end_date, magnitude_range, country)
+            if mask is not None:
+                part = part[mask]
+            if len(part):
+                yield part if columns is None else part[columns]
     
     def get_countries(self) -> List[str]:
         """Get list of unique countries in the dataset."""
@@ -135,6 +367,14 @@ class DataProcessor:
         countries = self.processed_data['country'].dropna().unique()
         return sorted([c.strip() for c in countries if c.strip()])
     
+    def get_years(self) -> List[int]:
+        """Get sorted list of years present in the dataset."""
+        if self.processed_data is None or self.processed_data.empty:
+            return []
+
+        return sorted(int(y) for y in self.processed_data['year'].dropna().unique())
+    
+    @timed_stage('filtering')
     def get_significant_earthquakes(self) -> List[Dict]:
         """Get list of significant earthquakes for impact analysis."""
         if self.processed_data is None or self.processed_data.empty:
@@ -151,47 +391,34 @@ class DataProcessor:
         # Convert to list of dictionaries
         return significant.head(100).to_dict('records')
     
+    @timed_stage('aggregation')
     def get_time_series_data(self, 
                             magnitude_filter: str = 'all',
                             start_date: Optional[str] = None,
                             end_date: Optional[str] = None,
-                            country: Optional[str] = None) -> pd.DataFrame:
-        """Get time series data for plotting."""
-        data = self.get_filtered_data(start_date, end_date, country=country)
-        
-        if data.empty:
+                            country: Optional[str] = None,
+                            resolution: str = 'month') -> pd.DataFrame:
+        """
+        Get time series data for plotting: count, mean/max magnitude and mean
+        depth per day, week, month or year, or at the resolution 'auto' picks
+        for the window (attrs['resolution'] has the one used). Read from the
+        temporal pyramid; the window runs from start_date's day to the end of
+        end_date's day.
+        """
+        pyramid = self.get_temporal_pyramid()
+        if pyramid is None:
             return pd.DataFrame()
-        
-        # Apply magnitude filter
-        if magnitude_filter == 'minor':
-            data = data[data['mag'] < 4.0]
-        elif magnitude_filter == 'moderate':
-            data = data[data['mag'].between(4.0, 5.9)]
-        elif magnitude_filter == 'strong':
-            data = data[data['mag'].between(6.0, 6.9)]
-        elif magnitude_filter == 'major':
-            data = data[data['mag'] >= 7.0]
-        
-        # Group by year and month
-        data['year_month'] = data['time'].dt.to_period('M')
-        time_series = data.groupby('year_month').agg({
-            'ID': 'count',
-            'mag': ['mean', 'max'],
-            'depth': 'mean'
-        }).reset_index()
-        
-        time_series.columns = ['year_month', 'count', 'avg_magnitude', 'max_magnitude', 'avg_depth']
-        time_series['date'] = time_series['year_month'].dt.to_timestamp()
-        
-        return time_series
+        rows = None if not country or country == 'all' else self.country_tables.country_rows(country)
+        return pyramid.series(rows, magnitude_filter, start_date, end_date, resolution)
     
+    @timed_stage('aggregation')
     def get_country_statistics(self, country: str) -> Dict:
         """Get statistics for a specific country."""
         if self.processed_data is None or self.processed_data.empty:
             return {}
         
         country_data = self.processed_data[
-            self.processed_data['country'].str.contains(country, case=False, na=False)
+            self.processed_data['country'].str.contains(country, case=False, na=False, regex=False)
         ]
         
         if country_data.empty:
@@ -208,13 +435,14 @@ class DataProcessor:
             }
         }
     
+    @timed_stage('aggregation')
     def get_risk_map_data(self, metric: str = 'count') -> pd.DataFrame:
         """Get data for the global risk map."""
         if self.processed_data is None or self.processed_data.empty:
             return pd.DataFrame()
         
         # Group by country
-        risk_data = self.processed_data.groupby('country').agg({
+        risk_data = self.processed_data.groupby('country', observed=True).agg({
             'ID': 'count',
             'mag': ['mean', 'max']
         }).reset_index()
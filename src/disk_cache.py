@@ -0,0 +1,106 @@
+import os
+import tempfile
+import threading
+from typing import Callable, Optional
+
+
+class DiskLRUCache:
+    """
+    Byte blobs in files under a directory, evicting the least recently used
+    once they take more than max_bytes.
+
+    Several processes can share the directory: files are written to a temporary
+    name and renamed into place, and recency is the file's mtime (touched on
+    every hit). Each process tracks the total it has seen and rescans the
+    directory before evicting, so the limit holds approximately.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._bytes: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            # Also evicted by another process between open and utime
+            return None
+        return data
+
+    def put(self, key: str, data: bytes):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if self._bytes is None:
+                self._bytes = self._scan_size()
+            else:
+                self._bytes += len(data)
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def get_or_build(self, key: str, build: Callable[[], bytes]) -> bytes:
+        """The blob stored under key (a relative path), building and storing it on a miss."""
+        data = self.get(key)
+        if data is not None:
+            self.hits += 1
+            return data
+        self.misses += 1
+        data = build()
+        try:
+            self.put(key, data)
+        except OSError as e:
+            # A full or read-only disk costs the caching, not the response
+            print(f"Error caching {key}: {e}")
+        return data
+
+    def _files(self):
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield stat.st_mtime_ns, stat.st_size, path
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._files())
+
+    def _evict(self):
+        """Delete the least recently used files until the cache is down to 80% of max_bytes."""
+        files = sorted(self._files())
+        total = sum(size for _, size, _ in files)
+        target = self.max_bytes * 0.8
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self._bytes = total
+
+    def clear(self):
+        with self._lock:
+            for _, _, path in list(self._files()):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            self._bytes = 0
@@ -0,0 +1,219 @@
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Dict, Iterable, Optional, Tuple
+
+# Stages a callback's time is split into; 'total' is the whole callback
+STAGES = ('filtering', 'aggregation', 'figure_build', 'serialization', 'total')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PAYLOAD_BUCKETS = (1e3, 1e4, 1e5, 5e5, 1e6, 5e6, 1e7, 5e7)
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram with one series per label tuple."""
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...], buckets: Iterable[float]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = tuple(buckets)
+        self._series: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # bucket counts, then sum and count
+                series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self._series.items())
+        for labels, series in items:
+            label_text = _labels(zip(self.label_names, labels))
+            for bound, count in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound:g}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{label_text},le="+Inf"}} {series[-1]}')
+            lines.append(f"{self.name}_sum{{{label_text}}} {series[-2]!r}")
+            lines.append(f"{self.name}_count{{{label_text}}} {series[-1]}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: tuple, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines += [f"{self.name}{{{_labels(zip(self.label_names, labels))}}} {_number(value)}" for labels, value in items]
+        return lines
+
+
+def _number(value) -> str:
+    """A sample value written exactly: whole numbers as integers, others as repr(float)."""
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(pairs) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in pairs)
+
+
+stage_seconds = Histogram(
+    'eq_callback_stage_seconds',
+    'Callback time per stage; stages exclude time spent in nested stages, total is the whole callback.',
+    ('callback', 'stage'), LATENCY_BUCKETS
+)
+response_bytes = Histogram(
+    'eq_callback_response_bytes', 'Size of serialized callback responses.', ('callback',), PAYLOAD_BUCKETS
+)
+callback_errors = Counter('eq_callback_errors_total', 'Callbacks that raised an exception.', ('callback',))
+
+# Per-thread: the callback being served and its open stages as [start, seconds in nested stages]
+_local = threading.local()
+
+
+def current_callback() -> Optional[str]:
+    return getattr(_local, 'callback', None)
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Time a block as one stage of the current callback. Time spent in nested
+    stages is attributed to them, not to this one. Outside callbacks this is a no-op.
+    """
+    callback_name = current_callback()
+    if callback_name is None:
+        yield
+        return
+    frame = [time.perf_counter(), 0.0]
+    _local.stack.append(frame)
+    try:
+        yield
+    finally:
+        _local.stack.pop()
+        elapsed = time.perf_counter() - frame[0]
+        if _local.stack:
+            _local.stack[-1][1] += elapsed
+        stage_seconds.observe((callback_name, name), elapsed - frame[1])
+
+
+def timed_stage(name: str):
+    """Decorator form of stage()."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _instrument_callback(func):
+    callback_name = func.__name__
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        _local.callback, _local.stack = callback_name, []
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            # PreventUpdate and friends are control flow, not failures
+            if type(e).__module__ != 'dash.exceptions':
+                callback_errors.inc((callback_name,))
+            raise
+        finally:
+            stage_seconds.observe((callback_name, 'total'), time.perf_counter() - start)
+            _local.callback = None
+
+    wrapper.__instrumented__ = True
+    return wrapper
+
+
+def _timed_to_json(to_json):
+    @wraps(to_json)
+    def wrapper(value):
+        with stage('serialization'):
+            payload = to_json(value)
+        callback_name = current_callback()
+        if callback_name is not None:
+            response_bytes.observe((callback_name,), len(payload))
+        return payload
+    return wrapper
+
+
+def instrument_callbacks(app):
+    """
+    Time every callback registered so far (with @callback or app.callback) and
+    the serialization of its response. Call after the callback modules are imported.
+    """
+    import dash._callback as dash_callback
+
+    if not getattr(dash_callback.to_json, '__wrapped__', None):
+        dash_callback.to_json = _timed_to_json(dash_callback.to_json)
+
+    for callback_map in (dash_callback.GLOBAL_CALLBACK_MAP, app.callback_map):
+        for entry in callback_map.values():
+            func = entry.get('callback')
+            if func is not None and not getattr(func, '__instrumented__', False):
+                entry['callback'] = _instrument_callback(func)
+
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    from src.cache import get_caches
+    from src.export import exported_rows
+    from src.snapshot import dataset_reloads
+    from visualizations.encoding import get_encoding_stats
+
+    lines = (stage_seconds.render() + response_bytes.render() + callback_errors.render()
+             + dataset_reloads.render() + exported_rows.render())
+
+    caches = sorted(get_caches().items())
+    for metric, help_text, kind, value in (
+        ('eq_cache_hits_total', 'Figure/layout cache hits.', 'counter', lambda c: c.hits),
+        ('eq_cache_misses_total', 'Figure/layout cache misses.', 'counter', lambda c: c.misses),
+        ('eq_cache_entries', 'Entries currently cached.', 'gauge', len),
+    ):
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {kind}"]
+        lines += [f'{metric}{{cache="{_escape(name)}"}} {value(cache)}' for name, cache in caches]
+
+    from src.tiles import get_tile_cache
+    tiles = get_tile_cache()
+    for metric, help_text, value in (
+        ('eq_tile_cache_hits_total', 'Map tiles served from the disk cache.', tiles.hits),
+        ('eq_tile_cache_misses_total', 'Map tiles rendered.', tiles.misses),
+    ):
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter", f"{metric} {value}"]
+
+    encoding = sorted(get_encoding_stats().items())
+    lines += ["# HELP eq_encoding_bytes_saved_total JSON bytes saved by figure encoding.",
+              "# TYPE eq_encoding_bytes_saved_total counter"]
+    lines += [f'eq_encoding_bytes_saved_total{{callback="{_escape(name)}"}} {entry["bytes_saved"]}'
+              for name, entry in encoding]
+    return "\n".join(lines) + "\n"
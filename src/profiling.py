@@ -0,0 +1,171 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import tempfile
+import threading
+import time
+from functools import wraps
+from typing import List, Optional
+
+# Profiling is off unless EQ_PROFILE=1 or it is switched on through the admin route.
+# EQ_PROFILE_RATE is the sampled fraction of matching invocations and EQ_PROFILE_CALLBACKS
+# a comma-separated list of callback names or output ids (empty matches every callback).
+PROFILE_DIR = os.environ.get('EQ_PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'eq-profiles'))
+# Only the newest profiles are kept
+MAX_PROFILES = int(os.environ.get('EQ_PROFILE_KEEP', 50))
+
+
+class ProfilerSettings:
+    def __init__(self):
+        self.enabled = os.environ.get('EQ_PROFILE', '0') == '1'
+        self.rate = float(os.environ.get('EQ_PROFILE_RATE', 0.05))
+        self.callbacks = _split(os.environ.get('EQ_PROFILE_CALLBACKS', ''))
+
+    def matches(self, name: str, output_id: str) -> bool:
+        if self.callbacks and name not in self.callbacks and output_id not in self.callbacks:
+            return False
+        return random.random() < self.rate
+
+    def update(self, enabled: Optional[bool] = None, rate: Optional[float] = None,
+               callbacks: Optional[List[str]] = None):
+        """Change the settings given (of this process only). Raises ValueError, changing nothing."""
+        if enabled is not None and not isinstance(enabled, bool):
+            raise ValueError("enabled must be true or false")
+        if callbacks is not None and (not isinstance(callbacks, list)
+                                      or not all(isinstance(name, str) for name in callbacks)):
+            raise ValueError("callbacks must be a list of callback names or output ids")
+        if rate is not None:
+            if not 0 <= rate <= 1:
+                raise ValueError("rate must be between 0 and 1")
+            self.rate = rate
+        if callbacks is not None:
+            self.callbacks = [name.strip() for name in callbacks if name.strip()]
+        if enabled is not None:
+            self.enabled = enabled
+
+    def to_dict(self) -> dict:
+        return {'enabled': self.enabled, 'rate': self.rate, 'callbacks': self.callbacks, 'directory': PROFILE_DIR,
+                'pid': os.getpid()}
+
+
+def _split(value: str) -> List[str]:
+    return [part.strip() for part in value.split(',') if part.strip()]
+
+
+settings = ProfilerSettings()
+
+# cProfile can only run one profile at a time; concurrent samples are skipped
+_profile_lock = threading.Lock()
+
+
+def _profile_call(func, name: str, output_id: str, args, kwargs):
+    profile = cProfile.Profile()
+    start = time.time()
+    error = None
+    try:
+        profile.enable()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.disable()
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _profile_lock.release()
+        _save_profile(profile, {
+            'callback': name,
+            'output': output_id,
+            'inputs': list(args),
+            'started': start,
+            'duration': time.time() - start,
+            'error': error,
+            'pid': os.getpid(),
+        })
+
+
+def _save_profile(profile: cProfile.Profile, meta: dict):
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        started = meta['started']
+        # Sortable by time: UTC timestamp with milliseconds first
+        stem = (f"{time.strftime('%Y%m%d-%H%M%S', time.gmtime(started))}.{int(started * 1000) % 1000:03d}"
+                f"-{meta['callback']}-{os.getpid()}-{random.getrandbits(16):04x}")
+        profile.dump_stats(os.path.join(PROFILE_DIR, stem + '.prof'))
+        with open(os.path.join(PROFILE_DIR, stem + '.json'), 'w') as f:
+            json.dump(dict(meta, name=stem), f, default=str)
+        _rotate()
+    except OSError as e:
+        print(f"Error saving profile: {e}")
+
+
+def _rotate():
+    stems = sorted({name.rsplit('.', 1)[0] for name in os.listdir(PROFILE_DIR)})
+    for stem in stems[:-MAX_PROFILES]:
+        for ext in ('.prof', '.json'):
+            try:
+                os.remove(os.path.join(PROFILE_DIR, stem + ext))
+            except FileNotFoundError:
+                pass
+
+
+def _profiled_callback(func, output_id: str):
+    name = func.__name__
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        # The disabled path is a single attribute check
+        if not settings.enabled or not settings.matches(name, output_id):
+            return func(*args, **kwargs)
+        if not _profile_lock.acquire(blocking=False):
+            return func(*args, **kwargs)
+        return _profile_call(func, name, output_id, args, kwargs)
+
+    wrapper.__profiled__ = True
+    return wrapper
+
+
+def install_profiler(app):
+    """Let sampled invocations of every registered callback be profiled. Call after callbacks are imported."""
+    import dash._callback as dash_callback
+
+    for callback_map in (dash_callback.GLOBAL_CALLBACK_MAP, app.callback_map):
+        for output_id, entry in callback_map.items():
+            func = entry.get('callback')
+            if func is not None and not getattr(func, '__profiled__', False):
+                entry['callback'] = _profiled_callback(func, output_id)
+
+
+def list_profiles(limit: int = 50) -> List[dict]:
+    """Metadata of the newest saved profiles, newest first."""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for name in sorted((n for n in os.listdir(PROFILE_DIR) if n.endswith('.json')), reverse=True)[:limit]:
+        try:
+            with open(os.path.join(PROFILE_DIR, name)) as f:
+                profiles.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return profiles
+
+
+def profile_path(name: str) -> Optional[str]:
+    """Path of a saved .prof file, or None for unknown (or unsafe) names."""
+    if os.path.basename(name) != name:
+        return None
+    path = os.path.join(PROFILE_DIR, name + '.prof')
+    return path if os.path.exists(path) else None
+
+
+def profile_summary(name: str, sort: str = 'cumulative', limit: int = 40) -> Optional[str]:
+    """pstats text report of a saved profile."""
+    path = profile_path(name)
+    if path is None:
+        return None
+    out = io.StringIO()
+    pstats.Stats(path, stream=out).sort_stats(sort).print_stats(limit)
+    return out.getvalue()
@@ -0,0 +1,148 @@
+import re
+from collections import deque
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.cache import versioned_cache
+from src.temporal_pyramid import to_bins, to_day
+
+STATS = ('sum', 'mean', 'rate', 'max', 'ewm')
+# Moving-average window of each series resolution
+DEFAULT_WINDOWS = {'day': '7D', 'week': '3M', 'month': '12M', 'year': '5Y'}
+
+_UNITS = {'D': 'Day', 'W': 'Week', 'M': 'Month', 'Y': 'Year'}
+# Mean length of a unit, for the EWM half-life
+_UNIT_DAYS = {'D': 1.0, 'W': 7.0, 'M': 365.2425 / 12, 'Y': 365.2425}
+
+
+def parse_window(window: str) -> Tuple[int, str]:
+    """(n, unit) of a calendar window such as '7D', '3M' or '5Y' (D, W, M or Y). Raises ValueError."""
+    match = re.fullmatch(r'\s*(\d+)\s*([DWMY])\s*', str(window).upper())
+    if not match or int(match.group(1)) < 1:
+        raise ValueError(f"window must be a number of days, weeks, months or years such as '12M', got {window!r}")
+    return int(match.group(1)), match.group(2)
+
+
+def window_label(window: str) -> str:
+    """'12-Month' for '12M'."""
+    n, unit = parse_window(window)
+    return f"{n}-{_UNITS[unit]}"
+
+
+def _offset(window: str) -> pd.DateOffset:
+    n, unit = parse_window(window)
+    return pd.DateOffset(**{{'D': 'days', 'W': 'weeks', 'M': 'months', 'Y': 'years'}[unit]: n})
+
+
+def window_starts(dates, window: str) -> np.ndarray:
+    """
+    Index of the first of the ascending dates in each date's window: the
+    dates after it minus the calendar window, up to and including it.
+    """
+    dates = pd.DatetimeIndex(dates)
+    return np.searchsorted(dates.asi8, (dates - _offset(window)).asi8, side='right')
+
+
+def rolling_sum(values: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    totals = np.concatenate(([0.0], np.cumsum(values, dtype=float)))
+    return totals[np.arange(1, len(values) + 1)] - totals[starts]
+
+
+def rolling_mean(values: np.ndarray, starts: np.ndarray, weights: Optional[np.ndarray] = None) -> np.ndarray:
+    """Mean of the points in each window, weighted by weights when given."""
+    if weights is None:
+        return rolling_sum(values, starts) / (np.arange(1, len(values) + 1) - starts)
+    return rolling_sum(values * weights, starts) / rolling_sum(weights, starts)
+
+
+def rolling_max(values: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """Max over each window with a monotonic deque; starts must not decrease."""
+    result = np.empty(len(values))
+    candidates = deque()
+    for i, value in enumerate(values):
+        while candidates and values[candidates[-1]] <= value:
+            candidates.pop()
+        candidates.append(i)
+        while candidates[0] < starts[i]:
+            candidates.popleft()
+        result[i] = values[candidates[0]]
+    return result
+
+
+def rolling_rate(values: np.ndarray, dates, window: str, resolution: str, first_day: int) -> np.ndarray:
+    """
+    Window sums per period of the series resolution, counting the periods
+    with no point as zeros. Windows reaching back before first_day (the
+    series start) cover only the periods since.
+    """
+    dates = pd.DatetimeIndex(dates)
+    day = dates.asi8 // (86400 * 10 ** 9)
+    before = (dates - _offset(window)).asi8 // (86400 * 10 ** 9)
+    bins = to_bins(day, resolution)
+    periods = bins - np.maximum(to_bins(before, resolution), to_bins(first_day, resolution) - 1)
+    return rolling_sum(values, window_starts(dates, window)) / periods
+
+
+def rolling_ewm(values: np.ndarray, dates, window: str, weights: Optional[np.ndarray] = None) -> np.ndarray:
+    """Exponentially weighted mean over time, with the window as half-life."""
+    n, unit = parse_window(window)
+    halflife = pd.Timedelta(days=n * _UNIT_DAYS[unit])
+    times = pd.DatetimeIndex(dates)
+
+    def ewm(series: np.ndarray) -> np.ndarray:
+        return pd.Series(series).ewm(halflife=halflife, times=times).mean().to_numpy()
+
+    if weights is None:
+        return ewm(values)
+    return ewm(values * weights) / ewm(weights)
+
+
+def rolling(values, dates, window: str, stat: str = 'mean', resolution: str = 'month',
+            weights=None, first_day: Optional[int] = None) -> np.ndarray:
+    """
+    Rolling stat ('sum', 'mean', 'rate', 'max' or 'ewm') of values at
+    ascending dates over a calendar window, one result per point. Every
+    point is in its own window, so the first points use what is there.
+    """
+    if stat not in STATS:
+        raise ValueError(f"stat must be one of {', '.join(STATS)}")
+    values = np.asarray(values, dtype=float)
+    weights = None if weights is None else np.asarray(weights, dtype=float)
+    if len(values) == 0:
+        return values
+    if stat == 'ewm':
+        return rolling_ewm(values, dates, window, weights)
+    if stat == 'rate':
+        first_day = to_day(pd.DatetimeIndex(dates)[0]) if first_day is None else first_day
+        return rolling_rate(values, dates, window, resolution, first_day)
+    starts = window_starts(dates, window)
+    if stat == 'sum':
+        return rolling_sum(values, starts)
+    if stat == 'max':
+        return rolling_max(values, starts)
+    return rolling_mean(values, starts, weights)
+
+
+@versioned_cache('rolling_series', maxsize=64)
+def series_rolling(data_processor, series_args: tuple, column: str, stat: str = 'mean',
+                   window: Optional[str] = None, weights: Optional[str] = None) -> np.ndarray:
+    """
+    Rolling stat of a column of get_time_series_data(*series_args), cached
+    per series so toggling a moving average on and off recomputes nothing.
+    'cumulative_count' is the running total of 'count'. Without a window the
+    series resolution's DEFAULT_WINDOWS entry is used.
+    """
+    series = data_processor.get_time_series_data(*series_args)
+    if series.empty:
+        return np.empty(0)
+    resolution = series.attrs.get('resolution', 'month')
+    values = series['count'].cumsum() if column == 'cumulative_count' else series[column]
+    # The window start, not the first non-empty period, for rates
+    start = series_args[1] if len(series_args) > 1 else None
+    return rolling(
+        values.to_numpy(dtype=float), series['date'], window or DEFAULT_WINDOWS[resolution], stat, resolution,
+        weights=None if weights is None else series[weights].to_numpy(dtype=float),
+        first_day=to_day(start) if start is not None else None
+    )
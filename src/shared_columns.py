@@ -0,0 +1,255 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Bump when the on-disk layout changes; attach refuses other schemas
+SCHEMA_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+# Every process using a published directory holds a shared flock on this file in it;
+# cleanup only removes directories nobody holds
+LOCK_NAME = ".lock"
+
+# Published path -> open lock file, for the directories this process uses
+_held: Dict[str, object] = {}
+
+
+def default_directory() -> str:
+    """tmpfs when available, so the column files live in memory rather than on disk."""
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.environ.get("EQ_SHARED_DIR", os.path.join(base, "eq-columns"))
+
+
+def _column_spec(name: str, series: pd.Series) -> Optional[tuple]:
+    """(manifest entry, array to save) for a shareable column, or None for object columns."""
+    dtype = series.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        categories = dtype.categories
+        if categories.dtype.kind not in "OUiuf":
+            return None
+        spec = {"kind": "categorical", "categories": categories.tolist(), "ordered": bool(dtype.ordered)}
+        return spec, series.cat.codes.to_numpy()
+    if isinstance(dtype, pd.DatetimeTZDtype) or dtype.kind == "M":
+        tz = dtype.tz if isinstance(dtype, pd.DatetimeTZDtype) else None
+        unit = dtype.unit if tz is not None else np.datetime_data(dtype)[0]
+        # Wall times in UTC for tz-aware columns; NaT stays NaT
+        values = series.to_numpy(dtype=f"M8[{unit}]")
+        spec = {"kind": "datetime", "unit": unit, "tz": str(tz) if tz is not None else None}
+        return spec, values.view("i8")
+    if dtype.kind in "biuf":
+        return {"kind": "numeric"}, series.to_numpy()
+    return None
+
+
+def _layout(data: pd.DataFrame) -> Tuple[List[dict], List[np.ndarray], Optional[np.ndarray], str]:
+    """
+    (column specs, their arrays, index array or None, fingerprint) of data.
+
+    The fingerprint hashes the schema, the specs and every shared value, so a
+    frame that differs in any way (a changed preprocessing step, a new column
+    or dtype) never reuses another frame's files.
+    """
+    specs, arrays = [], []
+    for i, name in enumerate(data.columns):
+        found = _column_spec(name, data[name])
+        if found is None:
+            continue
+        spec, values = found
+        spec.update(name=name, file=f"{i:03d}.npy", dtype=values.dtype.str)
+        specs.append(spec)
+        arrays.append(np.ascontiguousarray(values))
+
+    index = None
+    if not isinstance(data.index, pd.RangeIndex) and data.index.dtype.kind in "iu":
+        index = np.ascontiguousarray(data.index.to_numpy())
+
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(json.dumps([SCHEMA_VERSION, len(data), specs, index is not None], default=str).encode())
+    for values in arrays + ([index] if index is not None else []):
+        digest.update(memoryview(values).cast("B"))
+    return specs, arrays, index, digest.hexdigest()
+
+
+def _matches(path: str, specs: List[dict], rows: int) -> bool:
+    """Whether the manifest at path describes these columns and rows."""
+    try:
+        manifest = read_manifest(path)
+    except (OSError, ValueError):
+        return False
+    return manifest["rows"] == rows and manifest["columns"] == json.loads(json.dumps(specs, default=str))
+
+
+def publish_columns(data: pd.DataFrame, version: str, directory: Optional[str] = None) -> str:
+    """
+    Write the numeric, datetime and categorical-code columns of `data` as .npy
+    files plus a manifest under directory/<version>-<fingerprint>, and return
+    that path, held for this process (see hold()).
+
+    Publishing is atomic (written to a temporary directory, then renamed) and a
+    directory already published for the same content is reused.
+    """
+    directory = directory or default_directory()
+    specs, arrays, index, fingerprint = _layout(data)
+    target = os.path.join(directory, f"{version}-{fingerprint}")
+    if _matches(target, specs, len(data)) and hold(target):
+        return target
+
+    os.makedirs(directory, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=f".{version}-", dir=directory)
+    for spec, values in zip(specs, arrays):
+        np.save(os.path.join(staging, spec["file"]), values)
+    index_file = None
+    if index is not None:
+        index_file = "index.npy"
+        np.save(os.path.join(staging, index_file), index)
+
+    manifest = {
+        "schema": SCHEMA_VERSION,
+        "version": version,
+        "rows": len(data),
+        "index": index_file,
+        "columns": specs,
+    }
+    with open(os.path.join(staging, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, default=str)
+    # Held before it becomes visible, so no cleanup can take it in between
+    hold(staging)
+    try:
+        os.rename(staging, target)
+        _held[target] = _held.pop(staging)
+    except OSError:
+        if _matches(target, specs, len(data)):
+            # Another process published the same content first
+            _held.pop(staging).close()
+            shutil.rmtree(staging, ignore_errors=True)
+            if not hold(target):
+                raise
+            return target
+        # A damaged directory under the same name: moved aside and replaced
+        stale = tempfile.mkdtemp(prefix=".stale-", dir=directory)
+        os.rename(target, os.path.join(stale, "columns"))
+        shutil.rmtree(stale, ignore_errors=True)
+        os.rename(staging, target)
+        _held[target] = _held.pop(staging)
+    return target
+
+
+def hold(path: str) -> bool:
+    """
+    Mark a published directory as in use by this process (and the processes
+    it forks) and release the ones it held before, so remove_unused() can
+    take those once nobody else holds them either. False when the directory
+    was removed before the hold was taken.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        return os.path.exists(os.path.join(path, MANIFEST_NAME))
+    if path not in _held:
+        try:
+            lock_file = open(os.path.join(path, LOCK_NAME), "a")
+        except OSError:
+            return False
+        fcntl.flock(lock_file, fcntl.LOCK_SH)
+        # A cleanup that held the lock first has removed the directory meanwhile
+        if not os.path.exists(os.path.join(path, MANIFEST_NAME)):
+            lock_file.close()
+            return False
+        _held[path] = lock_file
+    for other in [other for other in _held if other != path]:
+        _held.pop(other).close()
+    return True
+
+
+def remove_unused(directory: Optional[str] = None) -> List[str]:
+    """
+    Remove the published directories under directory that no process holds,
+    and return their names. Directories without a lock file (or where flock
+    is unavailable) are left alone, as are staging directories.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        return []
+    directory = directory or default_directory()
+    removed = []
+    for entry in sorted(os.listdir(directory)) if os.path.isdir(directory) else []:
+        path = os.path.join(directory, entry)
+        if entry.startswith(".") or path in _held or not os.path.exists(os.path.join(path, LOCK_NAME)):
+            continue
+        with open(os.path.join(path, LOCK_NAME), "a") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                continue
+            # Still locked while it goes, so nobody attaches halfway through
+            shutil.rmtree(path, ignore_errors=True)
+        removed.append(entry)
+    return removed
+
+
+def read_manifest(path: str) -> dict:
+    """Load and check the manifest of a published dataset directory."""
+    with open(os.path.join(path, MANIFEST_NAME)) as f:
+        manifest = json.load(f)
+    if manifest.get("schema") != SCHEMA_VERSION:
+        raise ValueError(f"Unsupported shared column schema {manifest.get('schema')} in {path}")
+    return manifest
+
+
+def attach_columns(path: str) -> tuple:
+    """
+    Map a published dataset read-only.
+
+    Returns (manifest, columns, index): columns maps name to a zero-copy array
+    (ndarray, DatetimeArray or Categorical) over the mapped file, and index is
+    the row index array or None for a default RangeIndex.
+    """
+    manifest = read_manifest(path)
+    columns = {}
+    for spec in manifest["columns"]:
+        values = np.asarray(np.load(os.path.join(path, spec["file"]), mmap_mode="r"))
+        if spec["kind"] == "categorical":
+            columns[spec["name"]] = pd.Categorical.from_codes(
+                values, categories=spec["categories"], ordered=spec["ordered"]
+            )
+        elif spec["kind"] == "datetime":
+            unit = spec["unit"]
+            dates = pd.DatetimeIndex(values.view(f"M8[{unit}]"), copy=False).array
+            if spec["tz"]:
+                # The stored values are UTC; a view only changes how they are shown
+                dates = dates.view(pd.DatetimeTZDtype(unit=unit, tz=spec["tz"]))
+            columns[spec["name"]] = dates
+        else:
+            columns[spec["name"]] = values
+
+    index = None
+    if manifest["index"]:
+        index = np.asarray(np.load(os.path.join(path, manifest["index"]), mmap_mode="r"))
+    return manifest, columns, index
+
+
+def share_frame(data: pd.DataFrame, version: str, directory: Optional[str] = None) -> tuple:
+    """
+    Publish `data` and rebuild it over the mapped columns.
+
+    Object columns (free text such as Place or ID) cannot be mapped and are
+    carried over as they are. The directory is held for this process, and
+    directories of earlier versions nobody holds any more are removed.
+    Returns (frame, published path).
+    """
+    path = publish_columns(data, version, directory)
+    remove_unused(os.path.dirname(path))
+    manifest, columns, index = attach_columns(path)
+    if manifest["rows"] != len(data):
+        raise ValueError(f"Shared columns in {path} have {manifest['rows']} rows, expected {len(data)}")
+
+    frame = {name: columns[name] if name in columns else data[name].to_numpy() for name in data.columns}
+    index = pd.Index(index, copy=False) if index is not None else data.index
+    # copy=False also keeps pandas from consolidating the mapped columns into new blocks
+    return pd.DataFrame(frame, index=index, columns=data.columns, copy=False), path
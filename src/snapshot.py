@@ -0,0 +1,153 @@
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+import globals
+from src.cache import get_caches
+from src.metrics import Counter
+
+# Seconds between checks of the dataset file for changes; 0 turns the watcher off
+RELOAD_INTERVAL = float(os.environ.get('EQ_RELOAD_INTERVAL', 10))
+# Processes building a snapshot take turns on this lock file, so app instances on
+# one machine that see the same change don't all rebuild at once
+BUILD_LOCK_PATH = os.environ.get('EQ_SNAPSHOT_LOCK', os.path.join(tempfile.gettempdir(), 'eq-snapshot.lock'))
+
+dataset_reloads = Counter(
+    'eq_dataset_reloads_total', 'Dataset snapshots built after the file changed, by result.', ('result',)
+)
+
+
+@contextmanager
+def _build_slot():
+    """One snapshot build at a time across processes (where flock is available)."""
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    with open(BUILD_LOCK_PATH, 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class SnapshotManager:
+    """
+    Publishes dataset snapshots in globals.data_processor.
+
+    A snapshot is a DataProcessor built from one version of the dataset file,
+    with its indexes, aggregates and warmed figures, and is not changed once
+    published. A new one is built off to the side and swapped in with a single
+    assignment; callbacks read globals.data_processor once when they start, so
+    requests in flight finish on the snapshot they started with. Cache entries
+    of other versions are dropped after the swap.
+    """
+
+    def __init__(self, data_path: str, share_columns: bool = False,
+                 warm: Optional[Callable] = None):
+        self.data_path = data_path
+        self.share_columns = share_columns
+        self.warm = warm
+        self._build_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+        # File version seen changed on the last poll, built once it stays the same
+        self._pending = None
+        # Called after the watcher publishes a new snapshot
+        self._on_publish = None
+
+    def _build(self):
+        from src.data_processor import DataProcessor
+
+        data_processor = DataProcessor(self.data_path)
+        if self.share_columns:
+            data_processor.share_columns()
+        if self.warm:
+            self.warm(data_processor)
+        return data_processor
+
+    def _publish(self, data_processor):
+        globals.data_processor = data_processor
+        for cache in get_caches().values():
+            cache.discard_other_versions(data_processor.version)
+        globals.data_ready.set()
+
+    def load(self):
+        """Build and publish the first snapshot."""
+        with self._build_lock:
+            self._publish(self._build())
+
+    def reload(self) -> bool:
+        """
+        Build a snapshot of the file as it is now and publish it. A snapshot that
+        loaded no rows, or whose file changed while it was built, is dropped and
+        the current one kept. Returns whether a new snapshot was published.
+        """
+        from src.data_processor import dataset_version
+
+        with self._build_lock, _build_slot():
+            data_processor = self._build()
+            if data_processor.processed_data is None or data_processor.processed_data.empty:
+                dataset_reloads.inc(('failed',))
+                print(f"Dataset reload produced no rows; keeping snapshot "
+                      f"{getattr(globals.data_processor, 'version', None)}")
+                return False
+            if dataset_version(self.data_path) != data_processor.version:
+                # Picked up again on a later poll
+                dataset_reloads.inc(('stale',))
+                return False
+            self._publish(data_processor)
+        dataset_reloads.inc(('ok',))
+        print(f"Published dataset snapshot {data_processor.version}")
+        return True
+
+    def check(self) -> bool:
+        """
+        One watcher poll: reload when the file's version differs from the
+        published snapshot and has not changed since the previous poll (so a
+        file still being written is not read half-way).
+        """
+        from src.data_processor import dataset_version
+
+        version = dataset_version(self.data_path)
+        if version is None or version == getattr(globals.data_processor, 'version', None):
+            self._pending = None
+            return False
+        if version != self._pending:
+            self._pending = version
+            return False
+        self._pending = None
+        return self.reload()
+
+    def wait_idle(self):
+        """Block until no snapshot is being built in this process (e.g. before forking)."""
+        with self._build_lock:
+            pass
+
+    def start_watching(self, interval: float = RELOAD_INTERVAL, on_publish: Optional[Callable] = None):
+        """
+        Poll the dataset file every `interval` seconds in a daemon thread (once
+        per process), calling on_publish() after each new snapshot is published.
+        """
+        if interval <= 0 or (self._watcher is not None and self._watcher.is_alive()):
+            return
+        self._on_publish = on_publish
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), name='dataset-watcher', daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        self._stop.set()
+
+    def _watch(self, interval: float):
+        while not self._stop.wait(interval):
+            try:
+                if self.check() and self._on_publish is not None:
+                    self._on_publish()
+            except Exception as e:
+                dataset_reloads.inc(('failed',))
+                print(f"Error reloading dataset: {type(e).__name__}: {e}")
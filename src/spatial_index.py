@@ -0,0 +1,143 @@
+import math
+import numpy as np
+from typing import Dict, Optional, Tuple
+
+# Mapbox GL renders the world as 512 px wide at zoom 0
+MAPBOX_TILE_SIZE = 512
+
+class GridIndex:
+    """
+    Uniform lat/lon grid over event positions.
+
+    Row positions are stored sorted by cell id, so every cell (and every run of
+    cells along one grid row) is a contiguous slice of `order`.
+    """
+
+    def __init__(self, lat, lon, cell_deg: float = 1.0):
+        self.cell_deg = cell_deg
+        self.lat = np.asarray(lat, dtype=float)
+        self.lon = np.asarray(lon, dtype=float)
+        self.n_rows = int(math.ceil(180 / cell_deg))
+        self.n_cols = int(math.ceil(360 / cell_deg))
+
+        cells = self._row(self.lat) * self.n_cols + self._col(self.lon)
+        self.order = np.argsort(cells, kind='stable')
+        counts = np.bincount(cells, minlength=self.n_rows * self.n_cols)
+        self.cell_starts = np.concatenate(([0], np.cumsum(counts)))
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def _row(self, lat):
+        return np.clip(((np.asarray(lat) + 90) // self.cell_deg).astype(int), 0, self.n_rows - 1)
+
+    def _col(self, lon):
+        return np.clip(((np.asarray(lon) + 180) // self.cell_deg).astype(int), 0, self.n_cols - 1)
+
+    def query(self, bounds: Tuple[float, float, float, float]) -> np.ndarray:
+        """
+        Sorted row positions of the events inside bounds = (min_lat, max_lat, min_lon, max_lon).
+        Longitudes are wrapped, so min_lon > max_lon (or values past ±180) cross the antimeridian.
+        """
+        min_lat, max_lat, min_lon, max_lon = bounds
+        min_lat, max_lat = max(min_lat, -90.0), min(max_lat, 90.0)
+        if min_lat > max_lat:
+            return np.empty(0, dtype=int)
+
+        if max_lon - min_lon >= 360:
+            lon_ranges = [(-180.0, 180.0)]
+        else:
+            west = (min_lon + 180) % 360 - 180
+            east = (max_lon + 180) % 360 - 180
+            if west <= east:
+                lon_ranges = [(west, east)]
+            else:
+                lon_ranges = [(west, 180.0), (-180.0, east)]
+
+        row0, row1 = int(self._row(min_lat)), int(self._row(max_lat))
+        chunks = []
+        for west, east in lon_ranges:
+            col0, col1 = int(self._col(west)), int(self._col(east))
+            for row in range(row0, row1 + 1):
+                start = self.cell_starts[row * self.n_cols + col0]
+                stop = self.cell_starts[row * self.n_cols + col1 + 1]
+                candidates = self.order[start:stop]
+                if len(candidates) == 0:
+                    continue
+                lat, lon = self.lat[candidates], self.lon[candidates]
+                inside = (lat >= min_lat) & (lat <= max_lat) & (lon >= west) & (lon <= east)
+                chunks.append(candidates[inside])
+
+        if not chunks:
+            return np.empty(0, dtype=int)
+        return np.sort(np.concatenate(chunks))
+
+def cluster_points(lat, lon, mag, cell_deg: float) -> Dict[str, np.ndarray]:
+    """
+    Grid-cluster points into cells of `cell_deg` degrees.
+    Returns per-cluster 'lat', 'lon' (mean position), 'count' and 'max_mag'.
+    """
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    mag = np.asarray(mag, dtype=float)
+    if len(lat) == 0:
+        empty = np.empty(0)
+        return {'lat': empty, 'lon': empty, 'count': np.empty(0, dtype=int), 'max_mag': empty}
+
+    n_cols = int(math.ceil(360 / cell_deg))
+    cells = ((lat + 90) // cell_deg).astype(np.int64) * n_cols + ((lon + 180) // cell_deg).astype(np.int64)
+    unique_cells, inverse = np.unique(cells, return_inverse=True)
+
+    counts = np.bincount(inverse)
+    max_mag = np.full(len(unique_cells), -np.inf)
+    np.maximum.at(max_mag, inverse, mag)
+    return {
+        'lat': np.bincount(inverse, weights=lat) / counts,
+        'lon': np.bincount(inverse, weights=lon) / counts,
+        'count': counts,
+        'max_mag': max_mag
+    }
+
+def lat_to_mercator_y(lat):
+    """Web Mercator y in [0, 1] (0 at the north edge)."""
+    lat = np.clip(lat, -85.05112878, 85.05112878)
+    sin_lat = np.sin(np.radians(lat))
+    return 0.5 - np.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+
+def mercator_y_to_lat(y):
+    return np.degrees(np.arctan(np.sinh(math.pi * (1 - 2 * np.asarray(y)))))
+
+def bounds_from_center_zoom(center: Dict[str, float], zoom: float,
+                            width_px: int = 1000, height_px: int = 500) -> Tuple[float, float, float, float]:
+    """Approximate (min_lat, max_lat, min_lon, max_lon) seen by a map of the given pixel size."""
+    world_px = MAPBOX_TILE_SIZE * 2 ** zoom
+    half_lon = 360 * width_px / world_px / 2
+    center_y = lat_to_mercator_y(center['lat'])
+    half_y = height_px / world_px / 2
+    return (
+        float(mercator_y_to_lat(min(center_y + half_y, 1.0))),
+        float(mercator_y_to_lat(max(center_y - half_y, 0.0))),
+        center['lon'] - half_lon,
+        center['lon'] + half_lon
+    )
+
+def viewport_from_relayout(relayout_data: Optional[dict]) -> Optional[Tuple[Tuple[float, float, float, float], float]]:
+    """
+    Extract ((min_lat, max_lat, min_lon, max_lon), zoom) from a mapbox graph's relayoutData.
+    Returns None when the event carries no view information (e.g. autosize).
+    """
+    if not relayout_data:
+        return None
+
+    for prefix in ('mapbox', 'map'):
+        zoom = relayout_data.get(f'{prefix}.zoom')
+        derived = relayout_data.get(f'{prefix}._derived')
+        if derived and derived.get('coordinates'):
+            lons = [c[0] for c in derived['coordinates']]
+            lats = [c[1] for c in derived['coordinates']]
+            # Corners are NW, NE, SE, SW; longitudes may run past ±180 after panning
+            return (min(lats), max(lats), lons[0], lons[1]), float(zoom if zoom is not None else 1)
+        center = relayout_data.get(f'{prefix}.center')
+        if center and zoom is not None:
+            return bounds_from_center_zoom(center, zoom), float(zoom)
+    return None
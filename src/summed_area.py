@@ -0,0 +1,122 @@
+import math
+from typing import Optional, Tuple
+
+import numpy as np
+
+# Grid sizes tried for a table, finest first; the finest that fits the byte budget is used
+CELL_SIZES = (0.25, 0.5, 1.0, 2.0, 5.0)
+MAX_TABLE_BYTES = 64 * 2 ** 20
+# Edges of the magnitude bands of DataProcessor.magnitude_counts
+MAGNITUDE_BANDS = [4.0, 5.0, 6.0, 7.0]
+
+
+class SummedAreaTable:
+    """
+    Event counts over a lat/lon grid in layers (years, magnitude bands),
+    summed along every axis: table[l, r, c] is the number of events in
+    layers below l, grid rows below r and columns below c. Any block of
+    layers, rows and columns is then counted from its 8 corners in constant
+    time, whatever the number of events in it.
+
+    Counts are exact at grid resolution: a rectangle counts every event in
+    the cells it touches.
+    """
+
+    def __init__(self, cell_deg: float, first_layer: int, n_layers: int):
+        self.cell_deg = cell_deg
+        self.first_layer = first_layer
+        self.n_rows = int(math.ceil(180 / cell_deg))
+        self.n_cols = int(math.ceil(360 / cell_deg))
+        self.table = np.zeros((n_layers + 1, self.n_rows + 1, self.n_cols + 1), dtype=np.int32)
+
+    @classmethod
+    def build(cls, lat, lon, layer, cell_deg: Optional[float] = None,
+              max_bytes: int = MAX_TABLE_BYTES) -> 'SummedAreaTable':
+        """
+        Table of events at (lat, lon) in integer layers. Without cell_deg the
+        finest of CELL_SIZES whose table fits in max_bytes is used.
+        """
+        layer = np.asarray(layer, dtype=np.int64)
+        first = int(layer.min()) if len(layer) else 0
+        n_layers = int(layer.max()) - first + 1 if len(layer) else 1
+        if cell_deg is None:
+            fits = [size for size in CELL_SIZES
+                    if (n_layers + 1) * (math.ceil(180 / size) + 1) * (math.ceil(360 / size) + 1) * 4 <= max_bytes]
+            cell_deg = fits[0] if fits else CELL_SIZES[-1]
+        table = cls(cell_deg, first, n_layers)
+        table.add(lat, lon, layer)
+        return table
+
+    @property
+    def n_layers(self) -> int:
+        return self.table.shape[0] - 1
+
+    def _row(self, lat):
+        return np.clip(((np.asarray(lat, dtype=float) + 90) // self.cell_deg).astype(np.int64), 0, self.n_rows - 1)
+
+    def _col(self, lon):
+        return np.clip(((np.asarray(lon, dtype=float) + 180) // self.cell_deg).astype(np.int64), 0, self.n_cols - 1)
+
+    def _grow(self, first: int, last: int):
+        """Extend the layer axis to cover layers first..last."""
+        before = max(self.first_layer - first, 0)
+        after = max(last - (self.first_layer + self.n_layers - 1), 0)
+        if before or after:
+            # Prefix sums: new leading layers add nothing, new trailing ones repeat the total
+            self.table = np.concatenate([
+                np.zeros((before,) + self.table.shape[1:], dtype=self.table.dtype),
+                self.table,
+                np.repeat(self.table[-1:], after, axis=0)
+            ])
+            self.first_layer -= before
+
+    def add(self, lat, lon, layer):
+        """
+        Count more events. Costs one pass over the table per call, not per
+        event, so append events in batches.
+        """
+        layer = np.asarray(layer, dtype=np.int64)
+        if len(layer) == 0:
+            return
+        self._grow(int(layer.min()), int(layer.max()))
+        if int(self.table[-1, -1, -1]) + len(layer) > np.iinfo(self.table.dtype).max:
+            self.table = self.table.astype(np.int64)
+        shape = self.table.shape
+        cells = ((layer - self.first_layer + 1) * shape[1] + self._row(lat) + 1) * shape[2] + self._col(lon) + 1
+        delta = np.bincount(cells, minlength=self.table.size).astype(self.table.dtype).reshape(shape)
+        for axis in range(3):
+            np.cumsum(delta, axis=axis, out=delta)
+        self.table += delta
+
+    def _block(self, l0: int, l1: int, r0: int, r1: int, c0: int, c1: int) -> int:
+        """Events in layers [l0, l1), rows [r0, r1) and columns [c0, c1) (table indices)."""
+        t = self.table
+        return int(
+            t[l1, r1, c1] - t[l0, r1, c1] - t[l1, r0, c1] - t[l1, r1, c0]
+            + t[l0, r0, c1] + t[l0, r1, c0] + t[l1, r0, c0] - t[l0, r0, c0]
+        )
+
+    def count(self, bounds: Optional[Tuple[float, float, float, float]] = None,
+              first: Optional[int] = None, last: Optional[int] = None) -> int:
+        """
+        Events in the cells touching bounds = (min_lat, max_lat, min_lon,
+        max_lon), in layers first..last (inclusive). Longitudes are wrapped,
+        so min_lon > max_lon crosses the antimeridian.
+        """
+        l0 = 0 if first is None else min(max(first - self.first_layer, 0), self.n_layers)
+        l1 = self.n_layers if last is None else min(max(last - self.first_layer + 1, 0), self.n_layers)
+        if l0 >= l1:
+            return 0
+        if not bounds:
+            return self._block(l0, l1, 0, self.n_rows, 0, self.n_cols)
+
+        min_lat, max_lat, min_lon, max_lon = bounds
+        if min_lat > max_lat:
+            return 0
+        r0, r1 = int(self._row(min_lat)), int(self._row(max_lat)) + 1
+        if max_lon - min_lon >= 360:
+            return self._block(l0, l1, r0, r1, 0, self.n_cols)
+        west, east = int(self._col((min_lon + 180) % 360 - 180)), int(self._col((max_lon + 180) % 360 - 180))
+        if west <= east:
+            return self._block(l0, l1, r0, r1, west, east + 1)
+        return self._block(l0, l1, r0, r1, west, self.n_cols) + self._block(l0, l1, r0, r1, 0, east + 1)
@@ -0,0 +1,257 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+RESOLUTIONS = ('day', 'week', 'month', 'year')
+# 'auto' picks the finest resolution that keeps a series within this many points
+MAX_POINTS = 250
+
+# Magnitude classes, split where get_time_series_data's filters used to cut:
+# < 4.0, 4.0–5.9, (5.9, 6.0), 6.0–6.9, (6.9, 7.0), ≥ 7.0. The two gaps are
+# in no named filter, only in 'all'
+N_CLASSES = 6
+MAGNITUDE_CLASSES = {'minor': [0], 'moderate': [1], 'strong': [3], 'major': [5]}
+
+_NS_PER_DAY = 86400 * 10 ** 9
+STATS = ('count', 'sum_mag', 'max_mag', 'sum_depth')
+
+
+def magnitude_class(mag: np.ndarray) -> np.ndarray:
+    return np.select(
+        [mag < 4.0, mag <= 5.9, mag < 6.0, mag <= 6.9, mag < 7.0],
+        [0, 1, 2, 3, 4], default=5
+    )
+
+
+def to_bins(days: np.ndarray, resolution: str) -> np.ndarray:
+    """Bin numbers at resolution of days since 1970-01-01. Weeks start on Monday."""
+    days = np.asarray(days, dtype=np.int64)
+    if resolution == 'day':
+        return days
+    if resolution == 'week':
+        # 1970-01-01 was a Thursday
+        return (days + 3) // 7
+    unit = 'M' if resolution == 'month' else 'Y'
+    return days.astype('datetime64[D]').astype(f'datetime64[{unit}]').astype(np.int64)
+
+
+def bin_start(bins: np.ndarray, resolution: str) -> np.ndarray:
+    """First day (since 1970-01-01) of each bin."""
+    bins = np.asarray(bins, dtype=np.int64)
+    if resolution == 'day':
+        return bins
+    if resolution == 'week':
+        return bins * 7 - 3
+    unit = 'M' if resolution == 'month' else 'Y'
+    return bins.astype(f'datetime64[{unit}]').astype('datetime64[D]').astype(np.int64)
+
+
+def to_day(timestamp) -> int:
+    """Day since 1970-01-01 (UTC) of a timestamp or date string."""
+    timestamp = pd.Timestamp(timestamp)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_convert('UTC').tz_localize(None)
+    return timestamp.value // _NS_PER_DAY
+
+
+def pick_resolution(first_day: int, last_day: int) -> str:
+    """Finest resolution with at most MAX_POINTS bins from first_day to last_day."""
+    for resolution in RESOLUTIONS[:-1]:
+        bins = to_bins(np.array([first_day, last_day]), resolution)
+        if bins[1] - bins[0] + 1 <= MAX_POINTS:
+            return resolution
+    return RESOLUTIONS[-1]
+
+
+def time_window_from_relayout(relayout_data: Optional[dict]) -> Optional[Tuple[pd.Timestamp, pd.Timestamp]]:
+    """
+    (start, end) in UTC of the x axis after a zoom or pan on a date axis,
+    from a graph's relayoutData. None when the event sets no x range
+    (autorange, autosize, a y-only zoom).
+    """
+    if not relayout_data:
+        return None
+    x_range = relayout_data.get('xaxis.range')
+    if x_range is None and 'xaxis.range[0]' in relayout_data and 'xaxis.range[1]' in relayout_data:
+        x_range = [relayout_data['xaxis.range[0]'], relayout_data['xaxis.range[1]']]
+    if not x_range or len(x_range) != 2:
+        return None
+    try:
+        start, end = sorted(pd.Timestamp(value) for value in x_range)
+    except (TypeError, ValueError):
+        return None
+    # Plotly reports dates on the axis's own (naive, UTC) scale
+    return tuple(t.tz_localize('UTC') if t.tzinfo is None else t.tz_convert('UTC') for t in (start, end))
+
+
+class TemporalPyramid:
+    """
+    Event count, summed and largest magnitude and summed depth per country,
+    magnitude class and day, week, month and year.
+
+    Each resolution keeps only its non-empty entries, sorted by group
+    (country row and magnitude class) and bin, so a group's bins in a window
+    are found by binary search. Country rows follow the country list given to
+    build(), with one row for events without a country and a last row for all
+    events. A series costs O(points in the window), not O(events).
+
+    Windows are exact to the day: bins cut by the window's ends are filled in
+    from the day entries.
+    """
+
+    def __init__(self, countries: List[str], first_day: int, last_day: int,
+                 levels: Dict[str, Dict[str, np.ndarray]]):
+        self.countries = countries
+        self.total_row = len(countries) + 1
+        self.first_day = first_day
+        self.last_day = last_day
+        # Per resolution: 'key' (group * span + bin - first bin, ascending), 'first_bin', 'span' and STATS
+        self.levels = levels
+
+    @classmethod
+    def build(cls, data: pd.DataFrame, countries: List[str]) -> 'TemporalPyramid':
+        """Pyramid of processed_data, with country rows in the order of countries."""
+        time = data['time']
+        valid = time.notna().to_numpy()
+        if not valid.any():
+            return cls(list(countries), 0, -1, {})
+        days = time.to_numpy(dtype='datetime64[ns]')[valid].astype(np.int64) // _NS_PER_DAY
+
+        codes = pd.Categorical(data['country'], categories=countries).codes.astype(np.int64)[valid]
+        codes = np.where(codes < 0, len(countries), codes)
+        mag = data['mag'].to_numpy(dtype=float)[valid]
+        depth = data['depth'].to_numpy(dtype=float)[valid]
+        mag_class = magnitude_class(mag)
+
+        # Sorted by group then time once per pass; every resolution's bins are then in order too
+        passes = []
+        for groups in ((codes * N_CLASSES + mag_class), (len(countries) + 1) * N_CLASSES + mag_class):
+            order = np.lexsort((days, groups))
+            passes.append((groups[order], days[order], mag[order], depth[order]))
+
+        levels = {}
+        for resolution in RESOLUTIONS:
+            first_bin, last_bin = to_bins(np.array([days.min(), days.max()]), resolution)
+            span = int(last_bin - first_bin + 1)
+            parts = []
+            for groups, pass_days, pass_mag, pass_depth in passes:
+                key = groups * span + to_bins(pass_days, resolution) - first_bin
+                starts = np.concatenate(([0], np.flatnonzero(np.diff(key)) + 1))
+                entry = np.cumsum(np.r_[0, np.diff(key) != 0])
+                parts.append({
+                    'key': key[starts],
+                    'count': np.bincount(entry).astype(np.int64),
+                    'sum_mag': np.bincount(entry, weights=pass_mag),
+                    'max_mag': np.maximum.reduceat(pass_mag, starts),
+                    'sum_depth': np.bincount(entry, weights=pass_depth),
+                })
+            # The all-events groups sort after every country group
+            level = {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+            level.update(first_bin=int(first_bin), span=span)
+            levels[resolution] = level
+        return cls(list(countries), int(days.min()), int(days.max()), levels)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(array.nbytes for level in self.levels.values() for array in level.values()
+                   if isinstance(array, np.ndarray))
+
+    def resolve(self, resolution: str, start_day: Optional[int] = None, end_day: Optional[int] = None) -> str:
+        """resolution, or for 'auto' the one pick_resolution() gives for the window (within the data)."""
+        if resolution != 'auto':
+            return resolution
+        first = self.first_day if start_day is None else max(start_day, self.first_day)
+        last = self.last_day if end_day is None else min(end_day, self.last_day)
+        return pick_resolution(first, max(first, last))
+
+    def _entries(self, resolution: str, groups: np.ndarray, first_bin: Optional[int],
+                 last_bin: Optional[int]) -> np.ndarray:
+        """Positions of the entries of groups in bins first_bin..last_bin (inclusive) at resolution."""
+        level = self.levels[resolution]
+        span, offset = level['span'], level['first_bin']
+        lo = 0 if first_bin is None else min(max(first_bin - offset, 0), span)
+        hi = span - 1 if last_bin is None else min(max(last_bin - offset, -1), span - 1)
+        if lo > hi:
+            return np.empty(0, dtype=np.int64)
+        starts = np.searchsorted(level['key'], groups * span + lo, side='left')
+        ends = np.searchsorted(level['key'], groups * span + hi, side='right')
+        lengths = ends - starts
+        # Concatenated ranges starts[i]..ends[i]
+        return np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+
+    def _segments(self, resolution: str, start_day: Optional[int],
+                  end_day: Optional[int]) -> List[Tuple[str, Optional[int], Optional[int]]]:
+        """(resolution, first bin, last bin) pieces covering the window: whole bins, then the cut days."""
+        if resolution == 'day':
+            return [('day', start_day, end_day)]
+        first_full = last_full = None
+        if start_day is not None:
+            first_full = int(to_bins(start_day, resolution))
+            if bin_start(first_full, resolution) < start_day:
+                first_full += 1
+        if end_day is not None:
+            last_full = int(to_bins(end_day, resolution))
+            if bin_start(last_full + 1, resolution) - 1 > end_day:
+                last_full -= 1
+        if first_full is not None and last_full is not None and first_full > last_full:
+            return [('day', start_day, end_day)]
+
+        segments = [(resolution, first_full, last_full)]
+        if first_full is not None and bin_start(first_full, resolution) > start_day:
+            segments.append(('day', start_day, int(bin_start(first_full, resolution)) - 1))
+        if last_full is not None and bin_start(last_full + 1, resolution) <= end_day:
+            segments.append(('day', int(bin_start(last_full + 1, resolution)), end_day))
+        return segments
+
+    def series(self, rows: Optional[Sequence[int]] = None, magnitude_filter: str = 'all',
+               start=None, end=None, resolution: str = 'month') -> pd.DataFrame:
+        """
+        'date' (start of each bin), 'count', 'avg_magnitude', 'max_magnitude'
+        and 'avg_depth' of the events of country rows (all events when None)
+        in magnitude_filter ('all', 'minor', 'moderate', 'strong' or 'major')
+        from start's day to end's day (inclusive), per bin at resolution
+        ('day', 'week', 'month', 'year' or 'auto'). Empty bins are left out;
+        the resolution used is in attrs['resolution'].
+        """
+        start_day = to_day(start) if start is not None else None
+        end_day = to_day(end) if end is not None else None
+        resolution = self.resolve(resolution, start_day, end_day)
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"resolution must be one of {', '.join(RESOLUTIONS)} or 'auto'")
+        if not self.levels:
+            return pd.DataFrame()
+
+        rows = np.array([self.total_row] if rows is None else rows, dtype=np.int64)
+        classes = np.array(MAGNITUDE_CLASSES.get(magnitude_filter, range(N_CLASSES)), dtype=np.int64)
+        groups = (rows[:, None] * N_CLASSES + classes[None, :]).ravel()
+
+        bins, stats = [], {name: [] for name in STATS}
+        for level_name, first_bin, last_bin in self._segments(resolution, start_day, end_day):
+            level = self.levels[level_name]
+            entries = self._entries(level_name, groups, first_bin, last_bin)
+            level_bins = level['key'][entries] % level['span'] + level['first_bin']
+            if level_name != resolution:
+                level_bins = to_bins(bin_start(level_bins, level_name), resolution)
+            bins.append(level_bins)
+            for name in STATS:
+                stats[name].append(level[name][entries])
+
+        bins = np.concatenate(bins)
+        if len(bins) == 0:
+            return pd.DataFrame()
+        stats = {name: np.concatenate(values) for name, values in stats.items()}
+        points, point_of_entry = np.unique(bins, return_inverse=True)
+        count = np.bincount(point_of_entry, weights=stats['count']).astype(np.int64)
+        max_mag = np.full(len(points), -np.inf)
+        np.maximum.at(max_mag, point_of_entry, stats['max_mag'])
+
+        series = pd.DataFrame({
+            'date': bin_start(points, resolution).astype('datetime64[D]').astype('datetime64[ns]'),
+            'count': count,
+            'avg_magnitude': np.bincount(point_of_entry, weights=stats['sum_mag']) / count,
+            'max_magnitude': max_mag,
+            'avg_depth': np.bincount(point_of_entry, weights=stats['sum_depth']) / count,
+        })
+        series.attrs['resolution'] = resolution
+        return series
@@ -0,0 +1,253 @@
+import hashlib
+import json
+import math
+import os
+import struct
+import tempfile
+import zlib
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlencode
+
+import numpy as np
+
+from src.disk_cache import DiskLRUCache
+from src.export import MAX_COUNTRY_LENGTH
+from src.spatial_index import lat_to_mercator_y, mercator_y_to_lat
+
+TILE_SIZE = 256
+MAX_ZOOM = 18
+METRICS = ('density', 'max_mag')
+
+# Each event is drawn over a (2 * RADIUS + 1) px square, so single events stay visible
+RADIUS = 1
+# Events per pixel (after the spread above) drawn in the top color of the density scale
+DENSITY_SATURATION = 64
+# Magnitude range of the max_mag color scale
+MAG_SCALE = (4.0, 9.0)
+
+TILE_DIR = os.environ.get('EQ_TILE_DIR', os.path.join(tempfile.gettempdir(), 'eq-tiles'))
+TILE_CACHE_BYTES = int(float(os.environ.get('EQ_TILE_CACHE_MB', 256)) * 2 ** 20)
+
+# (position, r, g, b) color stops
+_SCALES = {
+    'density': [(0.0, 68, 1, 84), (0.25, 59, 82, 139), (0.5, 33, 145, 140),
+                (0.75, 94, 201, 98), (1.0, 253, 231, 37)],
+    'max_mag': [(0.0, 255, 255, 178), (0.25, 254, 204, 92), (0.5, 253, 141, 60),
+                (0.75, 240, 59, 32), (1.0, 189, 0, 38)],
+}
+
+_cache = None
+
+
+def get_tile_cache() -> DiskLRUCache:
+    """The per-process handle on the shared on-disk tile cache."""
+    global _cache
+    if _cache is None:
+        _cache = DiskLRUCache(TILE_DIR, TILE_CACHE_BYTES)
+    return _cache
+
+
+def _lut(metric: str) -> np.ndarray:
+    stops = np.array(_SCALES[metric], dtype=float)
+    positions = np.linspace(0, 1, 256)
+    return np.stack([np.interp(positions, stops[:, 0], stops[:, c]) for c in (1, 2, 3)], axis=1).astype(np.uint8)
+
+_LUTS = {metric: _lut(metric) for metric in METRICS}
+
+
+def tile_exists(z: int, x: int, y: int) -> bool:
+    return 0 <= z <= MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+def tile_bounds(z: int, x: int, y: int, pad: float = 0.0) -> Tuple[float, float, float, float]:
+    """(min_lat, max_lat, min_lon, max_lon) of tile z/x/y, grown by pad tiles on every side."""
+    n = 2 ** z
+    y0, y1 = max((y - pad) / n, 0.0), min((y + 1 + pad) / n, 1.0)
+    return (
+        float(mercator_y_to_lat(y1)),
+        float(mercator_y_to_lat(y0)),
+        max((x - pad) / n * 360 - 180, -180.0),
+        min((x + 1 + pad) / n * 360 - 180, 180.0)
+    )
+
+
+def parse_filters(args) -> Dict:
+    """
+    Tile filters from query parameters: year (or start_year and end_year),
+    min_mag, max_mag, min_depth, max_depth and country (a case-insensitive
+    substring, as in the dashboard). Raises ValueError.
+    """
+    filters = {}
+    if args.get('year'):
+        filters['start_year'] = filters['end_year'] = args['year']
+    for name in ('start_year', 'end_year', 'min_mag', 'max_mag', 'min_depth', 'max_depth'):
+        if args.get(name):
+            filters[name] = args[name]
+    try:
+        filters = {name: float(value) for name, value in filters.items()}
+    except ValueError:
+        raise ValueError("year, magnitude and depth filters must be numbers")
+    if any(math.isnan(value) for value in filters.values()):
+        raise ValueError("year, magnitude and depth filters must be numbers")
+    if args.get('country'):
+        country = args['country'].strip()
+        if not country or len(country) > MAX_COUNTRY_LENGTH or not country.isprintable():
+            raise ValueError(f"country must be a name of at most {MAX_COUNTRY_LENGTH} printable characters")
+        filters['country'] = country
+    return filters
+
+
+def _filter(data, positions: np.ndarray, filters: Dict) -> np.ndarray:
+    for column, low, high in (('year', 'start_year', 'end_year'), ('mag', 'min_mag', 'max_mag'),
+                              ('depth', 'min_depth', 'max_depth')):
+        if (low not in filters and high not in filters) or len(positions) == 0:
+            continue
+        values = data[column].to_numpy(dtype=float)[positions]
+        keep = np.ones(len(positions), dtype=bool)
+        if low in filters:
+            keep &= values >= filters[low]
+        if high in filters:
+            keep &= values <= filters[high]
+        positions = positions[keep]
+    country = filters.get('country')
+    if country and country != 'all' and len(positions):
+        keep = data['country'].iloc[positions].str.contains(country, case=False, na=False, regex=False)
+        positions = positions[keep.to_numpy(dtype=bool)]
+    return positions
+
+
+def tile_grid(data_processor, z: int, x: int, y: int, metric: str = 'density',
+              filters: Optional[Dict] = None, size: int = TILE_SIZE, radius: int = 0) -> np.ndarray:
+    """
+    size x size grid over tile z/x/y (rows from north to south) of the event
+    count per cell, or the largest magnitude (NaN where there are no events).
+    With radius > 0 every event also counts in the cells up to radius away.
+    """
+    filters = filters or {}
+    # Pixels past the edge are drawn too, so events spread across tile borders
+    pad = radius / size
+    empty = np.zeros((size, size)) if metric == 'density' else np.full((size, size), np.nan)
+    index = data_processor.get_spatial_index()
+    if index is None:
+        return empty
+    positions = _filter(data_processor.processed_data, index.query(tile_bounds(z, x, y, pad)), filters)
+    if len(positions) == 0:
+        return empty
+
+    n = 2 ** z
+    lat, lon = index.lat[positions], index.lon[positions]
+    canvas = size + 2 * radius
+    cols = np.floor(((lon + 180) / 360 * n - x) * size).astype(np.int64) + radius
+    rows = np.floor((lat_to_mercator_y(lat) * n - y) * size).astype(np.int64) + radius
+    inside = (cols >= 0) & (cols < canvas) & (rows >= 0) & (rows < canvas)
+    cells = rows[inside] * canvas + cols[inside]
+
+    if metric == 'density':
+        grid = np.bincount(cells, minlength=canvas * canvas).astype(float)
+    else:
+        grid = np.full(canvas * canvas, -np.inf)
+        mags = data_processor.processed_data['mag'].to_numpy(dtype=float)[positions][inside]
+        np.maximum.at(grid, cells, mags)
+    grid = grid.reshape(canvas, canvas)
+
+    if radius:
+        spread = np.zeros((size, size)) if metric == 'density' else np.full((size, size), -np.inf)
+        for dy in range(2 * radius + 1):
+            for dx in range(2 * radius + 1):
+                window = grid[dy:dy + size, dx:dx + size]
+                if metric == 'density':
+                    spread += window
+                else:
+                    np.maximum(spread, window, out=spread)
+        grid = spread
+
+    if metric != 'density':
+        grid[np.isinf(grid)] = np.nan
+    return grid
+
+
+def colorize(grid: np.ndarray, metric: str) -> np.ndarray:
+    """RGBA image of a tile_grid(), transparent where there are no events."""
+    if metric == 'density':
+        filled = grid > 0
+        scaled = np.log1p(grid) / math.log1p(DENSITY_SATURATION)
+    else:
+        filled = ~np.isnan(grid)
+        scaled = (np.nan_to_num(grid, nan=MAG_SCALE[0]) - MAG_SCALE[0]) / (MAG_SCALE[1] - MAG_SCALE[0])
+    levels = (np.clip(scaled, 0, 1) * 255).astype(np.uint8)
+    rgba = np.zeros(grid.shape + (4,), dtype=np.uint8)
+    rgba[..., :3] = _LUTS[metric][levels]
+    rgba[..., 3] = np.where(filled, 210, 0)
+    return rgba
+
+
+def encode_png(rgba: np.ndarray) -> bytes:
+    """8-bit RGBA PNG of an (h, w, 4) uint8 array, written with zlib alone."""
+    height, width, _ = rgba.shape
+    # Filter type 0 (none) at the start of every scanline
+    raw = np.hstack([np.zeros((height, 1), dtype=np.uint8), rgba.reshape(height, width * 4)]).tobytes()
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data))
+
+    header = struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) + chunk(b'IDAT', zlib.compress(raw, 6)) + chunk(b'IEND', b'')
+
+
+def _cache_key(data_processor, z: int, x: int, y: int, fmt: str, metric: str, filters: Dict, size: int) -> str:
+    # repr() keeps every digit, so filters differing past the sixth one get their own tiles
+    parts = [f"{name}{float(value)!r}" for name, value in sorted(filters.items()) if name != 'country']
+    if filters.get('country'):
+        # Hashed, so any name makes a safe file name; matching ignores case
+        parts.append('country' + hashlib.blake2b(filters['country'].lower().encode(), digest_size=8).hexdigest())
+    params = '_'.join(parts) or 'all'
+    return os.path.join(str(data_processor.version), metric, params, f"{size}", f"{z}-{x}-{y}.{fmt}")
+
+
+def render_png(data_processor, z: int, x: int, y: int, metric: str = 'density',
+               filters: Optional[Dict] = None) -> bytes:
+    """PNG of tile z/x/y, from the disk cache when it was rendered before."""
+    filters = filters or {}
+    key = _cache_key(data_processor, z, x, y, 'png', metric, filters, TILE_SIZE)
+    return get_tile_cache().get_or_build(key, lambda: encode_png(colorize(
+        tile_grid(data_processor, z, x, y, metric, filters, TILE_SIZE, RADIUS), metric)))
+
+
+def render_json(data_processor, z: int, x: int, y: int, metric: str = 'density',
+                filters: Optional[Dict] = None, size: int = 64) -> bytes:
+    """
+    Tile z/x/y as a size x size JSON grid, listing the non-empty cells as
+    [row, col, value] (rows from north to south); from the disk cache when
+    it was rendered before.
+    """
+    filters = filters or {}
+
+    def build() -> bytes:
+        grid = tile_grid(data_processor, z, x, y, metric, filters, size)
+        rows, cols = np.nonzero(grid > 0) if metric == 'density' else np.nonzero(~np.isnan(grid))
+        values = grid[rows, cols]
+        cells = [[int(r), int(c), int(v) if metric == 'density' else round(float(v), 2)]
+                 for r, c, v in zip(rows, cols, values)]
+        return json.dumps({'z': z, 'x': x, 'y': y, 'size': size, 'metric': metric,
+                           'version': data_processor.version, 'cells': cells},
+                          separators=(',', ':')).encode()
+
+    key = _cache_key(data_processor, z, x, y, 'json', metric, filters, size)
+    return get_tile_cache().get_or_build(key, build)
+
+
+def tile_layer(version: str, metric: str = 'density', opacity: float = 0.8, **filters) -> dict:
+    """
+    Mapbox raster layer drawing the /tiles PNGs for the given dataset version
+    and filters (see parse_filters), below the figure's traces.
+    """
+    query = urlencode([('metric', metric), ('v', version)]
+                      + [(name, value if name == 'country' else repr(float(value)))
+                         for name, value in sorted(filters.items()) if value is not None])
+    return {
+        'sourcetype': 'raster',
+        # Relative to the page, so the tiles follow the app's URL prefix
+        'source': [f"tiles/{{z}}/{{x}}/{{y}}.png?{query}"],
+        'below': 'traces',
+        'opacity': opacity,
+    }
@@ -4,7 +4,8 @@ Test script to verify the earthquake data visualization app.
 """
 
 from src.data_processor import DataProcessor
-from src.visualizations import create_global_earthquake_map, create_time_series_plot
+from visualizations.plots.world_map import create_global_earthquake_map
+from visualizations.plots.time_series import create_time_series_plot
 
 def test_data_loading():
     """Test if data loads correctly."""
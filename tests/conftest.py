@@ -0,0 +1,52 @@
+import os
+import sys
+import warnings
+
+import pytest
+
+# Tests import the app's top-level packages (src, callbacks, visualizations, ...)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Rows of the small synthetic catalog the unit and route tests run against
+SMALL_CATALOG_ROWS = 3000
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'budget: callback latency budgets (deselect on slow runners: -m "not budget")')
+
+
+@pytest.fixture(scope='session')
+def catalog_dir(tmp_path_factory):
+    """Directory holding a small synthetic catalog (benchmarks.synthetic)."""
+    from benchmarks.synthetic import write_catalog
+
+    directory = str(tmp_path_factory.mktemp('catalog'))
+    write_catalog(SMALL_CATALOG_ROWS, directory, seed=7)
+    return directory
+
+
+@pytest.fixture(scope='session')
+def data_processor(catalog_dir):
+    from src.data_processor import DataProcessor
+
+    warnings.filterwarnings('ignore')
+    return DataProcessor(catalog_dir)
+
+
+@pytest.fixture(scope='session')
+def app(catalog_dir):
+    from app import create_app
+
+    warnings.filterwarnings('ignore')
+    return create_app(data_path=catalog_dir, warm=False, background=False, watch=False)
+
+
+@pytest.fixture
+def client(app, data_processor):
+    """Test client of the app, serving the small catalog (rebound per test, as other tests swap it)."""
+    import globals
+
+    previous = globals.data_processor
+    globals.data_processor = data_processor
+    yield app.server.test_client()
+    globals.data_processor = previous
@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.activity_cube import MAG_EDGES, ActivityCube, seismic_energy
+
+
+@pytest.fixture(scope='module')
+def cube(data_processor):
+    return ActivityCube.build(data_processor.processed_data)
+
+
+def _brute_force(data, bounds=None, start=None, end=None, min_mag=None) -> pd.DataFrame:
+    """Per-cell count, max_mag and energy straight from the events, by the cube's rules."""
+    rows = np.floor(data['Latitude'] + 90).clip(0, 179)
+    cols = np.floor(data['Longitude'] + 180).clip(0, 359)
+    month = data['time'].dt.year * 12 + data['time'].dt.month
+    keep = data['time'].notna()
+    if start is not None:
+        keep &= month >= pd.Timestamp(start).year * 12 + pd.Timestamp(start).month
+    if end is not None:
+        keep &= month <= pd.Timestamp(end).year * 12 + pd.Timestamp(end).month
+    if min_mag is not None:
+        # Thresholds are taken at the class edge at or below them
+        below = MAG_EDGES[MAG_EDGES <= min_mag]
+        if len(below):
+            keep &= data['mag'] >= below[-1]
+    if bounds:
+        min_lat, max_lat, min_lon, max_lon = bounds
+        keep &= rows.between(np.floor(min_lat + 90), np.floor(max_lat + 90))
+        west, east = np.floor((min_lon + 180) % 360), np.floor((max_lon + 180) % 360)
+        keep &= cols.between(west, east) if west <= east else (cols >= west) | (cols <= east)
+    events = pd.DataFrame({
+        'cell': (rows * 360 + cols)[keep].astype(np.int64),
+        'mag': data['mag'][keep],
+        'energy': seismic_energy(data['mag'][keep]),
+    })
+    return events.groupby('cell').agg(count=('mag', 'size'), max_mag=('mag', 'max'), energy=('energy', 'sum'))
+
+
+def _assert_matches(result, expected):
+    cells = ((result['lat'] - 0.5 + 90) * 360 + (result['lon'] - 0.5 + 180)).round().astype(np.int64)
+    np.testing.assert_array_equal(cells, expected.index.to_numpy())
+    np.testing.assert_array_equal(result['count'], expected['count'].to_numpy())
+    np.testing.assert_allclose(result['max_mag'], expected['max_mag'].to_numpy(), rtol=1e-6)
+    np.testing.assert_allclose(result['energy'], expected['energy'].to_numpy(), rtol=1e-9)
+
+
+@pytest.mark.parametrize('query', [
+    {},
+    {'bounds': (-10.0, 20.0, 30.0, 60.0)},
+    # Edges on whole degrees: the cells on both sides of each edge touch it
+    {'bounds': (5.0, 10.0, -80.0, -75.0)},
+    # Across the antimeridian
+    {'bounds': (-45.0, 0.0, 170.0, -170.0)},
+    # Months cut in the middle count whole
+    {'start': '1990-03-15', 'end': '2001-07-10'},
+    {'start': '2005-01-01', 'end': '2005-01-31'},
+    {'min_mag': 5.0},
+    # Rounded down to the 5.0 edge
+    {'min_mag': 5.2},
+    {'bounds': (-60.0, 60.0, 100.0, 180.0), 'start': '1950-06-30', 'end': '2010-02-01', 'min_mag': 6.0},
+    # Windows past the data are clipped to it, and empty selections give empty columns
+    {'start': '1800-01-01', 'end': '2100-12-31'},
+    {'start': '2010-01-01', 'end': '2009-12-31'},
+    {'start': '2100-01-01'},
+    {'min_mag': 9.5},
+    {'bounds': (80.0, 89.0, 0.0, 10.0)},
+])
+def test_query_matches_brute_force(cube, data_processor, query):
+    _assert_matches(cube.query(**query), _brute_force(data_processor.processed_data, **query))
+
+
+def test_cells_touching_an_edge_are_whole(cube, data_processor):
+    data = data_processor.processed_data
+    # Events just north of the box, in the cell its north-east corner touches
+    corner = data['Latitude'].between(10.0, 11.0) & data['Longitude'].between(-76.0, -75.0)
+    assert corner.any()
+    result = cube.query(bounds=(5.0, 10.0, -80.0, -75.0))
+    assert result['count'][(result['lat'] == 10.5) & (result['lon'] == -75.5)].sum() == corner.sum()
+
+
+def test_boundary_magnitudes_and_months():
+    data = pd.DataFrame({
+        'time': pd.to_datetime(['2000-01-31T23:59:59Z', '2000-02-01T00:00:00Z', '2000-02-29T12:00:00Z', None]),
+        'Latitude': [0.0, -0.5, 89.99, 5.0],
+        'Longitude': [0.0, 179.999, -180.0, 5.0],
+        'mag': [6.0, 5.999, 2.0, 7.0],
+    })
+    cube = ActivityCube.build(data)
+    # The event without a time is left out
+    assert cube.query()['count'].sum() == 3
+    assert cube.query(min_mag=6.0)['count'].sum() == 1
+    assert cube.query(start='2000-02-15')['count'].sum() == 2
+    assert cube.query(end='2000-01-15')['count'].sum() == 1
+    for query in ({}, {'min_mag': 6.0}, {'start': '2000-02-15'}, {'bounds': (-1.0, 0.0, 179.0, -179.0)}):
+        _assert_matches(cube.query(**query), _brute_force(data, **query))
+
+
+def test_no_dated_events():
+    data = pd.DataFrame({'time': pd.to_datetime([None, None]).tz_localize('UTC'),
+                         'Latitude': [1.0, 2.0], 'Longitude': [1.0, 2.0], 'mag': [5.0, 6.0]})
+    result = ActivityCube.build(data).query()
+    assert all(len(values) == 0 for values in result.values())
+
+
+def test_disk_cache_round_trips(data_processor, tmp_path):
+    built = ActivityCube.for_data_processor(data_processor, str(tmp_path))
+    loaded = ActivityCube.for_data_processor(data_processor, str(tmp_path))
+    assert len(list(tmp_path.glob('*.npz'))) == 1
+    query = {'bounds': (-30.0, 30.0, -80.0, 80.0), 'start': '1960-01-01', 'min_mag': 5.0}
+    for name, values in built.query(**query).items():
+        np.testing.assert_array_equal(loaded.query(**query)[name], values)
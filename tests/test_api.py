@@ -0,0 +1,70 @@
+def test_events_pages_through_every_match(client, data_processor):
+    expected = data_processor.get_filtered_data(country='Japan')
+    seen, cursor = 0, None
+    while True:
+        query = {'country': 'Japan', 'limit': 100, 'columns': 'ID'}
+        if cursor:
+            query['cursor'] = cursor
+        body = client.get('/api/v1/events', query_string=query).get_json()
+        assert body['total'] == len(expected)
+        seen += len(body['data'])
+        cursor = body['next_cursor']
+        if not cursor:
+            break
+    assert seen == len(expected) > 0
+
+
+def test_events_country_is_matched_literally(client):
+    for country in ('(', '(a+)+$', '[', '.*'):
+        response = client.get('/api/v1/events', query_string={'country': country})
+        assert response.status_code == 200, country
+        assert response.get_json()['total'] == 0
+
+
+def test_country_statistics_match_literally(client):
+    assert client.get('/api/v1/countries/Japan').status_code == 200
+    for country in ('(', '(a+)+$', '[', '.*'):
+        response = client.get(f'/api/v1/countries/{country}')
+        # Nothing is named like that: a JSON 404, not a server error
+        assert response.status_code == 404, country
+        assert response.get_json() == {'error': 'not found'}
+
+
+def test_bad_parameters_answer_json_400(client):
+    for path in ('/api/v1/events?limit=0', '/api/v1/events?cursor=nonsense',
+                 '/api/v1/timeseries?resolution=hour', '/api/v1/risk?metric=mean',
+                 # Filters the endpoint cannot apply
+                 '/api/v1/activity?max_mag=6', '/api/v1/activity?country=Japan',
+                 '/api/v1/timeseries?min_mag=6', '/api/v1/timeseries?bounds=0,10,0,10'):
+        response = client.get(path)
+        assert response.status_code == 400, path
+        assert 'error' in response.get_json()
+
+
+def test_activity_applies_its_filters(client):
+    body = client.get('/api/v1/activity', query_string={'min_mag': 6, 'start': '1990-01-01'}).get_json()
+    everything = client.get('/api/v1/activity').get_json()
+    assert 0 < sum(body['data']['count']) < sum(everything['data']['count'])
+
+
+def test_event_positions_cache_is_bounded_by_bytes(client, data_processor, monkeypatch):
+    from src.api import _event_positions
+
+    cache = _event_positions.cache
+    cache.clear()
+    monkeypatch.setattr(cache, 'max_bytes', 4 * len(data_processor.processed_data) // 2)
+    for country in ('Japan', 'Peru', 'Chile', 'Fiji', 'Tonga', 'Mexico', 'Indonesia'):
+        assert client.get('/api/v1/events', query_string={'country': country, 'limit': 1}).status_code == 200
+        assert 0 < cache.nbytes <= cache.max_bytes
+    # Every row's position is over the budget on its own: served, but not kept
+    before = len(cache)
+    body = client.get('/api/v1/events', query_string={'limit': 1}).get_json()
+    assert body['total'] == len(data_processor.processed_data) and len(cache) == before
+    cache.clear()
+    assert cache.nbytes == 0
+
+
+def test_etag_revalidates(client):
+    response = client.get('/api/v1/risk')
+    tag = response.headers['ETag']
+    assert client.get('/api/v1/risk', headers={'If-None-Match': tag}).status_code == 304
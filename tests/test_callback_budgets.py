@@ -0,0 +1,218 @@
+"""
+Latency and payload budgets for every registered Dash callback.
+
+Each callback in callback_budgets.json is called directly, with the triggering
+input set on callback_context as Dash would, over its input grid and against
+the synthetic fixture catalogs listed there (generated with benchmarks.synthetic).
+A case fails when its median time with cold figure caches, or the size of its
+serialized response, is over budget. A case over its latency budget is timed
+once more before it fails, so one noisy measurement does not fail it.
+
+Latency budgets are relative to the machine they were set on: a fixed
+calibration workload is timed at the start, and when it runs slower than the
+"calibration" time in callback_budgets.json every latency budget grows by the
+same factor (they never shrink). EQ_BUDGET_SCALE multiplies them further.
+
+The results of passing cases are kept in EQ_BUDGET_RESULTS (default
+tests/.callback_budgets/last_pass.json); a failing case shows the diff
+against its last passing run.
+
+The budget cases are marked `budget`; skip them on slow or shared runners
+with `-m "not budget"` or EQ_SKIP_BUDGETS=1.
+
+    python -m pytest tests/test_callback_budgets.py -v
+"""
+import inspect
+import json
+import os
+import statistics
+import tempfile
+import time
+import warnings
+from contextvars import copy_context
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import pytest
+from dash._callback_context import context_value
+from dash._utils import AttributeDict
+from dash.exceptions import PreventUpdate
+from dash._callback import NoUpdate
+from plotly.io.json import to_json_plotly
+
+from benchmarks.run import _git_commit
+from benchmarks.synthetic import write_catalog
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CONFIG_PATH = os.path.join(HERE, 'callback_budgets.json')
+RESULTS_PATH = os.environ.get('EQ_BUDGET_RESULTS', os.path.join(HERE, '.callback_budgets', 'last_pass.json'))
+FIXTURE_DIR = os.environ.get('EQ_BUDGET_DATA_DIR', os.path.join(tempfile.gettempdir(), 'eq-callback-budgets'))
+LATENCY_SCALE = float(os.environ.get('EQ_BUDGET_SCALE', 1.0))
+
+with open(CONFIG_PATH) as f:
+    CONFIG = json.load(f)
+
+
+def _cases() -> list:
+    return [
+        pytest.param(name, dataset, case, id=f"{name}-{dataset}-{case['id']}")
+        for name, spec in CONFIG['callbacks'].items()
+        for dataset in CONFIG['datasets']
+        for case in spec['grid']
+    ]
+
+
+def calibration_ms(repeat: int = 10) -> float:
+    """Best time of a fixed mix of the work callbacks do: pandas grouping, numpy sorting, figure building."""
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame({'key': rng.integers(0, 1000, 200_000), 'value': rng.random(200_000)})
+    times = []
+    # The first round, which warms up imports and allocators, is not counted
+    for _ in range(repeat + 1):
+        start = time.perf_counter()
+        summary = frame.groupby('key')['value'].agg(['mean', 'max'])
+        np.sort(frame['value'].to_numpy())
+        go.Figure(go.Bar(x=summary.index, y=summary['mean'])).update_layout(title='calibration', height=400)
+        times.append(time.perf_counter() - start)
+    return min(times[1:]) * 1000
+
+
+@pytest.fixture(scope='module')
+def latency_scale():
+    """Factor on every latency budget: how much slower than the reference machine this one is, times EQ_BUDGET_SCALE."""
+    return max(1.0, calibration_ms() / CONFIG['calibration']['ms']) * LATENCY_SCALE
+
+
+def _fixture_path(dataset: str) -> str:
+    spec = CONFIG['datasets'][dataset]
+    directory = os.path.join(FIXTURE_DIR, dataset)
+    write_catalog(spec['rows'], directory, seed=spec['seed'])
+    return directory
+
+
+def _bind(data_processor):
+    """Point the callbacks, which read globals.data_processor when they run, at another dataset."""
+    import globals
+
+    globals.data_processor = data_processor
+
+
+@pytest.fixture(scope='module')
+def harness(app):
+    """The app, one DataProcessor per fixture dataset and the raw callback functions by name."""
+    import dash._callback as dash_callback
+    import globals
+    from src.data_processor import DataProcessor
+
+    warnings.filterwarnings('ignore')
+    # Dash hands its registered callbacks to the first app only, so the session's app is reused
+    processors = {dataset: DataProcessor(_fixture_path(dataset)) for dataset in CONFIG['datasets']}
+
+    callbacks = {}
+    for callback_map in (dash_callback.GLOBAL_CALLBACK_MAP, app.callback_map):
+        for entry in callback_map.values():
+            # Skip Dash's context wrapper and the metrics/profiling wrappers
+            func = inspect.unwrap(entry['callback'])
+            callbacks[func.__name__] = func
+
+    previous = globals.data_processor
+    yield app, processors, callbacks
+    _bind(previous)
+
+
+@pytest.fixture(scope='module')
+def last_pass():
+    """Results of the last passing run per case; this run's passing cases are merged in at the end."""
+    previous = {}
+    if os.path.exists(RESULTS_PATH):
+        with open(RESULTS_PATH) as f:
+            previous = json.load(f)
+    passed = {}
+    yield previous, passed
+
+    if passed:
+        os.makedirs(os.path.dirname(RESULTS_PATH), exist_ok=True)
+        with open(RESULTS_PATH, 'w') as f:
+            json.dump(dict(previous, **passed), f, indent=2, sort_keys=True)
+
+
+def _call(func, case: dict):
+    def run():
+        context_value.set(AttributeDict(
+            triggered_inputs=[{'prop_id': prop_id, 'value': None} for prop_id in case.get('triggered', [])]
+        ))
+        try:
+            return func(*case['args'])
+        except PreventUpdate:
+            return None
+    return copy_context().run(run)
+
+
+def _payload_bytes(result) -> int:
+    """Size of the response body Dash would send for result (nothing for no_update)."""
+    if result is None or isinstance(result, NoUpdate):
+        return 0
+    return len(to_json_plotly(result))
+
+
+def _measure(func, case: dict, repeat: int) -> dict:
+    from src.cache import get_caches
+
+    times = []
+    for _ in range(repeat):
+        # Budgets are for the uncached path: a cache hit would hide a slow builder
+        for cache in get_caches().values():
+            cache.clear()
+        start = time.perf_counter()
+        result = _call(func, case)
+        times.append(time.perf_counter() - start)
+    return {'ms': round(statistics.median(times) * 1000, 2), 'bytes': _payload_bytes(result)}
+
+
+def _diff(key: str, budget: dict, current: dict, previous: dict) -> str:
+    lines = [f"{'':12s}{'budget':>12s}{'last pass':>12s}{'this run':>12s}{'change':>10s}"]
+    for metric, label in (('ms', 'time (ms)'), ('bytes', 'payload (B)')):
+        before = previous.get(metric)
+        change = f"x{current[metric] / before:.2f}" if before else ''
+        lines.append(f"{label:12s}{budget[metric]:>12g}{before if before is not None else '-':>12}"
+                     f"{current[metric]:>12g}{change:>10s}")
+    if previous:
+        lines.append(f"last pass: {previous.get('timestamp')} at commit {previous.get('commit') or 'unknown'}")
+    else:
+        lines.append(f"no passing run of {key} recorded in {RESULTS_PATH}")
+    return "\n".join(lines)
+
+
+@pytest.mark.budget
+@pytest.mark.skipif(os.environ.get('EQ_SKIP_BUDGETS') == '1', reason='EQ_SKIP_BUDGETS=1')
+@pytest.mark.parametrize('name, dataset, case', _cases())
+def test_callback_budget(harness, last_pass, latency_scale, name, dataset, case):
+    _, processors, callbacks = harness
+    previous, passed = last_pass
+    _bind(processors[dataset])
+
+    budget = dict(CONFIG['callbacks'][name]['budget'][dataset])
+    budget['ms'] = round(budget['ms'] * latency_scale, 2)
+    # One untimed call, so one-off imports and lazily built indexes are not counted
+    _call(callbacks[name], case)
+    current = _measure(callbacks[name], case, CONFIG.get('repeat', 3))
+    if current['ms'] > budget['ms']:
+        # Confirmed on a second measurement before failing
+        current['ms'] = min(current['ms'], _measure(callbacks[name], case, CONFIG.get('repeat', 3))['ms'])
+
+    key = f"{name}/{dataset}/{case['id']}"
+    over = [metric for metric in ('ms', 'bytes') if current[metric] > budget[metric]]
+    if over:
+        pytest.fail(f"{key} over its {' and '.join(over)} budget (latency budgets x{latency_scale:.2f})\n"
+                    + _diff(key, budget, current, previous.get(key, {})), pytrace=False)
+    passed[key] = dict(current, timestamp=time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                       commit=_git_commit())
+
+
+def test_every_callback_has_a_budget(harness):
+    _, _, callbacks = harness
+    missing = sorted(set(callbacks) - set(CONFIG['callbacks']))
+    stale = sorted(set(CONFIG['callbacks']) - set(callbacks))
+    assert not missing, f"callbacks without a budget in {CONFIG_PATH}: {', '.join(missing)}"
+    assert not stale, f"budgets for callbacks that are not registered: {', '.join(stale)}"
@@ -0,0 +1,26 @@
+import csv
+import io
+
+
+def test_csv_export_matches_filtered_data(client, data_processor):
+    response = client.get('/export.csv?country=Japan&min_mag=5')
+    assert response.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    expected = data_processor.get_filtered_data(magnitude_range=(5, float('inf')), country='Japan')
+    assert len(rows) == len(expected) > 0
+
+
+def test_country_is_matched_literally(client, data_processor):
+    # Regex metacharacters are plain text: no match, but a valid (empty) export
+    for country in ('(', '(a+)+$', '.*'):
+        response = client.get('/export.csv', query_string={'country': country})
+        assert response.status_code == 200
+        assert response.get_data(as_text=True).count('\n') == 1
+
+
+def test_bad_filters_answer_400_before_streaming(client):
+    for query in ({'min_mag': 'big'}, {'bounds': '1,2,3'}, {'start': 'yesterday-ish'},
+                  {'country': 'x' * 500}, {'format': 'xml'}):
+        response = client.get('/export', query_string=query)
+        assert response.status_code == 400, query
+        assert 'error' in response.get_json()
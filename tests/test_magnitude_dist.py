@@ -0,0 +1,15 @@
+import pytest
+
+from visualizations.plots.magnitude_dist import SCALES, create_magnitude_distribution
+
+
+@pytest.mark.parametrize('scale', SCALES)
+def test_known_scales(data_processor, scale):
+    fig = create_magnitude_distribution(data_processor, scale=scale)
+    assert fig.layout.yaxis.type == ('linear' if scale == 'linear' else 'log')
+
+
+@pytest.mark.parametrize('scale', ['Log', 'gutenberg', ''])
+def test_unknown_scale_is_rejected(data_processor, scale):
+    with pytest.raises(ValueError):
+        create_magnitude_distribution(data_processor, scale=scale)
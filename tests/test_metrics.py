@@ -0,0 +1,24 @@
+from src.metrics import Counter, Histogram
+
+
+def test_counter_values_render_exactly():
+    counter = Counter('eq_test_rows_total', 'Rows.', ('format',))
+    counter.inc(('csv',), 1234567)
+    counter.inc(('ndjson',), 2 ** 53)
+    counter.inc(('geojson',), 0.5)
+    lines = counter.render()
+    assert 'eq_test_rows_total{format="csv"} 1234567' in lines
+    assert f'eq_test_rows_total{{format="ndjson"}} {2 ** 53}' in lines
+    assert 'eq_test_rows_total{format="geojson"} 0.5' in lines
+
+
+def test_histogram_is_cumulative_with_exact_sum():
+    histogram = Histogram('eq_test_seconds', 'Time.', ('stage',), (0.1, 1.0))
+    for value in (0.05, 0.5, 1234567.25):
+        histogram.observe(('total',), value)
+    lines = histogram.render()
+    assert 'eq_test_seconds_bucket{stage="total",le="0.1"} 1' in lines
+    assert 'eq_test_seconds_bucket{stage="total",le="1"} 2' in lines
+    assert 'eq_test_seconds_bucket{stage="total",le="+Inf"} 3' in lines
+    assert 'eq_test_seconds_sum{stage="total"} 1234567.8' in lines
+    assert 'eq_test_seconds_count{stage="total"} 3' in lines
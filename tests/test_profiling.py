@@ -0,0 +1,35 @@
+import pytest
+
+import routes.profiling
+from src.profiling import settings
+
+
+@pytest.fixture
+def admin(client, monkeypatch):
+    monkeypatch.setattr(routes.profiling, 'ADMIN_TOKEN', 'secret')
+    saved = settings.to_dict()
+    yield lambda body: client.post('/admin/profiling', json=body, headers={'X-Admin-Token': 'secret'})
+    settings.update(enabled=saved['enabled'], rate=saved['rate'], callbacks=saved['callbacks'])
+
+
+def test_settings_change(admin):
+    response = admin({'enabled': True, 'rate': 0.5, 'callbacks': ['update_map', ' ']})
+    assert response.status_code == 200
+    assert response.get_json()['callbacks'] == ['update_map']
+    assert response.get_json()['enabled'] is True
+
+
+@pytest.mark.parametrize('body', [
+    {'callbacks': 'update_map'},
+    {'callbacks': [1, 2]},
+    {'callbacks': {'update_map': True}},
+    {'enabled': 'false'},
+    {'rate': 2},
+    {'rate': 'often'},
+])
+def test_bad_settings_are_rejected(admin, body):
+    before = settings.to_dict()
+    response = admin(body)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+    assert settings.to_dict() == before
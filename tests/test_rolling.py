@@ -0,0 +1,164 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.rolling import parse_window, rolling, series_rolling, window_label, window_starts
+from src.temporal_pyramid import to_day
+
+UNITS = {'D': 'days', 'W': 'weeks', 'M': 'months', 'Y': 'years'}
+# Bin starts of each resolution, as a series has them
+BIN_STARTS = {'day': 'D', 'week': 'W-MON', 'month': 'MS', 'year': 'YS'}
+
+
+def _window_points(dates, window):
+    """Positions of the points in each date's window (after the date minus the window, up to the date)."""
+    n, unit = parse_window(window)
+    dates = list(pd.DatetimeIndex(dates))
+    since = [date - pd.DateOffset(**{UNITS[unit]: n}) for date in dates]
+    return [[j for j in range(i + 1) if dates[j] > since[i]] for i in range(len(dates))]
+
+
+def _brute_force(values, dates, window, stat, resolution='month', weights=None, first_day=None):
+    values = np.asarray(values, dtype=float)
+    weights = np.ones(len(values)) if weights is None else np.asarray(weights, dtype=float)
+    dates = pd.DatetimeIndex(dates)
+    result = []
+    for i, points in enumerate(_window_points(dates, window)):
+        if stat == 'sum':
+            result.append(values[points].sum())
+        elif stat == 'max':
+            result.append(values[points].max())
+        elif stat == 'mean':
+            result.append((values[points] * weights[points]).sum() / weights[points].sum())
+        elif stat == 'rate':
+            # Bins from the one after the window's start (or the series start) to the point's own
+            n, unit = parse_window(window)
+            bins = pd.tseries.frequencies.to_offset(BIN_STARTS[resolution])
+            start = bins.rollback(dates[i] - pd.DateOffset(**{UNITS[unit]: n})) + bins
+            first = dates[0] if first_day is None else pd.Timestamp(first_day, unit='D')
+            start = max(start, bins.rollback(first))
+            result.append(values[points].sum() / len(pd.date_range(start, dates[i], freq=bins)))
+    return np.array(result)
+
+
+def _ewm_brute_force(values, dates, halflife_days, weights=None):
+    values = np.asarray(values, dtype=float)
+    weights = np.ones(len(values)) if weights is None else np.asarray(weights, dtype=float)
+    days = pd.DatetimeIndex(dates).asi8 / (86400 * 10 ** 9)
+    decay = 0.5 ** ((days[:, None] - days[None, :]) / halflife_days)
+    decay = np.tril(decay) * weights[None, :]
+    return (decay @ values) / decay.sum(axis=1)
+
+
+@pytest.fixture(scope='module')
+def points():
+    """Irregular dates, with month ends and a leap day where calendar windows clip."""
+    rng = np.random.default_rng(3)
+    dates = pd.DatetimeIndex(sorted(
+        pd.to_datetime(['2019-12-31', '2020-01-31', '2020-02-29', '2020-03-31', '2020-04-30', '2021-02-28'])
+        .append(pd.Timestamp('2018-01-01') + pd.to_timedelta(rng.integers(0, 365 * 4, 60), unit='D'))
+    ))
+    return rng.normal(5, 1, len(dates)).round(2), dates, rng.integers(1, 20, len(dates)).astype(float)
+
+
+@pytest.mark.parametrize('window', ['1D', '7D', '2W', '1M', '3M', '12M', '1Y'])
+@pytest.mark.parametrize('stat', ['sum', 'mean', 'max'])
+def test_window_stats_match_brute_force(points, window, stat):
+    values, dates, _ = points
+    np.testing.assert_allclose(rolling(values, dates, window, stat), _brute_force(values, dates, window, stat))
+
+
+def test_day_windows_match_pandas(points):
+    values, dates, _ = points
+    expected = pd.Series(values, index=dates).rolling('30D').sum().to_numpy()
+    np.testing.assert_allclose(rolling(values, dates, '30D', 'sum'), expected)
+
+
+def test_weighted_mean(points):
+    values, dates, counts = points
+    np.testing.assert_allclose(rolling(values, dates, '3M', 'mean', weights=counts),
+                               _brute_force(values, dates, '3M', 'mean', weights=counts))
+
+
+def test_month_windows_clip_to_month_ends():
+    dates = pd.to_datetime(['2020-01-31', '2020-02-29', '2020-03-31'])
+    # 2020-03-31 minus a month is 2020-02-29, which falls outside its window
+    np.testing.assert_array_equal(window_starts(dates, '1M'), [0, 0, 2])
+    np.testing.assert_array_equal(rolling([1, 2, 4], dates, '1M', 'sum'), [1, 3, 4])
+
+
+@pytest.mark.parametrize('resolution, window', [('day', '7D'), ('week', '3M'), ('month', '12M'), ('year', '5Y')])
+def test_rate_matches_brute_force(resolution, window):
+    # Bins of the resolution with some left empty, as in a series
+    dates = pd.date_range('2000-01-01', '2012-12-31', freq=BIN_STARTS[resolution])
+    dates = dates[np.random.default_rng(4).random(len(dates)) < 0.6][:200]
+    counts = np.random.default_rng(5).integers(1, 10, len(dates)).astype(float)
+    for first_day in (None, to_day(dates[0]) - 400):
+        np.testing.assert_allclose(
+            rolling(counts, dates, window, 'rate', resolution, first_day=first_day),
+            _brute_force(counts, dates, window, 'rate', resolution, first_day=first_day)
+        )
+
+
+def test_rate_of_a_steady_series():
+    dates = pd.date_range('2000-01-01', periods=36, freq='MS')
+    # One event a month is a rate of one, also while the window is still filling up
+    np.testing.assert_allclose(rolling(np.ones(36), dates, '12M', 'rate', 'month'), 1.0)
+    # A series window starting three months before the first point counts those months as empty
+    rate = rolling(np.ones(36), dates, '12M', 'rate', 'month', first_day=to_day('1999-10-15'))
+    np.testing.assert_allclose(rate[:3], [1 / 4, 2 / 5, 3 / 6])
+    np.testing.assert_allclose(rate[12:], 1.0)
+    # Every other month empty
+    np.testing.assert_allclose(rolling(np.ones(18), dates[::2], '12M', 'rate', 'month')[6:], 0.5)
+
+
+def test_ewm(points):
+    values, dates, counts = points
+    np.testing.assert_allclose(rolling(values, dates, '3M', 'ewm'),
+                               _ewm_brute_force(values, dates, 3 * 365.2425 / 12), rtol=1e-9)
+    np.testing.assert_allclose(rolling(values, dates, '10D', 'ewm', weights=counts),
+                               _ewm_brute_force(values, dates, 10, counts), rtol=1e-9)
+    # A constant is its own average, and a single point is its own value
+    np.testing.assert_allclose(rolling(np.full(len(dates), 4.2), dates, '1Y', 'ewm'), 4.2)
+    np.testing.assert_allclose(rolling([7.5], dates[:1], '1M', 'ewm'), [7.5])
+    # Points on the same day count equally
+    same_day = pd.to_datetime(['2020-01-01', '2020-01-01'])
+    np.testing.assert_allclose(rolling([1.0, 3.0], same_day, '1D', 'ewm'), [1.0, 2.0])
+
+
+def test_edge_cases():
+    dates = pd.to_datetime(['2020-01-01'])
+    for stat in ('sum', 'mean', 'max', 'rate', 'ewm'):
+        assert len(rolling([], pd.DatetimeIndex([]), '12M', stat)) == 0
+        np.testing.assert_allclose(rolling([3.0], dates, '12M', stat, 'month'), [3.0])
+    with pytest.raises(ValueError):
+        rolling([1.0], dates, '12M', 'median')
+
+
+@pytest.mark.parametrize('window', ['0M', '12', 'M', '12Q', '-1D', '1.5Y', ''])
+def test_bad_windows(window):
+    with pytest.raises(ValueError):
+        parse_window(window)
+
+
+def test_window_parsing():
+    assert parse_window(' 12m ') == (12, 'M')
+    assert window_label('7D') == '7-Day'
+    assert window_label('5y') == '5-Year'
+
+
+def test_series_rolling(data_processor):
+    series_args = ('all', '1990-03-15', '2010-06-30', None, 'month')
+    series = data_processor.get_time_series_data(*series_args)
+    counts, dates = series['count'].to_numpy(dtype=float), series['date']
+    np.testing.assert_allclose(series_rolling(data_processor, series_args, 'count', 'sum'),
+                               _brute_force(counts, dates, '12M', 'sum'))
+    np.testing.assert_allclose(series_rolling(data_processor, series_args, 'cumulative_count', 'mean', '6M'),
+                               _brute_force(np.cumsum(counts), dates, '6M', 'mean'))
+    np.testing.assert_allclose(
+        series_rolling(data_processor, series_args, 'avg_magnitude', 'mean', '3M', weights='count'),
+        _brute_force(series['avg_magnitude'], dates, '3M', 'mean', weights=counts))
+    # Rates count the empty months since the window's start, not since the first event
+    np.testing.assert_allclose(series_rolling(data_processor, series_args, 'count', 'rate', '12M'),
+                               _brute_force(counts, dates, '12M', 'rate', 'month', first_day=to_day('1990-03-15')))
+    assert len(series_rolling(data_processor, ('all', '2100-01-01', None, None, 'month'), 'count', 'sum')) == 0
@@ -0,0 +1,92 @@
+import fcntl
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.shared_columns import LOCK_NAME, MANIFEST_NAME, publish_columns, remove_unused, share_frame
+
+
+def _frame(scale: float = 1.0) -> pd.DataFrame:
+    return pd.DataFrame({
+        'mag': np.array([4.5, 5.1, np.nan, 7.2]) * scale,
+        'year': np.array([2001, 2002, 2003, 2004], dtype=np.int64),
+        'time': pd.to_datetime(['2001-01-01T05:00Z', None, '2003-06-30T23:59:59.5Z', '2004-12-31T00:00Z'], format='ISO8601'),
+        'local': pd.to_datetime(['2001-01-01', '2002-02-02', None, '2004-12-31']),
+        'band': pd.Categorical(['minor', 'major', None, 'minor']),
+        'place': ['a', 'b', None, 'd'],
+    }, index=pd.Index([10, 11, 12, 13]))
+
+
+def test_shared_frame_round_trips(tmp_path):
+    data = _frame()
+    shared, path = share_frame(data, 'v1', str(tmp_path))
+    pd.testing.assert_frame_equal(shared, data)
+    assert not shared['mag'].to_numpy().flags.writeable
+    assert os.path.basename(path).startswith('v1-')
+
+
+def test_same_content_is_reused_and_changed_content_is_not(tmp_path):
+    first = publish_columns(_frame(), 'v1', str(tmp_path))
+    assert publish_columns(_frame(), 'v1', str(tmp_path)) == first
+    # Same file version, different preprocessing: a fresh directory
+    changed = publish_columns(_frame(scale=2.0), 'v1', str(tmp_path))
+    assert changed != first
+    assert np.load(os.path.join(changed, '000.npy'))[0] == 9.0
+
+
+def test_damaged_manifest_is_republished(tmp_path):
+    path = publish_columns(_frame(), 'v1', str(tmp_path))
+    manifest_path = os.path.join(path, MANIFEST_NAME)
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    manifest['columns'] = manifest['columns'][:1]
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f)
+
+    assert publish_columns(_frame(), 'v1', str(tmp_path)) == path
+    shared, _ = share_frame(_frame(), 'v1', str(tmp_path))
+    pd.testing.assert_frame_equal(shared, _frame())
+
+
+def test_cleanup_spares_directories_held_elsewhere(tmp_path):
+    directory = str(tmp_path)
+    _, old = share_frame(_frame(), 'v1', directory)
+    _, held = share_frame(_frame(scale=3.0), 'v2', directory)
+    # Another process still using v2
+    other = open(os.path.join(held, LOCK_NAME), 'a')
+    fcntl.flock(other, fcntl.LOCK_SH)
+    legacy = tmp_path / 'legacy'
+    legacy.mkdir()
+    try:
+        _, current = share_frame(_frame(scale=4.0), 'v3', directory)
+        assert not os.path.exists(old)
+        assert os.path.exists(held) and os.path.exists(current) and legacy.exists()
+    finally:
+        other.close()
+    assert remove_unused(directory) == [os.path.basename(held)]
+
+
+@pytest.mark.parametrize('tz', [None, 'UTC', 'Asia/Tokyo'])
+def test_datetime_columns_keep_unit_and_zone(tmp_path, tz):
+    data = pd.DataFrame({'time': pd.to_datetime(['2020-03-01 12:00', None]).as_unit('ms').tz_localize(tz)})
+    shared, _ = share_frame(data, 'v1', str(tmp_path))
+    pd.testing.assert_frame_equal(shared, data)
+    # Viewed straight over the read-only mapped file
+    assert not shared['time'].array.view('i8').flags.writeable
+
+
+# Preprocessing's inplace fillna warns, as it does under the conftest fixtures
+@pytest.mark.filterwarnings('ignore:A value is trying to be set')
+def test_data_processor_shares_country_codes(catalog_dir, tmp_path):
+    from src.data_processor import DataProcessor
+
+    data_processor = DataProcessor(catalog_dir)
+    expected = data_processor.processed_data.copy()
+    path = data_processor.share_columns(str(tmp_path))
+    shared = {spec['name']: spec for spec in json.load(open(os.path.join(path, MANIFEST_NAME)))['columns']}
+    assert shared['country']['kind'] == 'categorical'
+    assert not data_processor.processed_data['country'].cat.codes.to_numpy().flags.writeable
+    pd.testing.assert_frame_equal(data_processor.processed_data, expected)
@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.spatial_index import (GridIndex, bounds_from_center_zoom, cluster_points, lat_to_mercator_y,
+                               mercator_y_to_lat, viewport_from_relayout)
+
+
+def _brute_force(lat, lon, bounds) -> np.ndarray:
+    """Positions of the points inside bounds, longitudes wrapped into [-180, 180]."""
+    min_lat, max_lat, min_lon, max_lon = bounds
+    inside = (lat >= min_lat) & (lat <= max_lat)
+    if max_lon - min_lon < 360:
+        west, east = (min_lon + 180) % 360 - 180, (max_lon + 180) % 360 - 180
+        inside &= (lon >= west) & (lon <= east) if west <= east else (lon >= west) | (lon <= east)
+    return np.flatnonzero(inside)
+
+
+@pytest.fixture(scope='module')
+def events(data_processor):
+    data = data_processor.processed_data
+    return data['Latitude'].to_numpy(), data['Longitude'].to_numpy()
+
+
+BOUNDS = [
+    (-10.0, 20.0, 30.0, 60.0),
+    # Edges on cell boundaries, and a box inside one cell
+    (10.0, 11.0, -76.0, -75.0),
+    (10.2, 10.9, -75.5, -75.01),
+    (-90.0, 90.0, -180.0, 180.0),
+    (-120.0, 120.0, -400.0, 400.0),
+    # Across the antimeridian, also written past ±180 as a panned map reports it
+    (-45.0, 0.0, 170.0, -170.0),
+    (-45.0, 0.0, 170.0, 190.0),
+    (-45.0, 0.0, -190.0, -170.0),
+    # Empty selections
+    (20.0, 10.0, 0.0, 10.0),
+    (80.0, 89.0, 0.0, 10.0),
+    (95.0, 100.0, 0.0, 10.0),
+]
+
+
+@pytest.mark.parametrize('cell_deg', [1.0, 0.25, 7.0])
+@pytest.mark.parametrize('bounds', BOUNDS)
+def test_query_matches_brute_force(events, cell_deg, bounds):
+    lat, lon = events
+    np.testing.assert_array_equal(GridIndex(lat, lon, cell_deg).query(bounds), _brute_force(lat, lon, bounds))
+
+
+def test_points_on_edges_are_inside():
+    lat = np.array([-90.0, 90.0, 0.0, 0.0, 10.0, 10.0, 45.5])
+    lon = np.array([-180.0, 180.0, -180.0, 180.0, 20.0, 21.0, 0.0])
+    index = GridIndex(lat, lon)
+    assert len(index) == len(lat)
+    np.testing.assert_array_equal(index.query((10.0, 10.0, 20.0, 21.0)), [4, 5])
+    np.testing.assert_array_equal(index.query((-90.0, 90.0, -180.0, 180.0)), np.arange(len(lat)))
+    np.testing.assert_array_equal(index.query((89.0, 90.0, 179.0, 180.0)), [1])
+    np.testing.assert_array_equal(index.query((45.5, 45.5, 0.0, 0.0)), [6])
+    assert len(GridIndex([], []).query((-90.0, 90.0, -180.0, 180.0))) == 0
+
+
+def test_filtered_positions_match_pandas(data_processor):
+    data = data_processor.processed_data
+    bounds = (-30.0, 30.0, 100.0, -100.0)
+    start, end = pd.Timestamp('1970-01-01', tz='UTC'), pd.Timestamp('2000-12-31', tz='UTC')
+    positions = data_processor.get_filtered_positions(start, end, (5.0, 6.0), bounds=bounds)
+    lat, lon = data['Latitude'].to_numpy(), data['Longitude'].to_numpy()
+    expected = np.intersect1d(_brute_force(lat, lon, bounds), np.flatnonzero(
+        data['time'].between(start, end) & data['mag'].between(5.0, 6.0)))
+    np.testing.assert_array_equal(positions, expected)
+
+
+@pytest.mark.parametrize('cell_deg', [0.5, 5.0, 45.0])
+def test_clusters_match_pandas(data_processor, cell_deg):
+    data = data_processor.processed_data
+    clusters = cluster_points(data['Latitude'], data['Longitude'], data['mag'], cell_deg)
+    cells = ((data['Latitude'] + 90) // cell_deg).astype(int) * int(360 / cell_deg) \
+        + ((data['Longitude'] + 180) // cell_deg).astype(int)
+    expected = data.groupby(cells).agg(lat=('Latitude', 'mean'), lon=('Longitude', 'mean'),
+                                       count=('mag', 'size'), max_mag=('mag', 'max'))
+    for name in ('lat', 'lon', 'max_mag'):
+        np.testing.assert_allclose(clusters[name], expected[name].to_numpy())
+    np.testing.assert_array_equal(clusters['count'], expected['count'].to_numpy())
+    assert clusters['count'].sum() == len(data)
+    assert all(len(values) == 0 for values in cluster_points([], [], [], cell_deg).values())
+
+
+def test_mercator_round_trip():
+    lat = np.array([-85.0, -45.0, 0.0, 30.5, 85.0])
+    np.testing.assert_allclose(mercator_y_to_lat(lat_to_mercator_y(lat)), lat)
+    assert lat_to_mercator_y(0.0) == pytest.approx(0.5)
+    # Clipped to the square Web Mercator world
+    assert lat_to_mercator_y(90.0) == pytest.approx(0.0, abs=1e-9)
+    assert lat_to_mercator_y(-90.0) == pytest.approx(1.0)
+
+
+def test_bounds_from_center_zoom():
+    # Zoom 1 is 1024 px wide: a 1000 px map sees just under the whole world
+    min_lat, max_lat, min_lon, max_lon = bounds_from_center_zoom({'lat': 0.0, 'lon': 10.0}, 1)
+    assert (min_lon, max_lon) == pytest.approx((10.0 - 175.78125, 10.0 + 175.78125))
+    assert min_lat == pytest.approx(-max_lat)
+    # Past the world's top edge the view stops at it
+    min_lat, max_lat, _, _ = bounds_from_center_zoom({'lat': 84.0, 'lon': 0.0}, 2)
+    assert max_lat == pytest.approx(85.05112878) and min_lat < 84.0
+
+
+def test_viewport_from_relayout():
+    derived = {'coordinates': [[170.0, 10.0], [200.0, 10.0], [200.0, -5.0], [170.0, -5.0]]}
+    # Longitudes are kept past 180 after panning across the antimeridian
+    assert viewport_from_relayout({'mapbox.zoom': 4.5, 'mapbox._derived': derived}) == \
+        ((-5.0, 10.0, 170.0, 200.0), 4.5)
+    assert viewport_from_relayout({'map._derived': derived}) == ((-5.0, 10.0, 170.0, 200.0), 1.0)
+    bounds, zoom = viewport_from_relayout({'mapbox.center': {'lat': 0.0, 'lon': 10.0}, 'mapbox.zoom': 1})
+    assert zoom == 1.0 and bounds == bounds_from_center_zoom({'lat': 0.0, 'lon': 10.0}, 1)
+    for relayout_data in (None, {}, {'autosize': True}, {'mapbox.center': {'lat': 0.0, 'lon': 0.0}}):
+        assert viewport_from_relayout(relayout_data) is None
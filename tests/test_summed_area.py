@@ -0,0 +1,141 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data_processor import DATASET_FILE, DataProcessor
+from src.summed_area import MAGNITUDE_BANDS, SummedAreaTable
+
+
+def _brute_force(lat, lon, layer, cell_deg, bounds=None, first=None, last=None) -> int:
+    """Events in the cells touching bounds and in layers first..last, counted one by one."""
+    keep = np.ones(len(layer), dtype=bool)
+    if first is not None:
+        keep &= layer >= first
+    if last is not None:
+        keep &= layer <= last
+    if bounds:
+        min_lat, max_lat, min_lon, max_lon = bounds
+        n_rows, n_cols = int(np.ceil(180 / cell_deg)), int(np.ceil(360 / cell_deg))
+        rows = np.clip((lat + 90) // cell_deg, 0, n_rows - 1)
+        cols = np.clip((lon + 180) // cell_deg, 0, n_cols - 1)
+        south = min((min_lat + 90) // cell_deg, n_rows - 1)
+        north = min((max_lat + 90) // cell_deg, n_rows - 1)
+        keep &= (rows >= south) & (rows <= north)
+        if max_lon - min_lon < 360:
+            west = min(((min_lon + 180) % 360) // cell_deg, n_cols - 1)
+            east = min(((max_lon + 180) % 360) // cell_deg, n_cols - 1)
+            keep &= (cols >= west) & (cols <= east) if west <= east else (cols >= west) | (cols <= east)
+    return int(keep.sum())
+
+
+@pytest.fixture(scope='module')
+def events(data_processor):
+    data = data_processor.processed_data
+    return (data['Latitude'].to_numpy(), data['Longitude'].to_numpy(), data['year'].to_numpy(dtype=np.int64),
+            np.searchsorted(MAGNITUDE_BANDS, data['mag'].to_numpy(dtype=float), side='right'))
+
+
+QUERIES = [
+    {},
+    {'bounds': (-10.0, 20.0, 30.0, 60.0)},
+    # Edges on cell boundaries also take the cell north or east of them
+    {'bounds': (10.0, 10.5, -76.0, -75.0)},
+    {'bounds': (-90.0, 90.0, -180.0, 180.0)},
+    # Across the antimeridian
+    {'bounds': (-45.0, 0.0, 170.0, -170.0)},
+    {'bounds': (-45.0, 0.0, 179.9, -179.9)},
+    {'bounds': (-30.0, 30.0, -200.0, 200.0)},
+    {'first': 1950, 'last': 1999},
+    {'first': 1980, 'last': 1980},
+    {'bounds': (-60.0, 60.0, 100.0, 180.0), 'first': 1900, 'last': 1960},
+    # Layers past the data are clipped, and empty selections count nothing
+    {'first': 1000, 'last': 3000},
+    {'first': 2001, 'last': 2000},
+    {'first': 2100},
+    {'last': 1800},
+    {'bounds': (20.0, 10.0, 0.0, 10.0)},
+    {'bounds': (80.0, 89.0, 0.0, 10.0)},
+]
+
+
+@pytest.mark.parametrize('query', QUERIES)
+def test_year_counts_match_brute_force(data_processor, events, query):
+    lat, lon, years, _ = events
+    table = data_processor.year_counts
+    assert table.count(**query) == _brute_force(lat, lon, years, table.cell_deg, **query)
+
+
+@pytest.mark.parametrize('query', [
+    {'bounds': (-10.0, 20.0, 30.0, 60.0)},
+    {'bounds': (10.75, 11.0, -75.25, -75.0)},
+    {'first': 1, 'last': 2},
+    {'first': 3},
+])
+def test_magnitude_counts_match_brute_force(data_processor, events, query):
+    lat, lon, _, bands = events
+    table = data_processor.magnitude_counts
+    assert table.cell_deg == 0.25
+    assert table.count(**query) == _brute_force(lat, lon, bands, table.cell_deg, **query)
+
+
+def test_batches_add_up_to_one_build(events):
+    lat, lon, years, _ = events
+    whole = SummedAreaTable.build(lat, lon, years, cell_deg=1.0)
+    # Batches that grow the layer axis on both sides
+    middle = (years >= 1950) & (years < 1990)
+    table = SummedAreaTable.build(lat[middle], lon[middle], years[middle], cell_deg=1.0)
+    table.add(lat[years >= 1990], lon[years >= 1990], years[years >= 1990])
+    table.add(lat[years < 1950], lon[years < 1950], years[years < 1950])
+    table.add([], [], [])
+    np.testing.assert_array_equal(table.table, whole.table)
+    assert table.first_layer == whole.first_layer
+
+
+def test_finest_grid_within_the_byte_budget(events):
+    lat, lon, years, _ = events
+    assert SummedAreaTable.build(lat, lon, years).cell_deg == 1.0
+    assert SummedAreaTable.build(lat, lon, years, max_bytes=10 ** 6).cell_deg == 5.0
+    assert SummedAreaTable.build([], [], []).count() == 0
+
+
+def test_count_in_bounds(data_processor):
+    data = data_processor.processed_data
+    bounds = (-20.0, 40.0, 60.0, 170.0)
+    inside = (data['Latitude'].between(bounds[0], bounds[1]) & data['Longitude'].between(bounds[2], bounds[3]))
+    years = data['year'].between(1960, 1999)
+    mags = data['mag'].between(5.0, 6.5)
+    # Both filters: exact, from the spatial index
+    assert data_processor.count_in_bounds(bounds, 1960, 1999, (5.0, 6.5)) == (inside & years & mags).sum()
+    # Either one: the cells touching bounds, in the years or the magnitude bands touched
+    lat, lon = data['Latitude'].to_numpy(), data['Longitude'].to_numpy()
+    assert data_processor.count_in_bounds(bounds, 1960, 1999) == _brute_force(
+        lat, lon, data['year'].to_numpy(), data_processor.year_counts.cell_deg, bounds, 1960, 1999)
+    bands = data['mag'].between(5.0, 7.0, inclusive='left')
+    assert data_processor.count_in_bounds(bounds, magnitude_range=(5.0, 6.5)) == _brute_force(
+        lat[bands], lon[bands], np.zeros(bands.sum()), 0.25, bounds)
+    assert data_processor.count_in_bounds() == len(data)
+    # A country: exact, from the spatial index
+    japan = data['country'].str.contains('japan', case=False, na=False)
+    assert data_processor.count_in_bounds(bounds, 1960, 1999, country='Japan') == (inside & years & japan).sum() > 0
+    assert data_processor.count_in_bounds(country='all') == len(data)
+
+
+@pytest.mark.filterwarnings('ignore:A value is trying to be set')
+def test_appended_events_are_counted(data_processor, catalog_dir, tmp_path):
+    raw = pd.read_csv(os.path.join(catalog_dir, DATASET_FILE))
+    raw.iloc[:2000].to_csv(tmp_path / DATASET_FILE, index=False)
+    partial = DataProcessor(str(tmp_path))
+    version = partial.version
+    assert partial.append_events(raw.iloc[2000:2500]) == 500
+    assert partial.append_events(raw.iloc[2500:]) == len(raw) - 2500
+    assert partial.append_events(raw.iloc[:0]) == 0
+    assert partial.version not in (version, data_processor.version)
+    pd.testing.assert_frame_equal(partial.processed_data, data_processor.processed_data)
+    for query in QUERIES:
+        assert partial.year_counts.count(**query) == data_processor.year_counts.count(**query)
+    bounds = (-20.0, 40.0, 60.0, 170.0)
+    assert partial.count_in_bounds(bounds, magnitude_range=(5.0, 6.5)) == \
+        data_processor.count_in_bounds(bounds, magnitude_range=(5.0, 6.5))
+    assert partial.country_tables.countries == data_processor.country_tables.countries
@@ -0,0 +1,139 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.temporal_pyramid import RESOLUTIONS, TemporalPyramid, pick_resolution, to_day
+
+# Inclusive magnitude ranges of the named filters; (5.9, 6.0) and (6.9, 7.0) are in none
+FILTERS = {'minor': (-np.inf, 3.999999), 'moderate': (4.0, 5.9), 'strong': (6.0, 6.9), 'major': (7.0, np.inf)}
+PERIODS = {'day': 'D', 'week': 'W-SUN', 'month': 'M', 'year': 'Y'}
+
+
+@pytest.fixture(scope='module')
+def pyramid(data_processor):
+    return data_processor.get_temporal_pyramid()
+
+
+def _utc_day(value) -> pd.Timestamp:
+    value = pd.Timestamp(value)
+    return (value.tz_convert('UTC').tz_localize(None) if value.tzinfo else value).normalize()
+
+
+def _brute_force(data, countries=None, magnitude_filter='all', start=None, end=None,
+                 resolution='month') -> pd.DataFrame:
+    """The series straight from the events, grouped by pandas periods."""
+    time = data['time'].dt.tz_convert('UTC').dt.tz_localize(None)
+    keep = time.notna()
+    if start is not None:
+        keep &= time.dt.normalize() >= _utc_day(start)
+    if end is not None:
+        keep &= time.dt.normalize() <= _utc_day(end)
+    if countries is not None:
+        keep &= data['country'].isin(countries)
+    if magnitude_filter != 'all':
+        keep &= data['mag'].between(*FILTERS[magnitude_filter])
+    events = data[keep].assign(date=time[keep].dt.to_period(PERIODS[resolution]).dt.start_time)
+    series = events.groupby('date').agg(count=('mag', 'size'), avg_magnitude=('mag', 'mean'),
+                                        max_magnitude=('mag', 'max'), avg_depth=('depth', 'mean'))
+    return series.reset_index()
+
+
+def _assert_matches(series, expected):
+    if expected.empty:
+        assert series.empty
+        return
+    pd.testing.assert_series_equal(series['date'], expected['date'].astype('datetime64[ns]'), check_names=False)
+    np.testing.assert_array_equal(series['count'], expected['count'])
+    for name in ('avg_magnitude', 'max_magnitude', 'avg_depth'):
+        np.testing.assert_allclose(series[name], expected[name], rtol=1e-9)
+
+
+def _rows(pyramid, countries):
+    return None if countries is None else [pyramid.countries.index(country) for country in countries]
+
+
+@pytest.mark.parametrize('resolution', RESOLUTIONS)
+@pytest.mark.parametrize('window', [
+    (None, None),
+    # Cut in the middle of weeks, months and years
+    ('1990-03-15', '2001-07-10'),
+    ('1990-03-15T22:00:00Z', '2001-07-10T01:00:00Z'),
+    # Inside a single week, month and year
+    ('2010-06-09', '2010-06-11'),
+    ('1975-01-01', '1975-12-31'),
+    # Empty selections
+    ('2010-01-02', '2010-01-01'),
+    ('2100-01-01', None),
+    (None, '1800-01-01'),
+])
+def test_all_events_row_matches_brute_force(pyramid, data_processor, resolution, window):
+    series = pyramid.series(None, 'all', *window, resolution=resolution)
+    assert series.empty or series.attrs['resolution'] == resolution
+    _assert_matches(series, _brute_force(data_processor.processed_data, None, 'all', *window, resolution))
+
+
+@pytest.mark.parametrize('countries, magnitude_filter, resolution', [
+    (['Turkey'], 'all', 'year'),
+    (['Turkey'], 'moderate', 'month'),
+    (['Peru', 'Chile'], 'all', 'week'),
+    (['Japan', 'Indonesia', 'Fiji'], 'strong', 'year'),
+    (None, 'major', 'month'),
+    (None, 'minor', 'year'),
+])
+def test_country_rows_match_brute_force(pyramid, data_processor, countries, magnitude_filter, resolution):
+    window = ('1960-02-29', '2015-11-03')
+    series = pyramid.series(_rows(pyramid, countries), magnitude_filter, *window, resolution=resolution)
+    _assert_matches(series, _brute_force(data_processor.processed_data, countries, magnitude_filter,
+                                         *window, resolution))
+
+
+def test_empty_country_and_filter(pyramid):
+    assert pyramid.series(_rows(pyramid, ['Turkey']), 'minor', resolution='year').empty
+    assert pyramid.series([], 'all', resolution='year').empty
+
+
+def test_auto_resolution(pyramid, data_processor):
+    windows = [('2010-06-01', '2010-09-30'), ('2000-01-01', '2003-12-31'), ('1990-01-01', '2005-12-31'), (None, None)]
+    for window in windows:
+        series = pyramid.series(None, 'all', *window, resolution='auto')
+        first = to_day(window[0]) if window[0] else pyramid.first_day
+        last = to_day(window[1]) if window[1] else pyramid.last_day
+        assert series.attrs['resolution'] == pick_resolution(first, last)
+        _assert_matches(series, _brute_force(data_processor.processed_data, None, 'all', *window,
+                                             series.attrs['resolution']))
+    with pytest.raises(ValueError):
+        pyramid.series(resolution='fortnight')
+
+
+def test_country_gaps_and_undated_events():
+    data = pd.DataFrame({
+        'time': pd.to_datetime(['2020-01-31T23:59:59Z', '2020-02-01T00:00:00Z', '2020-02-03T12:00:00Z',
+                                '2020-12-31T12:00:00Z', None], format='ISO8601'),
+        'country': ['Chile', None, 'Chile', 'Peru', 'Peru'],
+        'mag': [5.95, 3.5, 6.95, 7.0, 8.0],
+        'depth': [10.0, 20.0, 30.0, 40.0, 50.0],
+    })
+    pyramid = TemporalPyramid.build(data, ['Chile', 'Peru'])
+    everything = pyramid.series(resolution='year')
+    # The undated event is left out; the event without a country is in the all-events row
+    assert everything['count'].tolist() == [4]
+    assert pyramid.series([2], resolution='year')['count'].tolist() == [1]
+    # Magnitudes between the named ranges are only in 'all'
+    assert pyramid.series([0], 'all', resolution='month')['count'].tolist() == [1, 1]
+    assert pyramid.series([0], 'moderate', resolution='month').empty
+    assert pyramid.series([0], 'strong', resolution='month').empty
+    assert pyramid.series([1], 'major', resolution='month')['count'].tolist() == [1]
+    # Weeks start on Monday: 2020-02-01 (Saturday) is in the week of 2020-01-27
+    weeks = pyramid.series(None, 'all', '2020-01-30', '2020-02-05', resolution='week')
+    assert weeks['date'].dt.strftime('%Y-%m-%d').tolist() == ['2020-01-27', '2020-02-03']
+    assert weeks['count'].tolist() == [2, 1]
+    for resolution in RESOLUTIONS:
+        for window in [(None, None), ('2020-02-01', '2020-12-30')]:
+            _assert_matches(pyramid.series(None, 'all', *window, resolution=resolution),
+                            _brute_force(data, None, 'all', *window, resolution))
+
+
+def test_no_dated_events():
+    data = pd.DataFrame({'time': pd.to_datetime([None]).tz_localize('UTC'), 'country': ['Chile'],
+                         'mag': [5.0], 'depth': [10.0]})
+    assert TemporalPyramid.build(data, ['Chile']).series(resolution='month').empty
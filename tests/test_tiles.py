@@ -0,0 +1,41 @@
+from urllib.parse import parse_qsl, urlsplit
+
+import pytest
+
+from src.tiles import _cache_key, parse_filters, tile_grid, tile_layer
+
+
+def test_close_filters_get_their_own_tiles(data_processor):
+    keys = {_cache_key(data_processor, 3, 1, 2, 'png', 'density', {'min_mag': value}, 256)
+            for value in (5.0, 5.0000001, 5.00000012)}
+    assert len(keys) == 3
+
+
+def test_tile_layer_round_trips_filters():
+    layer = tile_layer('v1', start_year=1990, min_mag=5.0000001, max_mag=None)
+    args = dict(parse_qsl(urlsplit(layer['source'][0]).query))
+    assert args['v'] == 'v1' and 'max_mag' not in args
+    assert parse_filters(args) == {'start_year': 1990.0, 'min_mag': 5.0000001}
+
+
+def test_country_filter(data_processor):
+    data = data_processor.processed_data
+    world = tile_grid(data_processor, 0, 0, 0, filters={'start_year': 1950.0})
+    japan = tile_grid(data_processor, 0, 0, 0, filters={'start_year': 1950.0, 'country': 'jaPAN'})
+    expected = (data['year'] >= 1950) & data['country'].str.contains('japan', case=False, na=False)
+    assert japan.sum() == expected.sum() and 0 < japan.sum() < world.sum()
+    assert tile_grid(data_processor, 0, 0, 0, filters={'country': 'all'}).sum() == len(data)
+    # Names match literally, and only their case is ignored in the cache
+    assert tile_grid(data_processor, 0, 0, 0, filters={'country': '.*'}).sum() == 0
+    keys = {_cache_key(data_processor, 0, 0, 0, 'png', 'density', {'country': name}, 256)
+            for name in ('Japan', 'JAPAN', '../Japan')}
+    assert len(keys) == 2 and all('..' not in key for key in keys)
+
+
+def test_country_round_trips_through_tile_layer():
+    layer = tile_layer('v1', country='Papua New Guinea & Fiji', start_year=2000)
+    assert parse_filters(dict(parse_qsl(urlsplit(layer['source'][0]).query))) == \
+        {'start_year': 2000.0, 'country': 'Papua New Guinea & Fiji'}
+    for country in (' ', 'x' * 101, 'Ja\npan'):
+        with pytest.raises(ValueError):
+            parse_filters({'country': country})
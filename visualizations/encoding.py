@@ -0,0 +1,175 @@
+import base64
+import json
+import re
+import threading
+from typing import Dict, Optional
+
+import numpy as np
+import plotly.io as pio
+from plotly.offline import get_plotlyjs_version
+from src.metrics import stage
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Dash serializes callback responses with plotly's JSON encoder; orjson is several
+# times faster than the standard library when it is installed
+if orjson is not None:
+    pio.json.config.default_engine = 'orjson'
+
+# plotly.js reads {'dtype', 'bdata'} typed arrays from version 2.28 on
+TYPED_ARRAYS_SUPPORTED = tuple(int(p) for p in get_plotlyjs_version().split('.')[:2]) >= (2, 28)
+
+# Shorter arrays are cheaper as plain JSON than as base64 with its wrapper
+MIN_TYPED_ARRAY_LENGTH = 16
+
+# Only these trace keys are rounded; sizes and colors keep full precision
+COORDINATE_KEYS = frozenset(['lat', 'lon', 'x', 'y', 'z'])
+
+# Hover labels that print one of these unformatted need the exact (double) values
+_RAW_HOVER_VALUE = re.compile(r'%\{(lat|lon|x|y|z|marker\.size|marker\.color)\}')
+
+# Typed array JSON wrapper: {"dtype":"f8","bdata":""}
+_TYPED_ARRAY_OVERHEAD = 27
+
+# plotly.js has no 64-bit integer typed arrays
+_INT_DTYPES = [('i1', np.int8), ('u1', np.uint8), ('i2', np.int16), ('u2', np.uint16),
+               ('i4', np.int32), ('u4', np.uint32)]
+
+
+class FigureEncoder:
+    """
+    Rewrites the trace arrays of a figure for a smaller response.
+
+    precision rounds coordinate arrays (lat/lon/x/y/z) to that many decimals,
+    typed_arrays sends numeric arrays as base64 typed arrays, and float_dtype
+    picks their width ('f8' or 'f4'; 'f4' keeps about 7 significant digits).
+    """
+
+    def __init__(self, precision: Optional[int] = None, typed_arrays: bool = False,
+                 float_dtype: str = 'f8'):
+        self.precision = precision
+        self.typed_arrays = typed_arrays and TYPED_ARRAYS_SUPPORTED
+        self.float_dtype = float_dtype
+
+    def encode(self, fig) -> tuple:
+        """Return (encoded figure dict, JSON bytes before, JSON bytes after) for the rewritten arrays."""
+        if hasattr(fig, 'to_plotly_json'):
+            fig = fig.to_plotly_json()
+        sizes = [0, 0]
+        data = []
+        for trace in fig.get('data', []):
+            # Single precision would show up as 35.68949890136719 in a hover label
+            float_dtype = 'f8' if _hover_shows_values(trace) else self.float_dtype
+            data.append(self._encode_props(trace, float_dtype, sizes))
+        return dict(fig, data=data), sizes[0], sizes[1]
+
+    def _encode_props(self, props: dict, float_dtype: str, sizes: list) -> dict:
+        encoded = {}
+        for key, value in props.items():
+            if isinstance(value, dict):
+                encoded[key] = self._encode_props(value, float_dtype, sizes)
+            elif isinstance(value, (list, tuple, np.ndarray)) and len(value) >= MIN_TYPED_ARRAY_LENGTH:
+                encoded[key] = self._encode_array(key, value, float_dtype, sizes)
+            else:
+                encoded[key] = value
+        return encoded
+
+    def _encode_array(self, key: str, value, float_dtype: str, sizes: list):
+        array = np.asarray(value)
+        if array.dtype.kind not in 'fiu' or array.ndim != 1:
+            # Dates, strings and arrays with None gaps stay as they are
+            return value
+
+        rounded = self.precision is not None and key in COORDINATE_KEYS and array.dtype.kind == 'f'
+        if rounded:
+            array = np.round(array, self.precision)
+        if not (rounded or self.typed_arrays):
+            return value
+
+        before = _json_size(value)
+        result, after = array, _json_size(array) if rounded else before
+        if self.typed_arrays:
+            typed = self._typed_array(array, float_dtype)
+            # Short decimals like magnitudes are often smaller as plain JSON
+            if len(typed['bdata']) + _TYPED_ARRAY_OVERHEAD < after:
+                result, after = typed, len(typed['bdata']) + _TYPED_ARRAY_OVERHEAD
+        if result is array and not rounded:
+            return value
+
+        sizes[0] += before
+        sizes[1] += after
+        return result
+
+    def _typed_array(self, array: np.ndarray, float_dtype: str) -> dict:
+        if array.dtype.kind in 'iu':
+            low, high = (array.min(), array.max()) if array.size else (0, 0)
+            for name, dtype in _INT_DTYPES:
+                info = np.iinfo(dtype)
+                if info.min <= low and high <= info.max:
+                    return {'dtype': name, 'bdata': _b64(array.astype(dtype))}
+        dtype = np.float32 if float_dtype == 'f4' else np.float64
+        return {'dtype': float_dtype, 'bdata': _b64(array.astype(dtype))}
+
+
+def _hover_shows_values(trace: dict) -> bool:
+    """Whether the trace's hover label prints raw coordinate/size/color values."""
+    if 'hovertemplate' in trace:
+        return bool(_RAW_HOVER_VALUE.search(str(trace['hovertemplate'])))
+    return trace.get('hoverinfo', 'all') not in ('skip', 'none', 'text', 'name')
+
+
+def _b64(array: np.ndarray) -> str:
+    # plotly.js reads typed arrays as little-endian
+    little_endian = np.ascontiguousarray(array, dtype=array.dtype.newbyteorder('<'))
+    return base64.b64encode(little_endian.tobytes()).decode('ascii')
+
+
+def _json_size(value) -> int:
+    if isinstance(value, np.ndarray):
+        value = value.tolist()
+    if orjson is not None:
+        return len(orjson.dumps(value))
+    return len(json.dumps(value, separators=(',', ':')))
+
+
+# Encoders callbacks can pick by name
+ENCODERS: Dict[str, FigureEncoder] = {
+    # Only the faster JSON engine; for figures without large numeric arrays
+    'plain': FigureEncoder(),
+    # Maps: ~10 m coordinate precision, single-precision floats
+    'map': FigureEncoder(precision=4, typed_arrays=True, float_dtype='f4'),
+    # Charts: typed arrays at full precision
+    'chart': FigureEncoder(typed_arrays=True),
+}
+
+_stats: Dict[str, dict] = {}
+_stats_lock = threading.Lock()
+
+
+def encode_figure(fig, encoder: str = 'map', source: Optional[str] = None) -> dict:
+    """
+    Encode a figure (dict or go.Figure) with one of ENCODERS for a callback
+    response. Bytes saved are tallied under `source`, usually the callback name.
+    """
+    # Part of preparing the response, so it counts as serialization
+    with stage('serialization'):
+        encoded, before, after = ENCODERS[encoder].encode(fig)
+    if source is not None:
+        with _stats_lock:
+            entry = _stats.setdefault(source, {'calls': 0, 'bytes_before': 0, 'bytes_after': 0})
+            entry['calls'] += 1
+            entry['bytes_before'] += before
+            entry['bytes_after'] += after
+    return encoded
+
+
+def get_encoding_stats() -> Dict[str, dict]:
+    """Per-callback totals: calls, JSON bytes of the encoded arrays before/after and bytes saved."""
+    with _stats_lock:
+        return {
+            source: dict(entry, bytes_saved=entry['bytes_before'] - entry['bytes_after'])
+            for source, entry in _stats.items()
+        }
@@ -0,0 +1,47 @@
+import os
+import plotly.graph_objects as go
+import plotly.io as pio
+
+# Plot builders emit plain figure dicts; set EQ_VALIDATE_FIGURES=1 to run every
+# figure through plotly's validation as well (slow, meant for debugging)
+VALIDATE_FIGURES = os.environ.get('EQ_VALIDATE_FIGURES', '0') == '1'
+
+_template = None
+
+def get_template() -> dict:
+    """The default plotly template as a plain dict, converted once."""
+    global _template
+    if _template is None:
+        _template = pio.templates[pio.templates.default].to_plotly_json()
+    return _template
+
+def trace(trace_type: str, **props) -> dict:
+    """A trace dict; props use plotly's nested structure (no magic underscores)."""
+    props['type'] = trace_type
+    return props
+
+def make_figure(data: list, layout: dict) -> dict:
+    """Assemble a figure dict with the default template, validating it in debug mode."""
+    layout = dict(layout)
+    layout.setdefault('template', get_template())
+    fig = {'data': data, 'layout': layout}
+    if VALIDATE_FIGURES:
+        # Raises ValueError on any invalid property
+        go.Figure(fig)
+    return fig
+
+def message_figure(text: str, **layout) -> dict:
+    """Empty figure with a centered gray message, used when there is nothing to plot."""
+    layout['annotations'] = [dict(
+        text=text,
+        xref="paper", yref="paper",
+        x=0.5, y=0.5, showarrow=False,
+        font=dict(size=16, color="gray")
+    )]
+    return make_figure([], layout)
+
+def title(text: str) -> dict:
+    return {'text': text}
+
+def axis_title(text: str) -> dict:
+    return {'title': {'text': text}}
@@ -1,15 +1,25 @@
 import os
-import requests
 import json 
-from shapely.geometry import shape
+
+CENTROIDS_PATH = "data/country_centroids.json"
+
+# Boundaries and centroids never change while the app runs, so keep them in memory
+_world_geojson = None
+_country_centroids = None
 
 def get_world_geojson():
     """Get world GeoJSON data for country boundaries."""
+    global _world_geojson
+    if _world_geojson is not None:
+        return _world_geojson
+    import requests
+
     try:
         url = 'https://raw.githubusercontent.com/johan/world.geo.json/master/countries.geo.json'
         response = requests.get(url)
         response.raise_for_status()
-        return response.json()
+        _world_geojson = response.json()
+        return _world_geojson
     except Exception as e:
         print(f"Error fetching GeoJSON: {e}")
         return None
@@ -27,9 +37,24 @@ def get_fault_lines_geojson(path: str = "data/fault_lines.geojson"):
 def get_all_country_centroids() -> dict:
     """
     Returns a dictionary of { country_name: (lat, lon) } using the world GeoJSON.
+    Uses the saved data/country_centroids.json when it exists.
     """
+    global _country_centroids
+    if _country_centroids is not None:
+        return _country_centroids
+
+    if os.path.exists(CENTROIDS_PATH):
+        with open(CENTROIDS_PATH, "r") as f:
+            _country_centroids = {name: tuple(latlon) for name, latlon in json.load(f).items()}
+        return _country_centroids
+
+    # Only needed when the centroid file has to be rebuilt
+    from shapely.geometry import shape
+
     geojson = get_world_geojson()
     centroids = {}
+    if geojson is None:
+        return centroids
 
     for feature in geojson['features']:
         country_name = feature['properties'].get('name')
@@ -45,7 +70,8 @@ def get_all_country_centroids() -> dict:
     os.makedirs("data", exist_ok=True)
     
     # Save once for future fast use
-    with open("data/country_centroids.json", "w") as f:
+    with open(CENTROIDS_PATH, "w") as f:
         json.dump(centroids, f)
-        
+
+    _country_centroids = centroids
     return centroids
@@ -1,27 +1,124 @@
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from typing import Optional, Tuple
 from src.country_centers import get_country_center , get_country_zoom
+from src.spatial_index import cluster_points
+from src.country_tables import BAR_MAGNITUDE_LABELS
+from src.metrics import timed_stage
+from src.tiles import tile_layer
+
+# In viewport mode, views zoomed out below this level with many events show clusters
+CLUSTER_MAX_ZOOM = 6
+CLUSTER_MIN_POINTS = 500
+# Clusters per screen width
+CLUSTERS_ACROSS = 40
+
+def _create_cluster_view(country_data, bounds, zoom_level, center_coords, country) -> go.Figure:
+    """Map of server-side grid clusters, sized by event count and colored by max magnitude."""
+    lon_span = (bounds[3] - bounds[2]) % 360 or 360
+    clusters = cluster_points(
+        country_data['Latitude'].to_numpy(),
+        country_data['Longitude'].to_numpy(),
+        country_data['mag'].to_numpy(),
+        cell_deg=lon_span / CLUSTERS_ACROSS
+    )
+
+    fig = go.Figure(go.Scattermapbox(
+        lat=clusters['lat'],
+        lon=clusters['lon'],
+        mode='markers',
+        marker=dict(
+            size=np.clip(6 + 4 * np.log2(clusters['count']), 6, 40),
+            color=clusters['max_mag'],
+            colorscale='Viridis',
+            showscale=True,
+            colorbar=dict(title="Max Mag")
+        ),
+        text=[f"{count} earthquakes<br>Max magnitude: {mag:.1f}"
+              for count, mag in zip(clusters['count'], clusters['max_mag'])],
+        hoverinfo='text'
+    ))
+    fig.update_layout(
+        title=f"Earthquake Epicentres - {country} ({len(country_data):,} in view, clustered)",
+        height=500,
+        mapbox=dict(
+            center={"lat": center_coords[0], "lon": center_coords[1]},
+            zoom=zoom_level
+        )
+    )
+    return fig
 
+def _finish_map(fig, data_processor, country, density, start_year, end_year) -> go.Figure:
+    fig.update_layout(
+        mapbox_style="carto-positron",
+        margin={"r": 0, "t": 40, "l": 0, "b": 0},
+        # Keep the user's pan/zoom across updates for the same country
+        uirevision=str(country)
+    )
+    if density:
+        fig.update_layout(mapbox_layers=[
+            tile_layer(data_processor.version, start_year=start_year, end_year=end_year, country=country)
+        ])
+    return fig
+
+@timed_stage('figure_build')
 def create_country_focus_view(
     data_processor,
     country: str,
     start_date: Optional[str] = None,
-    end_date: Optional[str] = None
+    end_date: Optional[str] = None,
+    bounds: Optional[Tuple[float, float, float, float]] = None,
+    zoom: Optional[float] = None,
+    density: bool = False
 ) -> go.Figure:
     """
     Create detailed map view for a specific country.
+
+    In viewport mode (bounds = (min_lat, max_lat, min_lon, max_lon) of the visible
+    map, zoom = its zoom level) only events on screen are sent, clustered when
+    zoomed out. The view itself is kept by the browser (uirevision).
+
+    With density=True the map also draws the /tiles density raster of the
+    country's events in the date range beneath the points, and shows it
+    instead of the clusters, so zoomed-out views no longer send per-event data.
+    Those views count the country's events in view without loading them.
     """
 
+    center_coords = get_country_center(country)
+    if center_coords is None:
+        center_coords = (0, 0)
+        zoom_level = 1
+    else:
+        zoom_level = get_country_zoom(country)
+    zoomed_out = bounds and (zoom if zoom is not None else zoom_level) < CLUSTER_MAX_ZOOM
+    start_year = pd.Timestamp(start_date).year if start_date is not None else None
+    end_year = pd.Timestamp(end_date).year if end_date is not None else None
+
+    if zoomed_out and density:
+        # The raster draws the country's events in the years shown; counting
+        # them takes their row positions only, never the rows themselves
+        in_view = data_processor.count_in_bounds(bounds, start_year, end_year, country=country)
+        if in_view > CLUSTER_MIN_POINTS:
+            fig = go.Figure(go.Scattermapbox(lat=[], lon=[], mode='markers', hoverinfo='skip'))
+            fig.update_layout(
+                title=f"Earthquake Density - {country} ({in_view:,} events in view)",
+                height=500,
+                mapbox=dict(center={"lat": center_coords[0], "lon": center_coords[1]}, zoom=zoom_level)
+            )
+            return _finish_map(fig, data_processor, country, density, start_year, end_year)
+
     # Get country-specific filtered data
     country_data = data_processor.get_filtered_data(
         start_date=start_date,
         end_date=end_date,
-        country=country
+        country=country,
+        bounds=bounds
     )
 
-    if country_data.empty:
+    # An empty viewport still needs the map so the user can pan back
+    if country_data.empty and not bounds:
         fig = go.Figure()
         fig.add_annotation(
             text=f"No earthquake data available for {country} in the selected range. ",
@@ -32,37 +129,33 @@ def create_country_focus_view(
         fig.update_layout(title=f"Earthquake Map - {country}", height=500)
         return fig
 
-    center_coords = get_country_center(country)
-    if center_coords is None:
-        center_coords = (0, 0)
-        zoom_level = 1
+    clustered = zoomed_out and len(country_data) > CLUSTER_MIN_POINTS
+    if clustered:
+        fig = _create_cluster_view(country_data, bounds, zoom_level, center_coords, country)
     else:
-        zoom_level = get_country_zoom(country)
-
-    fig = px.scatter_mapbox(
-        country_data,
-        lat="Latitude",
-        lon="Longitude",
-        size="mag",
-        color="depth",
-        hover_name="Place",
-        hover_data=["time", "mag", "depth"],
-        color_continuous_scale="Viridis",
-        size_max=20,
-        zoom=zoom_level,
-        height=500,
-        center={"lat": center_coords[0], "lon": center_coords[1]} if center_coords else {"lat": 0, "lon": 0},
-        title=f"Earthquake Epicentres - {country}"
-    )
+        fig = px.scatter_mapbox(
+            country_data,
+            lat="Latitude",
+            lon="Longitude",
+            size="mag",
+            color="depth",
+            hover_name="Place",
+            hover_data=["time", "mag", "depth"],
+            color_continuous_scale="Viridis",
+            size_max=20,
+            zoom=zoom_level,
+            height=500,
+            center={"lat": center_coords[0], "lon": center_coords[1]} if center_coords else {"lat": 0, "lon": 0},
+            title=f"Earthquake Epicentres - {country}"
+        )
 
-    fig.update_layout(
-        mapbox_style="carto-positron",
-        margin={"r": 0, "t": 40, "l": 0, "b": 0},
-    )
+        if bounds:
+            fig.update_layout(title=f"Earthquake Epicentres - {country} ({len(country_data):,} in view)")
 
-    return fig
+    return _finish_map(fig, data_processor, country, density, start_year, end_year)
 
 
+@timed_stage('figure_build')
 def create_country_barcharts(
     data_processor,
     country: str,
@@ -73,32 +166,25 @@ def create_country_barcharts(
     Create two bar charts for a country:
     1. Magnitude distribution (low, medium, high)
     2. Earthquake count by year
+
+    Both come from the precomputed country tables, so the date window is
+    applied at year granularity.
     """
+    tables = data_processor.country_tables
+    if tables is None:
+        return go.Figure(), go.Figure()
 
-    df = data_processor.get_filtered_data(
-        start_date=start_date,
-        end_date=end_date,
-        country=country
-    )
+    start_year = pd.to_datetime(start_date).year if start_date is not None else None
+    end_year = pd.to_datetime(end_date).year if end_date is not None else None
+    years, counts = tables.class_year_counts_for(country, start_year, end_year)
 
-    if df.empty:
+    if counts.sum() == 0:
         return go.Figure(), go.Figure()
 
     # --- Bar chart 1: Magnitude distribution ---
-    def classify_magnitude(mag):
-        if mag < 5.0:
-            return 'Low (<5.0)'
-        elif mag < 6.5:
-            return 'Medium (5.0–6.5)'
-        else:
-            return 'High (≥6.5)'
-
-    df['mag_class'] = df['mag'].apply(classify_magnitude)
-    mag_counts = df['mag_class'].value_counts().reindex(['Low (<5.0)', 'Medium (5.0–6.5)', 'High (≥6.5)'], fill_value=0)
-
     mag_bar = go.Figure(go.Bar(
-        x=mag_counts.index,
-        y=mag_counts.values,
+        x=BAR_MAGNITUDE_LABELS,
+        y=counts.sum(axis=1),
         marker_color=['#3498db', '#f1c40f', '#e74c3c']
     ))
     mag_bar.update_layout(
@@ -109,10 +195,11 @@ def create_country_barcharts(
     )
 
     # --- Bar chart 2: Earthquake count by year ---
-    year_counts = df['year'].value_counts().sort_index()
+    year_counts = counts.sum(axis=0)
+    has_events = year_counts > 0
     year_bar = go.Figure(go.Bar(
-        x=year_counts.index.astype(str),
-        y=year_counts.values,
+        x=years[has_events].astype(str),
+        y=year_counts[has_events],
         marker_color='#9b59b6'
     ))
     year_bar.update_layout(
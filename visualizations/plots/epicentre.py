@@ -1,34 +1,31 @@
 import numpy as np
-import plotly.graph_objects as go
+from plotly.colors import sequential
+from ..fast_figure import make_figure, message_figure, title, trace
+from src.metrics import timed_stage
 
+YLORRD_COLORSCALE = [[i / (len(sequential.YlOrRd) - 1), color] for i, color in enumerate(sequential.YlOrRd)]
+
+@timed_stage('figure_build')
 def create_epicentre_impact(data_processor,
                              earthquake_id: str,
-                             radius: float = 0) -> go.Figure:
+                             radius: float = 0) -> dict:
     if data_processor.processed_data is None or data_processor.processed_data.empty:
-        fig = go.Figure()
-        fig.add_annotation(
-            text="No earthquake data available",
-            xref="paper", yref="paper",
-            x=0.5, y=0.5, showarrow=False,
-            font=dict(size=16, color="gray")
+        return message_figure(
+            "No earthquake data available",
+            title=title("Epicentre Impact Analysis"),
+            height=500
         )
-        fig.update_layout(title="Epicentre Impact Analysis", height=500)
-        return fig
 
     earthquake = data_processor.processed_data[
         data_processor.processed_data['ID'] == earthquake_id
     ]
 
     if earthquake.empty:
-        fig = go.Figure()
-        fig.add_annotation(
-            text="Earthquake not found",
-            xref="paper", yref="paper",
-            x=0.5, y=0.5, showarrow=False,
-            font=dict(size=16, color="gray")
+        return message_figure(
+            "Earthquake not found",
+            title=title("Epicentre Impact Analysis"),
+            height=500
         )
-        fig.update_layout(title="Epicentre Impact Analysis", height=500)
-        return fig
 
     eq = earthquake.iloc[0]
     lat_center = eq['Latitude']
@@ -40,40 +37,42 @@ def create_epicentre_impact(data_processor,
 
     angles = np.linspace(0, 2*np.pi, 100)
 
-    fig = go.Figure()
+    traces = []
 
     # Fancy concentric impact zones
     for scale in [1.0, 0.7, 0.4]:
         lat_circle = lat_center + (radius * scale / 111.32) * np.cos(angles)
         lon_circle = lon_center + (radius * scale / (111.32 * np.cos(np.radians(lat_center)))) * np.sin(angles)
 
-        fig.add_trace(go.Scattermapbox(
-            lat=lat_circle,
-            lon=lon_circle,
-            mode='lines',
-            line=dict(width=0),
+        traces.append(trace(
+            'scattermapbox',
             fill='toself',
             fillcolor=f'rgba(255, 0, 0, {0.05 + scale * 0.1})',
             hoverinfo='skip',
+            lat=lat_circle,
+            line=dict(width=0),
+            lon=lon_circle,
+            mode='lines',
             showlegend=False
         ))
 
     # Epicentre marker
-    fig.add_trace(go.Scattermapbox(
+    traces.append(trace(
+        'scattermapbox',
+        hoverinfo='text',
+        hovertext=[f"<b>{eq['Place']}</b><br>Magnitude: {mag}<br>Depth: {eq['depth']}km<br>Time: {eq['time']}"],
         lat=[lat_center],
         lon=[lon_center],
-        mode='markers+text',
         marker=dict(
-            size=20,
             color='red',
-            symbol='star',
-            opacity=0.9
+            opacity=0.9,
+            size=20,
+            symbol='star'
         ),
+        mode='markers+text',
         name='Epicentre',
         text=["Epicentre"],
-        textposition="top center",
-        hoverinfo='text',
-        hovertext=[f"<b>{eq['Place']}</b><br>Magnitude: {mag}<br>Depth: {eq['depth']}km<br>Time: {eq['time']}"]
+        textposition="top center"
     ))
 
     # Nearby earthquakes within ~5° (approx)
@@ -83,27 +82,28 @@ def create_epicentre_impact(data_processor,
     ].head(50)
 
     if not nearby_data.empty:
-        fig.add_trace(go.Scattermapbox(
-            lat=nearby_data['Latitude'],
-            lon=nearby_data['Longitude'],
-            mode='markers',
+        traces.append(trace(
+            'scattermapbox',
+            hoverinfo='text',
+            lat=nearby_data['Latitude'].to_numpy(),
+            lon=nearby_data['Longitude'].to_numpy(),
             marker=dict(
-                size=nearby_data['mag'] * 2,
-                color=nearby_data['mag'],
-                colorscale='YlOrRd',
-                showscale=True,
+                color=nearby_data['mag'].to_numpy(),
+                colorbar=dict(title=dict(side='top', text="Magnitude")),
+                colorscale=YLORRD_COLORSCALE,
                 opacity=0.75,
-                colorbar=dict(title="Magnitude", titleside='top')
+                showscale=True,
+                size=(nearby_data['mag'] * 2).to_numpy()
             ),
+            mode='markers',
             name='Nearby Earthquakes',
-            text=[f"{place}<br>Mag: {mag}" for place, mag in zip(nearby_data['Place'], nearby_data['mag'])],
-            hoverinfo='text'
+            text=[f"{place}<br>Mag: {mag}" for place, mag in zip(nearby_data['Place'], nearby_data['mag'])]
         ))
 
-    fig.update_layout(
-        mapbox_style='carto-darkmatter',
+    layout = dict(
         mapbox=dict(
             center=dict(lat=lat_center, lon=lon_center),
+            style='carto-darkmatter',
             zoom=6
         ),
         title=dict(
@@ -120,4 +120,4 @@ def create_epicentre_impact(data_processor,
         )
     )
 
-    return fig
+    return make_figure(traces, layout)
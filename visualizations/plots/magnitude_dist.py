@@ -1,13 +1,26 @@
-import plotly.express as px
+import numpy as np
 import plotly.graph_objects as go
 from typing import Optional
-def create_magnitude_distribution(data_processor, country: Optional[str] = None) -> go.Figure:
+from src.metrics import timed_stage
+
+# scale: 'linear' counts, 'log' counts on a log axis, or 'gutenberg_richter'
+# for the cumulative count N(≥M) on a log axis
+SCALES = ('linear', 'log', 'gutenberg_richter')
+
+@timed_stage('figure_build')
+def create_magnitude_distribution(data_processor, country: Optional[str] = None,
+                                  scale: str = 'linear') -> go.Figure:
     """
     Create histogram showing magnitude distribution.
+    Bins come from the precomputed per-country histograms, so the figure only
+    carries bin edges and counts. Raises ValueError for an unknown scale.
     """
-    data = data_processor.get_filtered_data(country=country)
+    if scale not in SCALES:
+        raise ValueError(f"scale must be one of {', '.join(SCALES)}, got {scale!r}")
+    tables = data_processor.country_tables
+    edges, counts = tables.magnitude_histogram_for(country) if tables is not None else (None, [])
     
-    if data.empty:
+    if len(counts) == 0:
         fig = go.Figure()
         fig.add_annotation(
             text="No data available for magnitude distribution",
@@ -23,21 +36,46 @@ def create_magnitude_distribution(data_processor, country: Optional[str] = None)
         )
         return fig
     
-    # Create histogram
-    fig = px.histogram(
-        data,
-        x='mag',
-        nbins=50,
-        title="Magnitude Distribution",
-        labels={'mag': 'Magnitude', 'count': 'Frequency'}
-    )
+    centers = np.round((edges[:-1] + edges[1:]) / 2, 2)
+    title = "Magnitude Distribution"
+    if country and country != 'all':
+        title += f" - {country}"
+
+    if scale == 'gutenberg_richter':
+        # N(≥M) at each bin's lower edge
+        cumulative = counts[::-1].cumsum()[::-1]
+        fig = go.Figure(go.Scatter(
+            x=edges[:-1],
+            y=cumulative,
+            mode='markers+lines',
+            hovertemplate="M ≥ %{x:.1f}: %{y}<extra></extra>"
+        ))
+        fig.update_layout(
+            title=f"{title} (Gutenberg–Richter)",
+            xaxis_title="Magnitude",
+            yaxis_title="Cumulative Count N(≥M)",
+            yaxis_type='log'
+        )
+    else:
+        fig = go.Figure(go.Bar(
+            x=centers,
+            y=counts,
+            width=np.diff(edges),
+            customdata=np.stack([edges[:-1], edges[1:]], axis=1),
+            hovertemplate="%{customdata[0]:.1f}–%{customdata[1]:.1f}: %{y}<extra></extra>"
+        ))
+        fig.update_layout(
+            title=title,
+            xaxis_title="Magnitude",
+            yaxis_title="Frequency",
+            yaxis_type='log' if scale == 'log' else 'linear',
+            bargap=0
+        )
     
     # Update layout
     fig.update_layout(
         height=400,
-        xaxis_title="Magnitude",
-        yaxis_title="Frequency",
         showlegend=False
     )
     
-    return fig 
+    return fig
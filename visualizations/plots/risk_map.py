@@ -1,124 +1,165 @@
-import plotly.express as px
-import plotly.graph_objects as go
+from plotly.colors import sequential
 from ..geo_utils import get_world_geojson, get_fault_lines_geojson, get_all_country_centroids
+from ..fast_figure import make_figure, message_figure, title, trace
+from src.cache import versioned_cache
+from functools import lru_cache
 from typing import Optional
+from src.metrics import timed_stage
 
-def create_global_risk_map(data_processor, metric: str = 'count', top_n: int = 20, show_fault_lines: bool = False) -> go.Figure:
+# Trace positions of the overlays (trace 0 is the choropleth)
+FAULT_LINE_TRACE_INDEX = 1
+LABEL_TRACE_INDEX = 2
+
+
+@lru_cache(maxsize=1)
+def _fault_line_coordinates():
+    """Flatten all fault lines into one lon/lat pair, separated by None gaps."""
+    fault_geojson = get_fault_lines_geojson()
+    lons, lats = [], []
+    if not fault_geojson:
+        return tuple(lons), tuple(lats)
+
+    for feature in fault_geojson['features']:
+        geometry = feature['geometry']
+        coords = geometry['coordinates']
+        if geometry['type'] == 'LineString':
+            lines = [coords]
+        elif geometry['type'] == 'MultiLineString':
+            lines = coords
+        else:
+            continue
+
+        for line in lines:
+            for lon, lat in line:
+                lons.append(lon)
+                lats.append(lat)
+            lons.append(None)
+            lats.append(None)
+
+    return tuple(lons), tuple(lats)
+
+
+def _fault_line_trace(visible: bool) -> dict:
+    lons, lats = _fault_line_coordinates()
+    return trace(
+        'scattergeo',
+        hoverinfo='skip',
+        lat=lats,
+        line=dict(color='black', dash='dot', width=1.5),
+        lon=lons,
+        mode='lines',
+        name='Fault Line',
+        visible=visible
+    )
+
+
+def _label_trace(top_countries, centroids: dict, metric: str, visible: bool) -> dict:
+    lons, lats, texts = [], [], []
+    for country, value in zip(top_countries['country'], top_countries['value']):
+        centroid = centroids.get(country)
+        if centroid:
+            lons.append(centroid[1])
+            lats.append(centroid[0])
+            texts.append(f"{country}<br>{metric.title()}: {value:.2f}")
+
+    return trace(
+        'scattergeo',
+        lat=lats,
+        lon=lons,
+        mode='text',
+        showlegend=False,
+        text=texts,
+        textfont=dict(color="black", size=10),
+        visible=visible
+    )
+
+def _choropleth_trace(risk_data, geojson_data) -> dict:
+    """Country choropleth colored by 'value', laid out like plotly express builds it."""
+    locations = risk_data['country'].to_numpy(dtype=object)
+    if geojson_data:
+        location_props = dict(featureidkey='properties.name', geojson=geojson_data)
+    else:
+        location_props = dict(locationmode='country names')
+    return trace(
+        'choropleth',
+        coloraxis='coloraxis',
+        customdata=risk_data[['count', 'avg_magnitude', 'max_magnitude']].to_numpy(),
+        geo='geo',
+        hovertemplate=(
+            '<b>%{hovertext}</b><br><br>country=%{location}<br>count=%{customdata[0]}'
+            '<br>avg_magnitude=%{customdata[1]}<br>max_magnitude=%{customdata[2]}'
+            '<br>value=%{z}<extra></extra>'
+        ),
+        hovertext=locations,
+        locations=locations,
+        name='',
+        z=risk_data['value'].to_numpy(),
+        **location_props
+    )
+
+# Sequential 'Reds' scale as [position, color] pairs
+REDS_COLORSCALE = [[i / (len(sequential.Reds) - 1), color] for i, color in enumerate(sequential.Reds)]
+
+
+@versioned_cache('risk_map_figures', maxsize=8)
+@timed_stage('figure_build')
+def create_global_risk_map(data_processor, metric: str = 'count', top_n: int = 20,
+                           show_fault_lines: bool = False, show_labels: bool = True) -> dict:
     """
     Enhanced global risk map showing earthquake activity by country, fault lines,
     and labeled high-risk zones.
+
+    The fault lines and the labels are always added as one trace each, at
+    FAULT_LINE_TRACE_INDEX and LABEL_TRACE_INDEX, and only their visibility
+    depends on the flags.
+
+    Figures are cached per dataset version; callers must not mutate them.
     """
 
     # Fetch risk data
     risk_data = data_processor.get_risk_map_data(metric)
     
     if risk_data.empty:
-        fig = go.Figure()
-        fig.add_annotation(
-            text="No data available for risk map",
-            xref="paper", yref="paper",
-            x=0.5, y=0.5, showarrow=False,
-            font=dict(size=16, color="gray")
-        )
-        fig.update_layout(
-            title="Global Earthquake Risk Map",
+        return message_figure(
+            "No data available for risk map",
+            title=title("Global Earthquake Risk Map"),
             height=600
         )
-        return fig
 
     # Load world boundaries
     geojson_data = get_world_geojson()
 
     # Base choropleth (with or without custom geojson)
     if geojson_data:
-        fig = px.choropleth(
-            risk_data,
-            geojson=geojson_data,
-            locations='country',
-            featureidkey='properties.name',
-            color='value',
-            hover_name='country',
-            hover_data=['count', 'avg_magnitude', 'max_magnitude'],
-            color_continuous_scale='Reds',
-            title=f"Global Earthquake Risk Map - {metric.replace('_', ' ').title()}"
-        )
-        fig.update_geos(
+        geo = dict(
             showframe=False,
             showcoastlines=True,
             coastlinecolor='darkblue',
-            projection_type='natural earth'
+            projection=dict(type='natural earth')
         )
     else:
-        fig = px.choropleth(
-            risk_data,
-            locations='country',
-            locationmode='country names',
-            color='value',
-            hover_name='country',
-            hover_data=['count', 'avg_magnitude', 'max_magnitude'],
-            color_continuous_scale='Reds',
-            title=f"Global Earthquake Risk Map - {metric.replace('_', ' ').title()}"
-        )
-        fig.update_layout(
-            geo=dict(
-                showframe=False,
-                showcoastlines=True,
-                projection_type='equirectangular'
-            )
+        geo = dict(
+            showframe=False,
+            showcoastlines=True,
+            projection=dict(type='equirectangular')
         )
+    traces = [_choropleth_trace(risk_data, geojson_data)]
 
-    # Overlay Fault Lines 
-    fault_geojson = get_fault_lines_geojson()
-    if show_fault_lines and fault_geojson:
-        for feature in fault_geojson['features']:
-            geometry = feature['geometry']
-            coords = geometry['coordinates']
-
-            if geometry['type'] == 'LineString':
-                lons, lats = zip(*coords)  # unpack as lon, lat
-                fig.add_trace(go.Scattergeo(
-                    lon=lons,
-                    lat=lats,
-                    mode='lines',
-                    line=dict(color='black', width=1.5, dash = 'dot'),
-                    name='Fault Line',
-                    hoverinfo='skip'
-                ))
-
-            elif geometry['type'] == 'MultiLineString':
-                for line in coords:
-                    lons, lats = zip(*line)
-                    fig.add_trace(go.Scattergeo(
-                        lon=lons,
-                        lat=lats,
-                        mode='lines',
-                        line=dict(color='black', width=1),
-                        name='Fault Line',
-                        hoverinfo='skip',
-                        showlegend=False
-                    ))
-
+    # Overlays live at fixed trace positions so the toggles can patch them in place
+    traces.append(_fault_line_trace(visible=show_fault_lines))
 
     # Annotate High-Risk Countries (top N)
     top_countries = risk_data.nlargest(top_n, 'value')
     centroids = get_all_country_centroids()
+    traces.append(_label_trace(top_countries, centroids, metric, visible=show_labels))
 
-    for _, row in top_countries.iterrows():
-         centroid = centroids.get(row['country'])
-         if centroid:
-            fig.add_trace(go.Scattergeo(
-                lon=[centroid[1]],
-                lat=[centroid[0]],
-                text=[f"{row['country']}<br>{metric.title()}: {row['value']:.2f}"],
-                mode='text',
-                showlegend=False,
-                textfont=dict(color="black", size=10)
-            ))
-
-    # Final layout cleanup
-    fig.update_layout(
+    layout = dict(
+        coloraxis=dict(colorbar=dict(title=title('value')), colorscale=REDS_COLORSCALE),
+        geo=dict(domain=dict(x=[0.0, 1.0], y=[0.0, 1.0]), center={}, **geo),
+        legend=dict(tracegroupgap=0),
+        title=title(f"Global Earthquake Risk Map - {metric.replace('_', ' ').title()}"),
         height=600,
         margin=dict(l=0, r=0, t=50, b=0)
     )
 
-    return fig
+    return make_figure(traces, layout)
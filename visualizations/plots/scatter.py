@@ -1,11 +1,91 @@
-import plotly.express as px
-import plotly.graph_objects as go
+import numpy as np
+import pandas as pd
 from typing import Optional, List
+from src.binned_stats import depth_class_statistics
+from ..fast_figure import axis_title, get_template, make_figure, message_figure, title
+from src.metrics import timed_stage
+
+# Above this many points the scatter is drawn with WebGL (Scattergl) instead of SVG
+WEBGL_POINT_THRESHOLD = 2000
+# Above this many points only a stratified sample is plotted (counts still use every event)
+MAX_PLOTTED_POINTS = 20000
+
+def _stratified_sample(data, max_points: int, by: str = 'magnitude_category', seed: int = 0):
+    """
+    Sample about max_points rows, keeping each category's share of the data
+    (with a floor so rare categories stay visible) and always keeping the
+    largest and the deepest event.
+    """
+    rng = np.random.default_rng(seed)
+    total = len(data)
+    groups = data.groupby(by, observed=True).indices
+    floor = max_points // (4 * max(len(groups), 1))
+
+    keep = [np.argmax(data['mag'].to_numpy()), np.argmax(data['depth'].to_numpy())]
+    for positions in groups.values():
+        quota = max(int(round(max_points * len(positions) / total)), min(len(positions), floor))
+        if quota >= len(positions):
+            keep.append(positions)
+        else:
+            keep.append(rng.choice(positions, size=quota, replace=False))
+
+    positions = np.unique(np.concatenate([np.atleast_1d(k) for k in keep]))
+    return data.iloc[positions]
+
+def _category_traces(plot_data, trace_type: str = 'scatter') -> list:
+    """
+    One marker trace per magnitude category in order of first appearance,
+    sized by magnitude and colored from the template colorway (the figure
+    plotly express would build, without its overhead).
+    """
+    colorway = get_template()['layout']['colorway']
+    codes, categories = pd.factorize(plot_data['magnitude_category'], sort=False)
+    mag = plot_data['mag'].to_numpy()
+    depth = plot_data['depth'].to_numpy()
+    places = plot_data['Place'].to_numpy()
+    customdata = plot_data[['time', 'country']].to_numpy()
+    # No rows (nothing in the selected years) means no traces, as with plotly express
+    sizeref = mag.max() / (20 ** 2) if len(mag) else None
+
+    traces = []
+    for i, category in enumerate(categories):
+        rows = codes == i
+        traces.append(dict(
+            customdata=customdata[rows],
+            hovertemplate=(
+                "<b>%{hovertext}</b><br><br>"
+                f"Magnitude Category={category}<br>"
+                "Depth (km)=%{x}<br>Magnitude=%{marker.size}<br>"
+                "time=%{customdata[0]}<br>country=%{customdata[1]}<extra></extra>"
+            ),
+            hovertext=places[rows],
+            legendgroup=str(category),
+            marker=dict(
+                color=colorway[i % len(colorway)],
+                size=mag[rows],
+                sizemode='area',
+                sizeref=sizeref,
+                symbol='circle'
+            ),
+            mode='markers',
+            name=str(category),
+            showlegend=True,
+            x=depth[rows],
+            xaxis='x',
+            y=mag[rows],
+            yaxis='y',
+            type=trace_type
+        ))
+        if trace_type == 'scatter':
+            traces[-1]['orientation'] = 'v'
+    return traces
+
+@timed_stage('figure_build')
 def create_scatter_plot(data_processor,
                        country_filter: Optional[str] = None,
                        magnitude_range: Optional[List[float]] = None,
                        start_year: Optional[int] = None,
-                       end_year: Optional[int] = None) -> go.Figure:
+                       end_year: Optional[int] = None):
     """
     Create scatter plot showing depth vs magnitude relationship.
     """
@@ -13,67 +93,51 @@ def create_scatter_plot(data_processor,
     data = data_processor.get_filtered_data(country=country_filter)
     
     if data.empty:
-        fig = go.Figure()
-        fig.add_annotation(
-            text="No data available for scatter plot",
-            xref="paper", yref="paper",
-            x=0.5, y=0.5, showarrow=False,
-            font=dict(size=16, color="gray")
-        )
-        fig.update_layout(
-            title="Depth vs Magnitude Relationship",
-            xaxis_title="Depth (km)",
-            yaxis_title="Magnitude",
+        fig = message_figure(
+            "No data available for scatter plot",
+            title=title("Depth vs Magnitude Relationship"),
+            xaxis=axis_title("Depth (km)"),
+            yaxis=axis_title("Magnitude"),
             height=500
         )
-        return fig, {'shallow': 0, 'intermediate': 0, 'deep': 0, 'total': 0}
+        return fig, {'shallow': 0, 'intermediate': 0, 'deep': 0, 'total': 0, 'stats': None}
     
-    # Apply magnitude range filter
+    # Apply magnitude range and year filters as one mask (a single copy)
+    mask = np.ones(len(data), dtype=bool)
     if magnitude_range:
-        data = data[data['mag'].between(magnitude_range[0], magnitude_range[1])]
-    
-    # Apply year range filter
+        mask &= data['mag'].between(magnitude_range[0], magnitude_range[1]).to_numpy()
     if start_year:
-        data = data[data['time'].dt.year >= start_year]
-    if end_year:    
-        data = data[data['time'].dt.year <= end_year]
-    # Create scatter plot
-    fig = px.scatter(
-        data,
-        x='depth',
-        y='mag',
-        color='magnitude_category',
-        size='mag',
-        hover_name='Place',
-        hover_data=['time', 'country'],
-        title="Depth vs Magnitude Relationship",
-        labels={
-            'depth': 'Depth (km)',
-            'mag': 'Magnitude',
-            'magnitude_category': 'Magnitude Category'
-        }
-    )
-    
-    # Update layout
-    fig.update_layout(
-        height=500,
-        xaxis_title="Depth (km)",
-        yaxis_title="Magnitude",
-        showlegend=True
-    )
+        mask &= data['year'].to_numpy() >= start_year
+    if end_year:
+        mask &= data['year'].to_numpy() <= end_year
+    if not mask.all():
+        data = data[mask]
+
+    # Large selections: plot a stratified sample, rendered with WebGL
+    plot_title = "Depth vs Magnitude Relationship"
+    plot_data = data
+    if len(data) > MAX_PLOTTED_POINTS:
+        plot_data = _stratified_sample(data, MAX_PLOTTED_POINTS)
+        plot_title += f" (showing {len(plot_data):,} of {len(data):,} events)"
+    trace_type = 'scattergl' if len(plot_data) > WEBGL_POINT_THRESHOLD else 'scatter'
 
-    # Count depth categories
-    shallow = data[data['depth'] <= 70].shape[0]
-    intermediate = data[(data['depth'] > 70) & (data['depth'] <= 300)].shape[0]
-    deep = data[data['depth'] > 300].shape[0]
-    total = data.shape[0]
+    fig = make_figure(
+        _category_traces(plot_data, trace_type),
+        dict(
+            xaxis=dict(anchor='y', domain=[0.0, 1.0], title=title("Depth (km)")),
+            yaxis=dict(anchor='x', domain=[0.0, 1.0], title=title("Magnitude")),
+            legend=dict(title=title('Magnitude Category'), tracegroupgap=0, itemsizing='constant'),
+            title=title(plot_title),
+            height=500,
+            showlegend=True
+        )
+    )
 
-    depth_counts = {
-        'shallow': shallow,
-        'intermediate': intermediate,
-        'deep': deep,
-        'total': total
-    }
+    # Count depth categories over every matching event, not just the plotted ones
+    stats = depth_class_statistics(data)
+    depth_counts = {label: int(count) for label, count in zip(stats['labels'], stats['count'])}
+    depth_counts['total'] = int(data.shape[0])
+    depth_counts['stats'] = stats
     
     return fig, depth_counts
 
@@ -1,7 +1,122 @@
-import plotly.graph_objects as go
 from typing import Optional
+import numpy as np
 import pandas as pd
+from ..fast_figure import axis_title, make_figure, message_figure, title, trace
+from src.metrics import timed_stage
+from src.rolling import DEFAULT_WINDOWS, series_rolling, window_label
+
+# Title suffixes by magnitude filter
+MAGNITUDE_LABELS = {
+    "low": "Magnitude < 5.0",
+    "medium": "5.0 ≤ Magnitude < 6.5",
+    "high": "Magnitude ≥ 6.5",
+    "all": "All Earthquakes"
+}
+
+TOP_LEGEND = dict(
+    orientation="h",
+    x=1,
+    xanchor="right",
+    y=1.02,
+    yanchor="bottom"
+)
+
+def _empty_figure(plot_title: str, yaxis: str, height: int) -> dict:
+    return message_figure(
+        "No data available for the selected filters",
+        title=title(plot_title),
+        xaxis=axis_title("Date"),
+        yaxis=axis_title(yaxis),
+        height=height
+    )
+
+def _plot_title(base: str, country: Optional[str], magnitude_filter: str) -> str:
+    plot_title = base
+    if country:
+        plot_title += f" - {country}"
+    if magnitude_filter in MAGNITUDE_LABELS:
+        plot_title += f" ({MAGNITUDE_LABELS[magnitude_filter]})"
+    return plot_title
+
+def _resolution(time_series_data) -> str:
+    return time_series_data.attrs.get('resolution', 'month')
+
+def _moving_avg_window(time_series_data, window: Optional[str]) -> str:
+    return window or DEFAULT_WINDOWS[_resolution(time_series_data)]
+
+def _count_moving_avg(data_processor, series_args: tuple, window: str, cumulative: bool) -> np.ndarray:
+    """Events per period over the window, or the window mean of the running total."""
+    if cumulative:
+        return series_rolling(data_processor, series_args, 'cumulative_count', 'mean', window)
+    return series_rolling(data_processor, series_args, 'count', 'rate', window)
+
+def _date_ticks(time_series_data, mode: str) -> dict:
+    """
+    X-axis tick settings: months in single-year mode, at most 10 year ticks in
+    range mode, and plotly's own for daily and weekly points in range mode or
+    daily points in a single month.
+    """
+    resolution = _resolution(time_series_data)
+    if resolution == 'day' or (resolution == 'week' and mode != 'single'):
+        return {}
+    if mode == 'single':
+        return dict(
+            dtick="M1",
+            tickangle=0,
+            tickformat="%b"  # Jan, Feb...
+        )
+
+    # Range mode — cap ticks to 10
+    dates = time_series_data['date']
+    if dates.empty:
+        return {}
+    min_year = dates.min().year
+    max_year = dates.max().year
+    span = max_year - min_year + 1
+    num_ticks = min(span, 10)
+
+    tick_years = pd.Series(pd.date_range(
+        start=f"{min_year}-01-01",
+        end=f"{max_year}-12-31",
+        periods=num_ticks
+    )).dt.year.unique()
+
+    return dict(
+        tickangle=45,
+        ticktext=[str(y) for y in tick_years],
+        tickvals=[pd.Timestamp(f"{y}-01-01") for y in tick_years]
+    )
+
+def _peak_marker(time_series_data, color: str, font_color: Optional[str] = None):
+    """Dotted vertical line plus label at the point with the highest average magnitude."""
+    max_mag_row = time_series_data.loc[time_series_data['avg_magnitude'].idxmax()]
+    peak_date = pd.to_datetime(max_mag_row['date']).to_pydatetime()
+
+    shape = dict(
+        line=dict(color=color, dash="dot"),
+        type="line",
+        x0=peak_date,
+        x1=peak_date,
+        xref="x",
+        y0=0,
+        y1=1,
+        yref="paper"
+    )
+    annotation = dict(
+        arrowhead=2,
+        showarrow=True,
+        text="Peak Avg Magnitude",
+        x=peak_date,
+        xref="x",
+        y=1,
+        yanchor="bottom",
+        yref="paper"
+    )
+    if font_color:
+        annotation['font'] = dict(color=font_color)
+    return shape, annotation
 
+@timed_stage('figure_build')
 def create_count_time_series_plot(
     data_processor,
     magnitude_filter: str = 'all',
@@ -10,120 +125,79 @@ def create_count_time_series_plot(
     country: Optional[str] = None,
     show_moving_avg: bool = False,
     show_cumulative: bool = False,
-    mode: str = 'single'
-) -> go.Figure:
+    mode: str = 'single',
+    resolution: str = 'auto',
+    cumulative_start: Optional[str] = None,
+    uirevision: Optional[str] = None,
+    moving_avg_window: Optional[str] = None
+) -> dict:
     """
     Create time series plot showing earthquake count trends.
+
+    Points are per day, week, month or year (resolution; 'auto' picks from
+    the window). A zoomed-in window passes the unzoomed window's start as
+    cumulative_start, so cumulative counts carry on from there. The moving
+    average is over a calendar window ('12M', '5Y'; by default the one for
+    the resolution in src.rolling.DEFAULT_WINDOWS).
     """
     time_series_data = data_processor.get_time_series_data(
-        magnitude_filter, start_date, end_date, country
+        magnitude_filter, start_date, end_date, country, resolution
     )
 
     if time_series_data.empty:
-        fig = go.Figure()
-        fig.add_annotation(
-            text="No data available for the selected filters",
-            xref="paper", yref="paper",
-            x=0.5, y=0.5, showarrow=False,
-            font=dict(size=16, color="gray")
-        )
-        fig.update_layout(
-            title="Earthquake Count Trends",
-            xaxis_title="Date",
-            yaxis_title="Number of Earthquakes",
-            height=600
-        )
-        return fig
+        return _empty_figure("Earthquake Count Trends", "Number of Earthquakes", 600)
 
+    offset = 0
     if show_cumulative:
-        time_series_data['count'] = time_series_data['count'].cumsum()
+        if cumulative_start is not None and start_date is not None:
+            before = data_processor.get_time_series_data(
+                magnitude_filter, cumulative_start, pd.Timestamp(start_date) - pd.Timedelta(days=1), country, 'year'
+            )
+            offset = int(before['count'].sum()) if not before.empty else 0
+        time_series_data['count'] = time_series_data['count'].cumsum() + offset
 
+    window = _moving_avg_window(time_series_data, moving_avg_window)
     if show_moving_avg:
-        time_series_data['count_ma'] = time_series_data['count'].rolling(window=5, min_periods=1).mean()
+        series_args = (magnitude_filter, start_date, end_date, country, resolution)
+        time_series_data['count_ma'] = _count_moving_avg(data_processor, series_args, window, show_cumulative) + offset
 
-    fig = go.Figure()
-
-    fig.add_trace(go.Scatter(
-        x=time_series_data['date'],
-        y=time_series_data['count'],
+    dates = time_series_data['date'].tolist()
+    traces = [trace(
+        'scatter',
+        line=dict(color='#e74c3c', width=2),
+        marker=dict(size=4),
         mode='lines+markers',
         name='Earthquake Count' if not show_cumulative else 'Cumulative Count',
-        line=dict(color='#e74c3c', width=2),
-        marker=dict(size=4)
-    ))
+        x=dates,
+        y=time_series_data['count'].to_numpy()
+    )]
 
     if show_moving_avg:
-        fig.add_trace(go.Scatter(
-            x=time_series_data['date'],
-            y=time_series_data['count_ma'],
+        traces.append(trace(
+            'scatter',
+            line=dict(color='#3498db', dash='dot', width=2),
             mode='lines',
-            name='5-Year Moving Avg',
-            line=dict(color='#3498db', dash='dot', width=2)
+            name=f'{window_label(window)} Moving Avg',
+            x=dates,
+            y=time_series_data['count_ma'].to_numpy()
         ))
 
-    # Title formatting
-    title = "Earthquake Count Trends"
-    if country:
-        title += f" - {country}"
-    label_map = {
-        "low": "Magnitude < 5.0",
-        "medium": "5.0 ≤ Magnitude < 6.5",
-        "high": "Magnitude ≥ 6.5",
-        "all": "All Earthquakes"
-    }
-    if magnitude_filter in label_map:
-        title += f" ({label_map[magnitude_filter]})"
-
     # Layout
-    fig.update_layout(
-        title=title,
-        xaxis_title="Date",
-        yaxis_title="Cumulative Earthquakes" if show_cumulative else "Number of Earthquakes",
+    layout = dict(
+        title=title(_plot_title("Earthquake Count Trends", country, magnitude_filter)),
+        xaxis=dict(axis_title("Date"), **_date_ticks(time_series_data, mode)),
+        yaxis=axis_title("Cumulative Earthquakes" if show_cumulative
+                         else f"Earthquakes per {_resolution(time_series_data)}"),
         hovermode='x unified',
         height=600,
         showlegend=True,
-        legend=dict(
-            orientation="h",
-            yanchor="bottom",
-            y=1.02,
-            xanchor="right",
-            x=1
-        )
+        legend=TOP_LEGEND,
+        uirevision=uirevision
     )
 
-    # Tick formatting
-    if mode == 'single':
-        fig.update_xaxes(
-            dtick="M1",
-            tickformat="%b",  # Jan, Feb...
-            tickangle=0
-        )
-    else:
-        # Range mode — cap ticks to 10
-        dates = time_series_data['date']
-        if not dates.empty:
-            min_year = dates.min().year
-            max_year = dates.max().year
-            span = max_year - min_year + 1
-            num_ticks = min(span, 10)
-
-            tick_years = pd.Series(pd.date_range(
-                start=f"{min_year}-01-01",
-                end=f"{max_year}-12-31",
-                periods=num_ticks
-            )).dt.year.unique()
-
-            tick_vals = [pd.Timestamp(f"{y}-01-01") for y in tick_years]
-            tick_texts = [str(y) for y in tick_years]
-
-            fig.update_xaxes(
-                tickvals=tick_vals,
-                ticktext=tick_texts,
-                tickangle=45
-            )
-
-    return fig
+    return make_figure(traces, layout)
 
+@timed_stage('figure_build')
 def create_magnitude_time_series_plot(
     data_processor,
     magnitude_filter: str = 'all',
@@ -131,151 +205,72 @@ def create_magnitude_time_series_plot(
     end_date: Optional[str] = None,
     country: Optional[str] = None,
     show_moving_avg: bool = False,
-    mode: str = 'single'
-) -> go.Figure:
+    mode: str = 'single',
+    resolution: str = 'auto',
+    uirevision: Optional[str] = None,
+    moving_avg_window: Optional[str] = None
+) -> dict:
     """
-    Create time series plot showing magnitude trends.
+    Create time series plot showing magnitude trends, per day, week, month
+    or year (resolution; 'auto' picks from the window). The moving average
+    is the mean magnitude of the events in a calendar window.
     """
     time_series_data = data_processor.get_time_series_data(
-        magnitude_filter, start_date, end_date, country
+        magnitude_filter, start_date, end_date, country, resolution
     )
 
     if time_series_data.empty:
-        fig = go.Figure()
-        fig.add_annotation(
-            text="No data available for the selected filters",
-            xref="paper", yref="paper",
-            x=0.5, y=0.5, showarrow=False,
-            font=dict(size=16, color="gray")
-        )
-        fig.update_layout(
-            title="Magnitude Trends",
-            xaxis_title="Date",
-            yaxis_title="Magnitude",
-            height=600
-        )
-        return fig
+        return _empty_figure("Magnitude Trends", "Magnitude", 600)
 
+    window = _moving_avg_window(time_series_data, moving_avg_window)
     if show_moving_avg:
-        time_series_data['avg_mag_ma'] = time_series_data['avg_magnitude'].rolling(window=5, min_periods=1).mean()
-
-    fig = go.Figure()
+        series_args = (magnitude_filter, start_date, end_date, country, resolution)
+        time_series_data['avg_mag_ma'] = series_rolling(data_processor, series_args, 'avg_magnitude', 'mean',
+                                                        window, weights='count')
 
     # Average magnitude
-    fig.add_trace(go.Scatter(
-        x=time_series_data['date'],
-        y=time_series_data['avg_magnitude'],
+    dates = time_series_data['date'].tolist()
+    traces = [trace(
+        'scatter',
+        line=dict(color='#f39c12', width=2),
+        marker=dict(size=4),
         mode='lines+markers',
         name='Average Magnitude',
-        line=dict(color='#f39c12', width=2),
-        marker=dict(size=4)
-    ))
-
-
+        x=dates,
+        y=time_series_data['avg_magnitude'].to_numpy()
+    )]
 
     if show_moving_avg:
-        fig.add_trace(go.Scatter(
-            x=time_series_data['date'],
-            y=time_series_data['avg_mag_ma'],
-            mode='lines',
-            name='Avg Magnitude (5Y MA)',
+        traces.append(trace(
+            'scatter',
             line=dict(color='#f39c12', dash='dot', width=1.5),
-            opacity=0.7
+            mode='lines',
+            name=f'Avg Magnitude ({window_label(window)} MA)',
+            opacity=0.7,
+            x=dates,
+            y=time_series_data['avg_mag_ma'].to_numpy()
         ))
-        
-
 
     # Highlight peak average magnitude
-    max_mag_row = time_series_data.loc[time_series_data['avg_magnitude'].idxmax()]
-    peak_date = pd.to_datetime(max_mag_row['date']).to_pydatetime()
-
-    fig.add_shape(
-        type="line",
-        x0=peak_date,
-        x1=peak_date,
-        y0=0,
-        y1=1,
-        xref="x",
-        yref="paper",
-        line=dict(color="red", dash="dot"),
-    )
-
-    fig.add_annotation(
-        x=peak_date,
-        y=1,
-        xref="x",
-        yref="paper",
-        text="Peak Avg Magnitude",
-        showarrow=True,
-        arrowhead=2,
-        yanchor="bottom",
-        font=dict(color="red")
-    )
-
-    # Title formatting
-    title = "Magnitude Trends"
-    if country:
-        title += f" - {country}"
-    label_map = {
-        "low": "Magnitude < 5.0",
-        "medium": "5.0 ≤ Magnitude < 6.5",
-        "high": "Magnitude ≥ 6.5",
-        "all": "All Earthquakes"
-    }
-    if magnitude_filter in label_map:
-        title += f" ({label_map[magnitude_filter]})"
+    peak_shape, peak_annotation = _peak_marker(time_series_data, color="red", font_color="red")
 
     # Layout
-    fig.update_layout(
-        title=title,
-        xaxis_title="Date",
-        yaxis_title="Magnitude",
-        yaxis=dict(range=[0, 10]),  # Magnitude scale
+    layout = dict(
+        annotations=[peak_annotation],
+        shapes=[peak_shape],
+        title=title(_plot_title("Magnitude Trends", country, magnitude_filter)),
+        xaxis=dict(axis_title("Date"), **_date_ticks(time_series_data, mode)),
+        yaxis=dict(axis_title("Magnitude"), range=[0, 10]),  # Magnitude scale
         hovermode='x unified',
         height=600,
         showlegend=True,
-        legend=dict(
-            orientation="h",
-            yanchor="bottom",
-            y=1.02,
-            xanchor="right",
-            x=1
-        )
+        legend=TOP_LEGEND,
+        uirevision=uirevision
     )
 
-    # Tick formatting
-    if mode == 'single':
-        fig.update_xaxes(
-            dtick="M1",
-            tickformat="%b",  # Jan, Feb...
-            tickangle=0
-        )
-    else:
-        # Range mode — cap ticks to 10
-        dates = time_series_data['date']
-        if not dates.empty:
-            min_year = dates.min().year
-            max_year = dates.max().year
-            span = max_year - min_year + 1
-            num_ticks = min(span, 10)
-
-            tick_years = pd.Series(pd.date_range(
-                start=f"{min_year}-01-01",
-                end=f"{max_year}-12-31",
-                periods=num_ticks
-            )).dt.year.unique()
-
-            tick_vals = [pd.Timestamp(f"{y}-01-01") for y in tick_years]
-            tick_texts = [str(y) for y in tick_years]
-
-            fig.update_xaxes(
-                tickvals=tick_vals,
-                ticktext=tick_texts,
-                tickangle=45
-            )
-
-    return fig
+    return make_figure(traces, layout)
 
+@timed_stage('figure_build')
 def create_time_series_plot(
     data_processor,
     magnitude_filter: str = 'all',
@@ -284,156 +279,79 @@ def create_time_series_plot(
     country: Optional[str] = None,
     show_moving_avg: bool = False,
     show_cumulative: bool = False,
-    mode: str = 'single'  # <-- new
-) -> go.Figure:
+    mode: str = 'single',  # <-- new
+    resolution: str = 'auto',
+    moving_avg_window: Optional[str] = None
+) -> dict:
     """
     Create enhanced time series plot showing earthquake trends.
     """
     time_series_data = data_processor.get_time_series_data(
-        magnitude_filter, start_date, end_date, country
+        magnitude_filter, start_date, end_date, country, resolution
     )
 
     if time_series_data.empty:
-        fig = go.Figure()
-        fig.add_annotation(
-            text="No data available for the selected filters",
-            xref="paper", yref="paper",
-            x=0.5, y=0.5, showarrow=False,
-            font=dict(size=16, color="gray")
-        )
-        fig.update_layout(
-            title="Earthquake Trends Over Time",
-            xaxis_title="Date",
-            yaxis_title="Number of Earthquakes",
-            height=400
-        )
-        return fig
+        return _empty_figure("Earthquake Trends Over Time", "Number of Earthquakes", 400)
 
     if show_cumulative:
         time_series_data['count'] = time_series_data['count'].cumsum()
 
+    window = _moving_avg_window(time_series_data, moving_avg_window)
     if show_moving_avg:
-        time_series_data['count_ma'] = time_series_data['count'].rolling(window=5, min_periods=1).mean()
+        series_args = (magnitude_filter, start_date, end_date, country, resolution)
+        time_series_data['count_ma'] = _count_moving_avg(data_processor, series_args, window, show_cumulative)
 
-    fig = go.Figure()
-
-    fig.add_trace(go.Scatter(
-        x=time_series_data['date'],
-        y=time_series_data['count'],
+    dates = time_series_data['date'].tolist()
+    traces = [trace(
+        'scatter',
+        line=dict(color='#e74c3c', width=2),
+        marker=dict(size=4),
         mode='lines+markers',
         name='Earthquake Count' if not show_cumulative else 'Cumulative Count',
-        line=dict(color='#e74c3c', width=2),
-        marker=dict(size=4)
-    ))
+        x=dates,
+        y=time_series_data['count'].to_numpy()
+    )]
 
     if show_moving_avg:
-        fig.add_trace(go.Scatter(
-            x=time_series_data['date'],
-            y=time_series_data['count_ma'],
+        traces.append(trace(
+            'scatter',
+            line=dict(color='blue', dash='dot'),
             mode='lines',
-            name='5-Year Moving Avg',
-            line=dict(color='blue', dash='dot')
+            name=f'{window_label(window)} Moving Avg',
+            x=dates,
+            y=time_series_data['count_ma'].to_numpy()
         ))
 
-    fig.add_trace(go.Scatter(
-        x=time_series_data['date'],
-        y=time_series_data['avg_magnitude'],
+    traces.append(trace(
+        'scatter',
+        line=dict(color='#f39c12', dash='dash', width=2),
         mode='lines',
         name='Average Magnitude',
-        yaxis='y2',
-        line=dict(color='#f39c12', width=2, dash='dash')
+        x=dates,
+        y=time_series_data['avg_magnitude'].to_numpy(),
+        yaxis='y2'
     ))
 
-    max_mag_row = time_series_data.loc[time_series_data['avg_magnitude'].idxmax()]
-    peak_date = pd.to_datetime(max_mag_row['date']).to_pydatetime()
-
-    fig.add_shape(
-        type="line",
-        x0=peak_date,
-        x1=peak_date,
-        y0=0,
-        y1=1,
-        xref="x",
-        yref="paper",
-        line=dict(color="gray", dash="dot"),
-    )
-
-    fig.add_annotation(
-        x=peak_date,
-        y=1,
-        xref="x",
-        yref="paper",
-        text="Peak Avg Magnitude",
-        showarrow=True,
-        arrowhead=2,
-        yanchor="bottom"
-    )
-
-    # Title formatting
-    title = "Earthquake Trends Over Time"
-    if country:
-        title += f" - {country}"
-    label_map = {
-        "low": "Magnitude < 5.0",
-        "medium": "5.0 ≤ Magnitude < 6.5",
-        "high": "Magnitude ≥ 6.5",
-        "all": "All Earthquakes"
-    }
-    if magnitude_filter in label_map:
-        title += f" ({label_map[magnitude_filter]})"
+    peak_shape, peak_annotation = _peak_marker(time_series_data, color="gray")
 
     # Layout
-    fig.update_layout(
-        title=title,
-        xaxis_title="Date",
-        yaxis_title="Cumulative Earthquakes" if show_cumulative else "Number of Earthquakes",
+    layout = dict(
+        annotations=[peak_annotation],
+        shapes=[peak_shape],
+        title=title(_plot_title("Earthquake Trends Over Time", country, magnitude_filter)),
+        # 🧠 Final Tick Fix
+        xaxis=dict(axis_title("Date"), **_date_ticks(time_series_data, mode)),
+        yaxis=axis_title("Cumulative Earthquakes" if show_cumulative else "Number of Earthquakes"),
         yaxis2=dict(
-            title="Average Magnitude",
             overlaying="y",
+            range=[0, 10],
             side="right",
-            range=[0, 10]
+            title=title("Average Magnitude")
         ),
         hovermode='x unified',
         height=500,
         showlegend=True,
-        legend=dict(
-            orientation="h",
-            yanchor="bottom",
-            y=1.02,
-            xanchor="right",
-            x=1
-        )
+        legend=TOP_LEGEND
     )
 
-    # 🧠 Final Tick Fix
-    if mode == 'single':
-        fig.update_xaxes(
-            dtick="M1",
-            tickformat="%b",  # Jan, Feb...
-            tickangle=0
-        )
-    else:
-        # Range mode — cap ticks to 10
-        dates = time_series_data['date']
-        if not dates.empty:
-            min_year = dates.min().year
-            max_year = dates.max().year
-            span = max_year - min_year + 1
-            num_ticks = min(span, 10)
-
-            tick_years = pd.Series(pd.date_range(
-                start=f"{min_year}-01-01",
-                end=f"{max_year}-12-31",
-                periods=num_ticks
-            )).dt.year.unique()
-
-            tick_vals = [pd.Timestamp(f"{y}-01-01") for y in tick_years]
-            tick_texts = [str(y) for y in tick_years]
-
-            fig.update_xaxes(
-                tickvals=tick_vals,
-                ticktext=tick_texts,
-                tickangle=45
-            )
-
-    return fig
+    return make_figure(traces, layout)
@@ -1,26 +1,88 @@
 import numpy as np
-import plotly.graph_objects as go
 from ..geo_utils import get_world_geojson
 from ..style_utils import get_magnitude_color
+from ..fast_figure import make_figure, message_figure, trace
+from src.cache import versioned_cache
 from typing import Optional
+from src.metrics import timed_stage
+
+def _land_traces(lons, lats) -> list:
+    """Filled land area plus its boundary line drawn on top."""
+    return [
+        trace(
+            'scattergeo',
+            fill='toself',
+            fillcolor='#282a36',  # Dracula background color
+            hoverinfo='skip',
+            lat=lats,
+            line=dict(color='#34495e', width=0.8),
+            lon=lons,
+            mode='lines',
+            opacity=0.3,
+            showlegend=False
+        ),
+        trace(
+            'scattergeo',
+            hoverinfo='skip',
+            lat=lats,
+            line=dict(color='#34495e', width=0.8),
+            lon=lons,
+            mode='lines',
+            showlegend=False
+        )
+    ]
+
+def _dark_geo() -> dict:
+    """Equirectangular dark world map shared by the events map and the heatmap."""
+    return dict(
+        bgcolor='#282a36',  # Dracula background
+        center=dict(lat=20, lon=0),
+        coastlinecolor='#6272a4',  # Dracula blue
+        coastlinewidth=1.5,
+        countrycolor='#6272a4',  # Dracula blue
+        countrywidth=0.8,
+        # Set fixed aspect ratio and prevent shrinking
+        domain=dict(x=[0, 1], y=[0, 1]),
+        lakecolor='#1e1f29',  # Same as ocean
+        landcolor='#282a36',  # Dracula background - ensures complete land coverage
+        # Fixed zoom constraints to prevent infinite shrinking
+        lataxis=dict(range=[-90, 90]),
+        lonaxis=dict(range=[-180, 180]),
+        oceancolor='#1e1f29',  # Dracula darker background
+        # Scale 1.2 is the minimum to prevent the map from shrinking too much
+        projection=dict(
+            rotation=dict(lat=0, lon=0, roll=0),
+            scale=1.2,
+            type='equirectangular'
+        ),
+        # Set minimum resolution to prevent excessive zoom out
+        resolution=110,
+        rivercolor='#6272a4',  # Dracula blue
+        riverwidth=0.5,
+        # Prevent excessive zooming out
+        scope='world',
+        showcoastlines=True,
+        showcountries=True,
+        showframe=False,
+        showlakes=True,
+        showland=True,
+        showocean=True,
+        showrivers=True
+    )
+
+@versioned_cache('global_map_figures', maxsize=8)
+@timed_stage('figure_build')
 def create_global_earthquake_map(data_processor, 
-                                selected_year: Optional[int] = None) -> go.Figure:
+                                selected_year: Optional[int] = None) -> dict:
     """
     Create 2D global map showing earthquake locations with impact radius circles.
+    Figures are cached per dataset version and year; callers must not mutate them.
     """
     # Get filtered data
     data = data_processor.get_filtered_data()
     
     if data.empty:
-        fig = go.Figure()
-        fig.add_annotation(
-            text="No earthquake data available",
-            xref="paper", yref="paper",
-            x=0.5, y=0.5, showarrow=False,
-            font=dict(size=16, color="gray")
-        )
-        fig.update_layout(height=600)
-        return fig
+        return message_figure("No earthquake data available", height=600)
     
     # Filter by year if specified
     if selected_year:
@@ -30,20 +92,21 @@ def create_global_earthquake_map(data_processor,
     geojson_data = get_world_geojson()
     
     # Create the base map with country boundaries
-    fig = go.Figure()
+    traces = []
     
     # Add a background layer to ensure complete coverage
     # This creates a full-world rectangle to eliminate any white regions
-    fig.add_trace(go.Scattergeo(
-        lon=[-180, 180, 180, -180, -180],
-        lat=[-90, -90, 90, 90, -90],
-        mode='lines',
-        line=dict(color='#282a36', width=0),
+    traces.append(trace(
+        'scattergeo',
         fill='toself',
         fillcolor='#282a36',  # Dracula background
+        hoverinfo='skip',
+        lat=[-90, -90, 90, 90, -90],
+        line=dict(color='#282a36', width=0),
+        lon=[-180, 180, 180, -180, -180],
+        mode='lines',
         opacity=1.0,
-        showlegend=False,
-        hoverinfo='skip'
+        showlegend=False
     ))
     
     if geojson_data:
@@ -52,187 +115,100 @@ def create_global_earthquake_map(data_processor,
             coordinates = feature['geometry']['coordinates']
             
             if feature['geometry']['type'] == 'Polygon':
-                # Single polygon - add filled area first
-                lons = [coord[0] for coord in coordinates[0]]
-                lats = [coord[1] for coord in coordinates[0]]
-                
-                # Add filled land area
-                fig.add_trace(go.Scattergeo(
-                    lon=lons,
-                    lat=lats,
-                    mode='lines',
-                    line=dict(color='#34495e', width=0.8),
-                    fill='toself',
-                    fillcolor='#282a36',  # Dracula background color
-                    opacity=0.3,
-                    showlegend=False,
-                    hoverinfo='skip'
-                ))
-                
-                # Add boundary line on top
-                fig.add_trace(go.Scattergeo(
-                    lon=lons,
-                    lat=lats,
-                    mode='lines',
-                    line=dict(color='#34495e', width=0.8),
-                    showlegend=False,
-                    hoverinfo='skip'
-                ))
-                
+                # Single polygon
+                polygons = [coordinates]
             elif feature['geometry']['type'] == 'MultiPolygon':
                 # Multiple polygons
-                for polygon in coordinates:
-                    lons = [coord[0] for coord in polygon[0]]
-                    lats = [coord[1] for coord in polygon[0]]
-                    
-                    # Add filled land area
-                    fig.add_trace(go.Scattergeo(
-                        lon=lons,
-                        lat=lats,
-                        mode='lines',
-                        line=dict(color='#34495e', width=0.8),
-                        fill='toself',
-                        fillcolor='#282a36',  # Dracula background color
-                        opacity=0.3,
-                        showlegend=False,
-                        hoverinfo='skip'
-                    ))
-                    
-                    # Add boundary line on top
-                    fig.add_trace(go.Scattergeo(
-                        lon=lons,
-                        lat=lats,
-                        mode='lines',
-                        line=dict(color='#34495e', width=0.8),
-                        showlegend=False,
-                        hoverinfo='skip'
-                    ))
-    
-    # # Define magnitude colors with Dracula theme palette
-    # def get_magnitude_color(mag):
-    #     if mag < 6.0:
-    #         return '#ffb86c'  # Dracula orange
-    #     elif mag < 6.5:
-    #         return '#ff79c6'  # Dracula pink
-    #     elif mag < 7.0:
-    #         return '#ff5555'  # Dracula red
-    #     elif mag < 7.5:
-    #         return '#bd93f9'  # Dracula purple
-    #     else:
-    #         return '#ff5555'  # Dracula red (brightest for highest magnitude)
+                polygons = coordinates
+            else:
+                continue
+
+            for polygon in polygons:
+                lons = [coord[0] for coord in polygon[0]]
+                lats = [coord[1] for coord in polygon[0]]
+                traces.extend(_land_traces(lons, lats))
     
     # Add earthquake points with impact radius circles
     if not data.empty:
-        for _, eq in data.iterrows():
-            lat_center = eq['Latitude']
-            lon_center = eq['Longitude']
-            mag = eq['mag']
-            
-            # Calculate impact radius using new formula: exp(magnitude * 0.666 + 1.6)
-            radius = np.exp(mag * 0.666 + 1.6)
-            
-            # Generate circle coordinates with more points for smoother circles
-            angles = np.linspace(0, 2*np.pi, 100)
-            lat_circle = lat_center + (radius / 111.32) * np.cos(angles)
-            lon_circle = lon_center + (radius / (111.32 * np.cos(np.radians(lat_center)))) * np.sin(angles)
+        lat_centers = data['Latitude'].to_numpy()
+        lon_centers = data['Longitude'].to_numpy()
+        mags = data['mag'].to_numpy()
+
+        # Calculate impact radius using new formula: exp(magnitude * 0.666 + 1.6)
+        radii = np.exp(mags * 0.666 + 1.6)
+
+        # Generate all circle coordinates at once, 100 points per circle for smooth circles
+        angles = np.linspace(0, 2*np.pi, 100)
+        lat_circles = lat_centers[:, None] + (radii[:, None] / 111.32) * np.cos(angles)
+        lon_circles = lon_centers[:, None] + (radii[:, None] / (111.32 * np.cos(np.radians(lat_centers))[:, None])) * np.sin(angles)
+
+        for i, (place, year) in enumerate(zip(data['Place'], data['year'])):
+            mag = mags[i]
+            radius = radii[i]
             
             # Get color based on magnitude
             color = get_magnitude_color(mag)
             
             # Add impact circle with sophisticated styling
-            fig.add_trace(go.Scattergeo(
-                lon=lon_circle,
-                lat=lat_circle,
-                mode='lines',
-                line=dict(color=color, width=2),
+            traces.append(trace(
+                'scattergeo',
                 fill='toself',
                 fillcolor=color,
+                hoverinfo='skip',
+                lat=lat_circles[i],
+                line=dict(color=color, width=2),
+                lon=lon_circles[i],
+                mode='lines',
                 opacity=0.2,
-                showlegend=False,
-                hoverinfo='skip'
+                showlegend=False
             ))
             
             # Add epicentre point with minimal styling - just enough to identify location
-            fig.add_trace(go.Scattergeo(
-                lon=[lon_center],
-                lat=[lat_center],
-                mode='markers',
+            traces.append(trace(
+                'scattergeo',
+                hoverinfo='text',
+                lat=[lat_centers[i]],
+                lon=[lon_centers[i]],
                 marker=dict(
-                    size=2,  # Very small fixed size - just to identify epicenter
                     color=color,
-                    opacity=0.9,
                     line=dict(color='white', width=0.5),
+                    opacity=0.9,
+                    size=2,  # Very small fixed size - just to identify epicenter
                     symbol='circle'
                 ),
-                text=f"<b>{eq['Place']}</b><br>Magnitude: {mag}<br>Impact Radius: ~{int(radius)} km<br>Year: {eq['year']}",
-                hoverinfo='text',
-                showlegend=False
+                mode='markers',
+                showlegend=False,
+                text=f"<b>{place}</b><br>Magnitude: {mag}<br>Impact Radius: ~{int(radius)} km<br>Year: {year}"
             ))
     
     # Add legend traces for magnitude color ranges
     legend_colors = ['#fff7bc', '#fec44f', '#fe9929', '#d7301f', '#b30000']
     legend_labels = ['< 6.0', '6.0-6.5', '6.5-7.0', '7.0-7.5', '≥ 7.5']
     
-    for i, (color, label) in enumerate(zip(legend_colors, legend_labels)):
-        fig.add_trace(go.Scattergeo(
-            lon=[None],  # Invisible trace for legend only
-            lat=[None],
-            mode='markers',
+    for color, label in zip(legend_colors, legend_labels):
+        traces.append(trace(
+            'scattergeo',
+            hoverinfo='skip',
+            lat=[None],  # Invisible trace for legend only
+            lon=[None],
             marker=dict(
-                size=8,
                 color=color,
+                size=8,
                 symbol='circle'
             ),
+            mode='markers',
             name=f'Magnitude {label}',
-            showlegend=True,
-            hoverinfo='skip'
+            showlegend=True
         ))
     
     # Update layout with sophisticated styling
-    fig.update_layout(
-        geo=dict(
-            showframe=False,
-            showcoastlines=True,
-            coastlinecolor='#6272a4',  # Dracula blue
-            coastlinewidth=1.5,
-            showland=True,
-            landcolor='#282a36',  # Dracula background - ensures complete land coverage
-            showocean=True,
-            oceancolor='#1e1f29',  # Dracula darker background
-            projection_type='equirectangular',
-            projection_scale=1.2,  # Increased scale to prevent shrinking
-            center=dict(lat=20, lon=0),
-            bgcolor='#282a36',  # Dracula background
-            # Fixed zoom constraints to prevent infinite shrinking
-            lonaxis=dict(range=[-180, 180]),
-            lataxis=dict(range=[-90, 90]),
-            # Prevent excessive zooming out
-            scope='world',
-            showcountries=True,
-            countrycolor='#6272a4',  # Dracula blue
-            countrywidth=0.8,
-            # Set minimum zoom level to prevent map from shrinking too much
-            projection=dict(
-                scale=1.2,  # Minimum scale to prevent shrinking
-                rotation=dict(lon=0, lat=0, roll=0)
-            ),
-            # Set fixed aspect ratio and prevent shrinking
-            domain=dict(x=[0, 1], y=[0, 1]),
-            # Set minimum resolution to prevent excessive zoom out
-            resolution=110,
-            # Additional settings to ensure complete coverage
-            showlakes=True,
-            lakecolor='#1e1f29',  # Same as ocean
-            showrivers=True,
-            rivercolor='#6272a4',  # Dracula blue
-            riverwidth=0.5
-        ),
+    layout = dict(
+        geo=_dark_geo(),
         height=700,  # Fixed height
-        width=None,  # Auto-width to fit container
         margin=dict(l=0, r=0, t=0, b=80),  # Increased bottom margin for legend outside plot
         paper_bgcolor='#282a36',  # Dracula background
         plot_bgcolor='#282a36',  # Dracula background
-        font=dict(family="Arial, sans-serif", size=12, color='#f8f8f2'),  # Dracula foreground
+        font=dict(color='#f8f8f2', family="Arial, sans-serif", size=12),  # Dracula foreground
         # Disable autosize to prevent shrinking
         autosize=False,
         # Better hover styling
@@ -240,17 +216,72 @@ def create_global_earthquake_map(data_processor,
         # Legend styling - small and at bottom, outside plot area
         showlegend=True,
         legend=dict(
-            orientation="h",
-            yanchor="top",
-            y=-0.15,  # Below the plot area
-            xanchor="center",
-            x=0.5,  # Center horizontally
             bgcolor='rgba(40, 42, 54, 0.9)',  # Semi-transparent Dracula background
             bordercolor='#6272a4',  # Dracula blue border
             borderwidth=1,
-            font=dict(size=10, color='#f8f8f2'),  # Smaller font
-            itemsizing='constant'  # Consistent marker sizes
+            font=dict(color='#f8f8f2', size=10),  # Smaller font
+            itemsizing='constant',  # Consistent marker sizes
+            orientation="h",
+            x=0.5,  # Center horizontally
+            xanchor="center",
+            y=-0.15,  # Below the plot area
+            yanchor="top"
         )
     )
     
-    return fig
\ No newline at end of file
+    return make_figure(traces, layout)
+
+@versioned_cache('global_heatmap_figures', maxsize=8)
+@timed_stage('figure_build')
+def create_global_heatmap(data_processor,
+                          selected_year: Optional[int] = None) -> dict:
+    """
+    World map of the number of earthquakes per 1° cell, from the activity
+    cube, so the figure grows with the number of active cells rather than
+    events. Cached like create_global_earthquake_map.
+    """
+    cube = data_processor.get_activity_cube()
+    if cube is None:
+        return message_figure("No earthquake data available", height=600)
+
+    start, end = (f"{selected_year}-01-01", f"{selected_year}-12-31") if selected_year else (None, None)
+    cells = cube.query(start=start, end=end)
+    if len(cells['count']) == 0:
+        return message_figure(f"No earthquakes recorded in {selected_year}", height=600)
+
+    top = max(int(np.ceil(np.log10(cells['count'].max()))), 1)
+    heat = trace(
+        'scattergeo',
+        lat=cells['lat'],
+        lon=cells['lon'],
+        customdata=cells['count'],
+        hovertemplate="%{customdata:,} earthquakes<br>%{lat:.1f}°, %{lon:.1f}°<extra></extra>",
+        marker=dict(
+            color=np.log10(cells['count']),
+            cmin=0,
+            cmax=top,
+            colorscale='YlOrRd',
+            colorbar=dict(
+                title=dict(text='Earthquakes'),
+                tickvals=list(range(top + 1)),
+                ticktext=[f"{10 ** k:,}" for k in range(top + 1)],
+                tickfont=dict(color='#f8f8f2')
+            ),
+            opacity=0.85,
+            size=4,
+            symbol='square'
+        ),
+        mode='markers',
+        showlegend=False
+    )
+    layout = dict(
+        geo=_dark_geo(),
+        height=700,
+        margin=dict(l=0, r=0, t=0, b=80),
+        paper_bgcolor='#282a36',  # Dracula background
+        plot_bgcolor='#282a36',
+        font=dict(color='#f8f8f2', family="Arial, sans-serif", size=12),
+        autosize=False,
+        hovermode='closest'
+    )
+    return make_figure([heat], layout)
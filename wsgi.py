@@ -0,0 +1,21 @@
+"""
+Production entry point:
+
+    gunicorn -c gunicorn.conf.py
+
+The configuration preloads this module in the master process, so the dataset,
+its indexes and the warmed caches are built once and shared copy-on-write by
+every forked worker. The dataset's numeric columns are additionally moved into
+memory-mapped files (EQ_SHARED_DIR, /dev/shm by default) that workers map
+read-only, so they stay shared however long the workers run.
+
+The dataset is loaded in the foreground here: a background load would not
+carry over into the forked workers. The dataset file watcher runs in the
+master only (see when_ready in gunicorn.conf.py): a changed file is rebuilt
+there once, and the workers are then replaced one at a time by ones forked
+from the new snapshot.
+"""
+from app import create_app
+
+app = create_app(share_columns=True, background=False, watch=False)
+server = app.server